@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Columnar sales analytics for the Pharmacy POS application.
+
+SalesColumns keeps every sale line, live and archived, in four parallel typed
+arrays from the array module, sorted by day:
+
+    day        date ordinal ('i')
+    medicine   medicine id ('i')
+    units      units sold as stored on the line (sales.units) ('i')
+    amount     line total in cents ('q')
+
+That is 24 bytes per line instead of a tuple of Python objects per row, and a
+date range is a slice found by bisection. Group-by, top-N and period
+comparisons aggregate over those slices. When NumPy is installed the arrays
+are viewed as NumPy arrays without copying and aggregated with bincount and
+argpartition; otherwise plain loops over the arrays are used.
+
+refresh() appends only the sales added since the last load. It checks the
+number of new lines against the sales change counters (report_cache.py): if
+anything else changed (an edit, a deletion, archiving) it reloads everything.
+"""
+
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+import archive
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Rows fetched per round trip while loading
+FETCH_SIZE = 10000
+
+# julianday() of 0001-01-01 is 1721425.5 and its ordinal is 1
+_ORDINAL = "CAST(julianday(date(s.date)) - 1721424.5 AS INTEGER)"
+
+
+def _ordinal(value):
+    return value.toordinal() if isinstance(value, date) else date.fromisoformat(str(value)[:10]).toordinal()
+
+
+def _month(ordinal):
+    day = date.fromordinal(ordinal)
+    return f"{day.year}-{day.month:02d}"
+
+
+class SalesColumns:
+    """Sale lines as sorted columnar arrays"""
+
+    def __init__(self):
+        self._clear()
+        self.version = None      # sales change counter total at the last load
+        self.last_id = 0         # highest live sale id loaded
+
+    def _clear(self):
+        self.day = array('i')
+        self.medicine = array('i')
+        self.units = array('i')
+        self.amount = array('q')
+
+    def __len__(self):
+        return len(self.day)
+
+    @staticmethod
+    def _version(cursor):
+        cursor.execute("SELECT COALESCE(SUM(counter), 0) FROM change_counters WHERE name = 'sales'")
+        return cursor.fetchone()[0]
+
+    def _append(self, cursor, sql, parameters=()):
+        """Append (day, medicine, units, amount, id) rows; returns (rows, highest id)"""
+        cursor.execute(sql, parameters)
+        count, last_id = 0, 0
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            days, medicines, units, amounts, ids = zip(*rows)
+            self.day.extend(days)
+            self.medicine.extend(medicines)
+            self.units.extend(units)
+            self.amount.extend(amounts)
+            count += len(rows)
+            last_id = max(last_id, max(ids))
+        return count, last_id
+
+    def _select(self, source):
+        return f"SELECT COALESCE({_ORDINAL}, 0), s.medicine_id, s.units, s.total, s.id FROM {source} s"
+
+    def _sort(self, start=0):
+        """Restore day order if lines from start on are out of order (backdated or archived sales)"""
+        day = self.day
+        if all(day[i] <= day[i + 1] for i in range(max(start - 1, 0), len(day) - 1)):
+            return
+        if numpy is not None:
+            order = numpy.argsort(numpy.frombuffer(day, dtype=numpy.intc), kind='stable')
+            for name in ('day', 'medicine', 'units', 'amount'):
+                column = getattr(self, name)
+                dtype = numpy.int64 if column.typecode == 'q' else numpy.intc
+                setattr(self, name, array(column.typecode, numpy.frombuffer(column, dtype=dtype)[order].tobytes()))
+        else:
+            order = sorted(range(len(day)), key=day.__getitem__)
+            for name in ('day', 'medicine', 'units', 'amount'):
+                column = getattr(self, name)
+                setattr(self, name, array(column.typecode, (column[i] for i in order)))
+
+    def load(self, conn, db_path):
+        """Load every sale line, including the archives"""
+        cursor = conn.cursor()
+        version = self._version(cursor)
+        self._clear()
+        with archive.attached(conn, db_path, "0001-01-01", "9999-12-31") as schemas:
+            source = archive.union('sales', 'id, date, medicine_id, units, total', schemas)
+            # Read in storage order (sales are mostly inserted in date order) and sort only if needed;
+            # ORDER BY date would visit the table in index order, several times slower
+            self._append(cursor, self._select(source))
+        self._sort()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM sales")
+        self.last_id = cursor.fetchone()[0]
+        self.version = version
+
+    def refresh(self, conn, db_path):
+        """Bring the arrays up to date: append new sales, or reload after any other change"""
+        cursor = conn.cursor()
+        version = self._version(cursor)
+        if version == self.version:
+            return
+        if self.version is None:
+            self.load(conn, db_path)
+            return
+        end = len(self.day)
+        count, last_id = self._append(cursor, self._select("sales") + " WHERE s.id > ?", (self.last_id,))
+        # Each insert bumps the counter once: any other difference means edits or deletions
+        if version - self.version != count:
+            self.load(conn, db_path)
+            return
+        self._sort(end)
+        self.last_id = max(self.last_id, last_id)
+        self.version = version
+
+    def _range(self, from_date, to_date):
+        """Slice bounds of the lines dated from_date through to_date"""
+        return bisect_left(self.day, _ordinal(from_date)), bisect_right(self.day, _ordinal(to_date))
+
+    def _values(self, value):
+        return self.amount if value == 'amount' else self.units
+
+    def totals_by(self, key, from_date, to_date, value='amount'):
+        """{key: total} for key 'medicine', 'day' (date) or 'month' ('YYYY-MM') over the range"""
+        lo, hi = self._range(from_date, to_date)
+        if lo >= hi:
+            return {}
+        values = self._values(value)
+        if key == 'medicine':
+            keys, offset = self.medicine, 0
+        else:
+            keys, offset = self.day, self.day[lo]
+
+        if numpy is not None:
+            index = numpy.frombuffer(keys, dtype=numpy.intc)[lo:hi] - offset
+            weights = numpy.frombuffer(values, dtype=numpy.int64 if value == 'amount' else numpy.intc)[lo:hi]
+            sums = numpy.bincount(index, weights=weights)
+            present = numpy.bincount(index).nonzero()[0]
+            totals = {int(k) + offset: float(sums[k]) for k in present}
+        else:
+            totals = {}
+            for k, v in zip(keys[lo:hi], values[lo:hi]):
+                totals[k] = totals.get(k, 0) + v
+
+        # bincount sums in floating point: exact for integers below 2**53
+        totals = {k: int(round(v)) for k, v in totals.items()}
+        if key == 'day':
+            return {date.fromordinal(k): v for k, v in totals.items()}
+        if key == 'month':
+            months = {}
+            for k, v in totals.items():
+                month = _month(k)
+                months[month] = months.get(month, 0) + v
+            return months
+        return totals
+
+    def top(self, n, from_date, to_date, value='amount'):
+        """[(medicine_id, total)] for the n medicines with the largest totals, largest first"""
+        totals = self.totals_by('medicine', from_date, to_date, value)
+        if numpy is not None and len(totals) > n:
+            ids = numpy.fromiter(totals.keys(), dtype=numpy.int64, count=len(totals))
+            sums = numpy.fromiter(totals.values(), dtype=numpy.int64, count=len(totals))
+            best = numpy.argpartition(-sums, n)[:n]
+            picked = [(int(ids[i]), totals[int(ids[i])]) for i in best]
+            return sorted(picked, key=lambda item: (-item[1], item[0]))
+        return heapq.nsmallest(n, totals.items(), key=lambda item: (-item[1], item[0]))
+
+    def compare(self, current, previous, value='amount'):
+        """{medicine_id: (total in current, total in previous)} for two (from_date, to_date) periods"""
+        now = self.totals_by('medicine', *current, value=value)
+        before = self.totals_by('medicine', *previous, value=value)
+        return {medicine: (now.get(medicine, 0), before.get(medicine, 0)) for medicine in now.keys() | before.keys()}
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Hot/cold archiving for the Pharmacy POS application.
+
+Sales and returns from closed periods (whole months older than
+ARCHIVE_AFTER_MONTHS) are moved out of the live database into one archive
+database per year, stored next to it (pharmacy_archive_2024.db, ...). The
+archive tables are created from the live table definitions; each line's
+sale_batches rows and the sales rollup rows for the archived days move too.
+archive_periods in the live database records every archive file with the
+first and last day it holds.
+
+Reports read the live tables as before. Only when the requested date range
+reaches back into an archived period are the overlapping archive files
+ATTACHed, read through a UNION ALL with the live table, and detached again,
+so day-to-day work never touches the archives.
+"""
+
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import date
+
+import daykey
+
+ARCHIVE_AFTER_MONTHS = 12
+
+# Archived tables and the column that dates each row (sale_batches follows its sale)
+DATE_COLUMNS = {'sales': 'date', 'returns': 'return_date'}
+# Rollups of sales by day (rollup.py): their rows move with the days they cover
+ROLLUPS = {'sales_by_medicine_day': 'day', 'sales_by_hour': 'day'}
+
+_CREATE_TABLE = re.compile(r'^CREATE TABLE\s+"?(\w+)"?', re.IGNORECASE)
+
+
+def create_tables(cursor):
+    """Create the archive registry"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archive_periods (
+            year INTEGER PRIMARY KEY,
+            path TEXT NOT NULL,
+            first_date DATE NOT NULL,
+            last_date DATE NOT NULL
+        )
+    ''')
+
+
+def cutoff(today=None, months=ARCHIVE_AFTER_MONTHS):
+    """First day of the oldest month that stays live"""
+    today = today or date.today()
+    month = today.year * 12 + today.month - 1 - months
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def archive_path(db_path, year):
+    """Archive file for year, next to the live database"""
+    folder, name = os.path.split(os.path.abspath(db_path))
+    return os.path.join(folder, f"{os.path.splitext(name)[0]}_archive_{year}.db")
+
+
+def _resolve(db_path, path):
+    # Registered paths are relative to the live database, so the folder can be moved
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), path)
+
+
+def _columns(cursor, schema, table):
+    cursor.execute(f"PRAGMA {schema}.table_info({table})")
+    return [column[1] for column in cursor.fetchall()]
+
+
+def _copy_schema(cursor, schema, table):
+    """Create schema.table with the live definition (no-op if it exists)"""
+    cursor.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    sql = cursor.fetchone()[0]
+    cursor.execute(_CREATE_TABLE.sub(f"CREATE TABLE IF NOT EXISTS {schema}.{table}", sql, count=1))
+    if table in DATE_COLUMNS:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_{table}_{DATE_COLUMNS[table]} "
+                       f"ON {table} ({DATE_COLUMNS[table]})")
+        daykey.create_index(cursor, schema, table)
+
+
+def _move(cursor, schema, table, where, parameters):
+    """Copy matching live rows into schema.table, then delete them; returns the row count"""
+    columns = ", ".join(column for column in _columns(cursor, "main", table)
+                        if column in _columns(cursor, schema, table))
+    # OR IGNORE: rows copied by an interrupted earlier run are not duplicated
+    cursor.execute(f"INSERT OR IGNORE INTO {schema}.{table} ({columns}) "
+                   f"SELECT {columns} FROM main.{table} WHERE {where}", parameters)
+    cursor.execute(f"DELETE FROM main.{table} WHERE {where}", parameters)
+    return cursor.rowcount
+
+
+def archive(conn, db_path, today=None, months=ARCHIVE_AFTER_MONTHS):
+    """Move sales and returns older than cutoff() into the yearly archives; returns {year: (sales, returns)}"""
+    before = cutoff(today, months).isoformat()
+    cursor = conn.cursor()
+    # ATTACH is not allowed inside a transaction
+    conn.commit()
+    cursor.execute("""
+        SELECT substr(date, 1, 4) FROM sales WHERE date < ?
+        UNION SELECT substr(return_date, 1, 4) FROM returns WHERE return_date < ?
+    """, (before, before))
+    years = sorted(int(row[0]) for row in cursor.fetchall())
+
+    moved = {}
+    for year in years:
+        path = archive_path(db_path, year)
+        # Full dates: a bare '2024' would compare as a number against the DATETIME column
+        start, end = f"{year}-01-01", min(f"{year + 1}-01-01", before)
+        cursor.execute("ATTACH DATABASE ? AS archive_move", (path,))
+        try:
+            for table in ('sales', 'returns', 'sale_batches') + tuple(ROLLUPS):
+                _copy_schema(cursor, "archive_move", table)
+            # Rollup rows first: the sales deleted below then find nothing left to subtract from
+            for table, column in ROLLUPS.items():
+                _move(cursor, "archive_move", table, f"{column} >= ? AND {column} < ?", (start, end))
+            _move(cursor, "archive_move", "sale_batches",
+                  "sale_id IN (SELECT id FROM main.sales WHERE date >= ? AND date < ?)", (start, end))
+            sales = _move(cursor, "archive_move", "sales", "date >= ? AND date < ?", (start, end))
+            returns = _move(cursor, "archive_move", "returns", "return_date >= ? AND return_date < ?", (start, end))
+
+            cursor.execute("""
+                SELECT MIN(first), MAX(last) FROM (
+                    SELECT MIN(date) AS first, MAX(date) AS last FROM archive_move.sales
+                    UNION ALL
+                    SELECT MIN(return_date), MAX(return_date) FROM archive_move.returns
+                )
+            """)
+            first, last = cursor.fetchone()
+            cursor.execute("""
+                INSERT INTO archive_periods (year, path, first_date, last_date) VALUES (?, ?, ?, ?)
+                ON CONFLICT (year) DO UPDATE SET path = excluded.path, first_date = excluded.first_date,
+                                                 last_date = excluded.last_date
+            """, (year, os.path.basename(path), first[:10], last[:10]))
+            conn.commit()
+            moved[year] = (sales, returns)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.execute("DETACH DATABASE archive_move")
+    return moved
+
+
+@contextmanager
+def attached(conn, db_path, from_date, to_date):
+    """Attach the archives holding rows between from_date and to_date; yields their schema names
+
+    Archives already attached to conn (by an enclosing attached()) are used as they are and left attached.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT year, path FROM archive_periods
+        WHERE first_date <= ? AND last_date >= ?
+        ORDER BY year
+    """, (to_date[:10], from_date[:10]))
+    periods = cursor.fetchall()
+    cursor.execute("PRAGMA database_list")
+    present = {row[1] for row in cursor.fetchall()}
+    schemas = []
+    attached_here = []
+    try:
+        for year, path in periods:
+            schema = f"archive_{year}"
+            if schema not in present:
+                path = _resolve(db_path, path)
+                # ATTACH would silently create an empty file in its place
+                if not os.path.exists(path):
+                    raise FileNotFoundError(f"Archive for {year} not found: {path}")
+                cursor.execute("ATTACH DATABASE ? AS ?", (path, schema))
+                attached_here.append(schema)
+            schemas.append(schema)
+        yield schemas
+    finally:
+        for schema in attached_here:
+            cursor.execute(f"DETACH DATABASE {schema}")
+
+
+def backup(conn, db_path, folder):
+    """Copy the live database and every registered archive into folder; returns the files written
+
+    Each copy keeps its file name. archive_periods holds paths relative to the
+    live database, so the copies still find each other when the folder is
+    restored as a whole.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT year, path FROM archive_periods ORDER BY year")
+    periods = cursor.fetchall()
+    for year, path in periods:
+        if not os.path.exists(_resolve(db_path, path)):
+            raise FileNotFoundError(f"Archive for {year} not found: {_resolve(db_path, path)}")
+    os.makedirs(folder, exist_ok=True)
+
+    # SQLite's online backup, so every copy is consistent even mid-transaction
+    copies = [os.path.join(folder, os.path.basename(db_path))]
+    _copy(conn, copies[0])
+    for _, path in periods:
+        source = sqlite3.connect(_resolve(db_path, path))
+        try:
+            copies.append(os.path.join(folder, path))
+            _copy(source, copies[-1])
+        finally:
+            source.close()
+    return copies
+
+
+def _copy(source, path):
+    target = sqlite3.connect(path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+
+
+def union(table, columns, schemas):
+    """FROM source for table: the live table, or the live table UNION ALL the attached archives"""
+    if not schemas:
+        return table
+    return "(" + " UNION ALL ".join(f"SELECT {columns} FROM {schema}.{table}"
+                                    for schema in ["main"] + schemas) + ")"
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Barcode helpers for the Pharmacy POS application.
+
+Numeric GTIN family codes (EAN-8, UPC-A, EAN-13, GTIN-14) are normalized to
+14 digits so that the same product scanned as UPC-A or EAN-13 hits the same
+indexed row. Other codes (internal labels, Code 128 text) are kept as typed.
+"""
+
+GTIN_LENGTHS = (8, 12, 13, 14)
+
+
+def normalize_barcode(code):
+    """Return the canonical form used as the lookup key for a scanned code"""
+    code = "".join(str(code).split())
+    if code.isdigit() and len(code) in GTIN_LENGTHS:
+        return code.zfill(14)
+    return code.upper()
+
+
+def gtin_check_digit(body):
+    """Compute the GS1 check digit for the digits preceding it"""
+    total = 0
+    for position, digit in enumerate(reversed(body)):
+        total += int(digit) * (3 if position % 2 == 0 else 1)
+    return str((10 - total % 10) % 10)
+
+
+def is_valid_gtin(code):
+    """Check the length and check digit of a GTIN family code"""
+    return (code.isdigit() and len(code) in GTIN_LENGTHS
+            and gtin_check_digit(code[:-1]) == code[-1])
+
+
+def parse_barcode_list(text):
+    """Split a comma/space separated list of codes into normalized, de-duplicated codes"""
+    codes = []
+    for part in text.replace(";", ",").split(","):
+        code = normalize_barcode(part)
+        if code and code not in codes:
+            codes.append(code)
+    return codes
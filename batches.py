@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Batch-level stock for the Pharmacy POS application.
+
+Stock is held per delivery in medicine_batches (quantity in units, with the
+batch number and expiry of that delivery). Checkout allocates each line from
+the earliest-expiring unexpired batches first (FEFO) with one window-function
+query, never from expired ones (only stock write-offs take those), records
+what it took in sale_batches, and returns put units back into
+the batches they were sold from. medicines.stock_packs, batch and expiry are
+kept as a summary (total packs, next batch to expire) for the existing
+screens and reports.
+"""
+
+from datetime import date
+
+
+class InsufficientStockError(Exception):
+    """Raised when the batches of a medicine cannot cover a sale"""
+
+
+def create_tables(cursor):
+    """Create the batch and allocation tables with their indexes"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS medicine_batches (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            medicine_id INTEGER NOT NULL,
+            batch TEXT,
+            expiry DATE NOT NULL,
+            qty INTEGER NOT NULL,
+            FOREIGN KEY (medicine_id) REFERENCES medicines (id)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_medicine_batches_fefo ON medicine_batches (medicine_id, expiry)")
+    # Covers expiry scans (reports, reorder) of batches that still hold stock
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_medicine_batches_expiry
+        ON medicine_batches (expiry, medicine_id, qty) WHERE qty > 0
+    """)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sale_batches (
+            sale_id INTEGER NOT NULL,
+            batch_id INTEGER NOT NULL,
+            qty INTEGER NOT NULL,
+            returned INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (sale_id, batch_id)
+        ) WITHOUT ROWID
+    ''')
+
+
+def migrate_stock(cursor, medicine_id=None):
+    """Create a batch holding the current stock of medicines that have none yet"""
+    query = """
+        INSERT INTO medicine_batches (medicine_id, batch, expiry, qty)
+        SELECT m.id, m.batch, m.expiry, m.stock_packs * m.units_per_pack
+        FROM medicines m
+        WHERE NOT EXISTS (SELECT 1 FROM medicine_batches b WHERE b.medicine_id = m.id)
+    """
+    if medicine_id is None:
+        cursor.execute(query)
+    else:
+        cursor.execute(query + " AND m.id = ?", (medicine_id,))
+    return cursor.rowcount
+
+
+def receive(cursor, medicine_id, batch, expiry, units):
+    """Add a delivery as a new batch (or top up the batch with the same number and expiry)"""
+    cursor.execute("""
+        SELECT id FROM medicine_batches
+        WHERE medicine_id = ? AND COALESCE(batch, '') = ? AND expiry = ?
+    """, (medicine_id, batch or "", expiry))
+    existing = cursor.fetchone()
+    if existing:
+        cursor.execute("UPDATE medicine_batches SET qty = qty + ? WHERE id = ?", (units, existing[0]))
+        return existing[0]
+    cursor.execute("INSERT INTO medicine_batches (medicine_id, batch, expiry, qty) VALUES (?, ?, ?, ?)",
+                   (medicine_id, batch, expiry, units))
+    return cursor.lastrowid
+
+
+def plan_allocation(cursor, medicine_id, units, today=None, include_expired=False):
+    """FEFO plan [(batch_id, units)] covering units from unexpired batches (all batches, expired first, if included)"""
+    today = (today or date.today()).isoformat()
+    # Running totals in FEFO order; keep batches until the running total covers the request
+    cursor.execute("""
+        SELECT id, qty, running FROM (
+            SELECT id, qty,
+                   SUM(qty) OVER (ORDER BY expiry, id ROWS UNBOUNDED PRECEDING) AS running
+            FROM medicine_batches
+            WHERE medicine_id = ? AND qty > 0 AND (? OR expiry >= ?)
+        )
+        WHERE running - qty < ?
+    """, (medicine_id, include_expired, today, units))
+    rows = cursor.fetchall()
+    available = rows[-1][2] if rows else 0
+    if available < units:
+        return None, available
+    return [(batch_id, min(qty, units - (running - qty))) for batch_id, qty, running in rows], available
+
+
+def allocate(cursor, sale_id, medicine_id, units, today=None, include_expired=False):
+    """Take units from the medicine's batches (FEFO) for a sale line and record the allocation
+
+    Expired batches are only taken with include_expired (stock write-offs);
+    a sale they would be needed for is refused with the shortfall.
+    """
+    today = today or date.today()
+    plan, available = plan_allocation(cursor, medicine_id, units, today, include_expired)
+    if plan is None and migrate_stock(cursor, medicine_id):
+        # Medicine added outside the application: its stock becomes a batch on first sale
+        plan, available = plan_allocation(cursor, medicine_id, units, today, include_expired)
+    if plan is None:
+        message = f"Insufficient stock: {units} units requested, {available} available"
+        if not include_expired:
+            cursor.execute("""
+                SELECT COALESCE(SUM(qty), 0) FROM medicine_batches
+                WHERE medicine_id = ? AND qty > 0 AND expiry < ?
+            """, (medicine_id, today.isoformat()))
+            expired = cursor.fetchone()[0]
+            if expired:
+                message += f" ({expired} more expired)"
+        raise InsufficientStockError(message)
+    cursor.executemany("UPDATE medicine_batches SET qty = qty - ? WHERE id = ?",
+                       [(taken, batch_id) for batch_id, taken in plan])
+    if sale_id is not None:
+        cursor.executemany("INSERT INTO sale_batches (sale_id, batch_id, qty) VALUES (?, ?, ?)",
+                           [(sale_id, batch_id, taken) for batch_id, taken in plan])
+    return plan
+
+
+def restore(cursor, sale_id, medicine_id, units):
+    """Put returned units back into the batches the sale was allocated from"""
+    cursor.execute("""
+        SELECT sb.batch_id, sb.qty - sb.returned
+        FROM sale_batches sb
+        JOIN medicine_batches b ON b.id = sb.batch_id
+        WHERE sb.sale_id = ? AND sb.qty > sb.returned
+        ORDER BY b.expiry DESC, b.id DESC
+    """, (sale_id,))
+    remaining = units
+    for batch_id, outstanding in cursor.fetchall():
+        put_back = min(remaining, outstanding)
+        cursor.execute("UPDATE medicine_batches SET qty = qty + ? WHERE id = ?", (put_back, batch_id))
+        cursor.execute("UPDATE sale_batches SET returned = returned + ? WHERE sale_id = ? AND batch_id = ?",
+                       (put_back, sale_id, batch_id))
+        remaining -= put_back
+        if not remaining:
+            return
+
+    # Sales made before batch tracking: return to the latest-expiring batch
+    migrate_stock(cursor, medicine_id)
+    cursor.execute("""
+        UPDATE medicine_batches SET qty = qty + ?
+        WHERE id = (SELECT id FROM medicine_batches WHERE medicine_id = ? ORDER BY expiry DESC, id DESC LIMIT 1)
+    """, (remaining, medicine_id))
+
+
+def adjust_stock(cursor, medicine_id, batch, expiry, target_units, today=None):
+    """Apply a stock edit from the medicines form
+
+    Raising the stock with a batch number/expiry different from the batch
+    shown records a new delivery; otherwise the shown batch is corrected.
+    Lowering the stock writes units off in FEFO order, expired batches first.
+    """
+    cursor.execute("SELECT COALESCE(SUM(qty), 0) FROM medicine_batches WHERE medicine_id = ?", (medicine_id,))
+    delta = target_units - cursor.fetchone()[0]
+    shown = current_batch(cursor, medicine_id)
+
+    if delta > 0 and (shown is None or (shown[1] or "", shown[2]) != (batch or "", expiry)):
+        receive(cursor, medicine_id, batch, expiry, delta)
+        return
+    if shown is not None:
+        cursor.execute("UPDATE medicine_batches SET batch = ?, expiry = ? WHERE id = ?", (batch, expiry, shown[0]))
+    if delta > 0:
+        cursor.execute("UPDATE medicine_batches SET qty = qty + ? WHERE id = ?", (delta, shown[0]))
+    elif delta < 0:
+        allocate(cursor, None, medicine_id, -delta, today, include_expired=True)
+
+
+def current_batch(cursor, medicine_id):
+    """(id, batch, expiry) of the next batch to expire that has stock, else the latest batch"""
+    cursor.execute("""
+        SELECT id, batch, expiry FROM medicine_batches
+        WHERE medicine_id = ?
+        ORDER BY qty > 0 DESC, CASE WHEN qty > 0 THEN expiry END, expiry DESC, id DESC
+        LIMIT 1
+    """, (medicine_id,))
+    return cursor.fetchone()
+
+
+def sync_medicines(cursor, medicine_ids, today=None):
+    """Refresh the stock/batch/expiry summary on medicines from their batches
+
+    stock_packs counts sellable (unexpired) units only, as checkout allocates;
+    batch and expiry are those of the next sellable batch, or of the expired
+    stock when nothing sellable is left.
+    """
+    today = (today or date.today()).isoformat()
+    cursor.executemany("""
+        UPDATE medicines SET
+            stock_packs = (SELECT COALESCE(SUM(qty), 0) FROM medicine_batches b
+                           WHERE b.medicine_id = medicines.id AND b.expiry >= :today) / units_per_pack,
+            batch = COALESCE((SELECT b.batch FROM medicine_batches b
+                              WHERE b.medicine_id = medicines.id AND b.qty > 0
+                              ORDER BY b.expiry < :today, b.expiry LIMIT 1), batch),
+            expiry = COALESCE((SELECT b.expiry FROM medicine_batches b
+                               WHERE b.medicine_id = medicines.id AND b.qty > 0
+                               ORDER BY b.expiry < :today, b.expiry LIMIT 1), expiry)
+        WHERE id = :id
+    """, [{'today': today, 'id': medicine_id} for medicine_id in set(medicine_ids)])
+
+
+def sync_expired(cursor, today=None):
+    """Refresh the summary of medicines holding expired stock (at startup and once a batch has expired)"""
+    today = today or date.today()
+    cursor.execute("SELECT DISTINCT medicine_id FROM medicine_batches WHERE qty > 0 AND expiry < ?",
+                   (today.isoformat(),))
+    medicine_ids = [row[0] for row in cursor.fetchall()]
+    sync_medicines(cursor, medicine_ids, today)
+    return len(medicine_ids)
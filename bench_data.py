@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Synthetic dataset generator for benchmarking the Pharmacy POS application.
+
+Builds a pharmacy database with the application's own schema and fills it with
+realistic data: a catalog of medicines with skewed popularity, several years of
+sales grouped into baskets with weekday and hour-of-day patterns, and a small
+share of returns. Scales from a few thousand rows to tens of millions.
+
+Usage:
+    python bench_data.py --out bench.db --medicines 10000 --sales 1000000
+    python bench_data.py --out bench.db --scale large
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+import barcodes
+import batches
+import money
+import reorder
+import trigram_index
+
+# Preset scales (medicines, sales, returns)
+SCALES = {
+    'small': (1000, 100000, 1000),
+    'medium': (20000, 1000000, 10000),
+    'large': (100000, 5000000, 50000),
+    'xlarge': (200000, 20000000, 200000),
+}
+
+STEMS = [
+    "Paracetamol", "Ibuprofen", "Amoxicillin", "Azithromycin", "Cetirizine", "Loratadine",
+    "Omeprazole", "Pantoprazole", "Metformin", "Glimepiride", "Amlodipine", "Losartan",
+    "Atorvastatin", "Rosuvastatin", "Simvastatin", "Aspirin", "Clopidogrel", "Warfarin",
+    "Salbutamol", "Montelukast", "Prednisolone", "Dexamethasone", "Hydrocortisone",
+    "Ciprofloxacin", "Levofloxacin", "Doxycycline", "Metronidazole", "Fluconazole",
+    "Clotrimazole", "Diclofenac", "Naproxen", "Tramadol", "Codeine", "Ranitidine",
+    "Famotidine", "Domperidone", "Ondansetron", "Loperamide", "Lactulose", "Bisacodyl",
+    "Levothyroxine", "Insulin Glargine", "Sitagliptin", "Vildagliptin", "Bisoprolol",
+    "Metoprolol", "Propranolol", "Furosemide", "Hydrochlorothiazide", "Spironolactone",
+    "Enalapril", "Ramipril", "Valsartan", "Sertraline", "Fluoxetine", "Escitalopram",
+    "Amitriptyline", "Diazepam", "Alprazolam", "Gabapentin", "Pregabalin", "Carbamazepine",
+    "Valproate", "Levetiracetam", "Folic Acid", "Ferrous Sulfate", "Vitamin D3",
+    "Vitamin B12", "Calcium Carbonate", "Zinc Sulfate", "Multivitamin", "ORS",
+    "Chlorpheniramine", "Fexofenadine", "Guaifenesin", "Dextromethorphan", "Ambroxol",
+    "Mebendazole", "Albendazole", "Ivermectin", "Acyclovir", "Oseltamivir",
+    "Cefixime", "Cefuroxime", "Ceftriaxone", "Clarithromycin", "Nitrofurantoin",
+    "Tamsulosin", "Finasteride", "Sildenafil", "Allopurinol", "Colchicine",
+    "Methotrexate", "Hydroxychloroquine", "Mefenamic Acid", "Esomeprazole", "Sucralfate",
+]
+STRENGTHS = ["5mg", "10mg", "20mg", "25mg", "50mg", "100mg", "125mg", "250mg", "400mg",
+             "500mg", "625mg", "1g", "2mg/ml", "5mg/5ml", "125mg/5ml", "1%", "2%"]
+FORMS = ["Tablets", "Capsules", "Syrup", "Suspension", "Drops", "Cream", "Ointment",
+         "Gel", "Injection", "Inhaler", "Sachets", "Spray"]
+MAKERS = ["Generic", "Acme", "Medix", "Zenith", "Novaph", "Healix", "Biocare", "Pharmix",
+          "Curewell", "Lifeline", "Sunrise", "Orion"]
+SUPPLIERS = [f"{name} Distributors" for name in
+             ("Alpha", "Beta", "Central", "Delta", "Eastern", "Federal", "Global", "Horizon",
+              "Imperial", "Jade", "Keystone", "Liberty", "Metro", "National", "Omega",
+              "Prime", "Quantum", "Royal", "Summit", "Trinity", "United", "Vertex",
+              "Western", "Xcel", "Zenith")]
+UNITS_PER_PACK = [1, 6, 10, 10, 10, 14, 20, 28, 30, 30, 100]
+RETURN_REASONS = ["", "", "Wrong item", "Damaged pack", "Doctor changed prescription",
+                  "Adverse reaction", "Duplicate purchase", "Expired on arrival"]
+CASHIERS = [("cashier1", "cashier123", "Cashier"), ("cashier2", "cashier123", "Cashier"),
+            ("pharmacist1", "pharma123", "Pharmacist")]
+
+# Relative traffic per weekday (Mon..Sun) and per opening hour (8:00-21:00)
+WEEKDAY_WEIGHTS = [1.0, 0.95, 0.95, 1.0, 1.15, 1.3, 0.7]
+HOUR_WEIGHTS = {8: 0.4, 9: 0.8, 10: 1.1, 11: 1.2, 12: 1.3, 13: 1.1, 14: 0.9, 15: 0.9,
+                16: 1.0, 17: 1.3, 18: 1.5, 19: 1.3, 20: 0.9, 21: 0.5}
+
+BATCH_ROWS = 50000
+
+
+def create_schema(db_path):
+    """Create an empty database with the application's schema"""
+    import headless
+    app = headless.create_app(db_path)
+    app.readers.close()
+    app.conn.close()
+
+
+def medicine_rows(count, rng, today):
+    """Yield medicine rows for the catalog"""
+    for _ in range(count):
+        name = f"{rng.choice(STEMS)} {rng.choice(STRENGTHS)} {rng.choice(FORMS)}"
+        if rng.random() < 0.6:
+            name = f"{name} ({rng.choice(MAKERS)})"
+        units = rng.choice(UNITS_PER_PACK)
+        pack_price = rng.randint(100, 15000)
+        unit_price = money.divide(pack_price, units)
+        batch = f"B{rng.randint(10000, 99999)}" if rng.random() < 0.8 else ""
+        expiry = (today + timedelta(days=rng.randint(-60, 900))).isoformat()
+        stock = rng.choice([0, 2, 5, 8]) if rng.random() < 0.1 else rng.randint(10, 400)
+        yield (name, batch, expiry, stock, units, pack_price, unit_price, rng.choice(SUPPLIERS))
+
+
+def sale_timestamps(count, days, rng, end):
+    """Yield count sale timestamps spread over the last days, oldest first"""
+    start_day = (end - timedelta(days=days - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    day_weights = [WEEKDAY_WEIGHTS[(start_day + timedelta(days=d)).weekday()] for d in range(days)]
+    total_weight = sum(day_weights)
+    hours = list(HOUR_WEIGHTS)
+    hour_weights = list(HOUR_WEIGHTS.values())
+    produced = 0
+    for day_index, weight in enumerate(day_weights):
+        if day_index == days - 1:
+            day_count = count - produced
+        else:
+            day_count = int(round(count * weight / total_weight))
+            day_count = min(day_count, count - produced)
+        if day_count <= 0:
+            continue
+        day = start_day + timedelta(days=day_index)
+        day_hours = sorted(rng.choices(hours, weights=hour_weights, k=day_count))
+        for hour in day_hours:
+            yield day + timedelta(hours=hour, seconds=rng.randint(0, 3599),
+                                  microseconds=rng.randint(0, 999999))
+        produced += day_count
+
+
+def generate(db_path, medicines, sales, returns, days=730, seed=42, quiet=False):
+    """Generate a database at db_path and return row counts"""
+    rng = random.Random(seed)
+    started = time.perf_counter()
+
+    def progress(message):
+        if not quiet:
+            print(f"[{time.perf_counter() - started:7.1f}s] {message}")
+            sys.stdout.flush()
+
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    create_schema(db_path)
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    # Bulk load settings: this is a throwaway benchmark database
+    cursor.execute("PRAGMA journal_mode = OFF")
+    cursor.execute("PRAGMA synchronous = OFF")
+    cursor.execute("PRAGMA cache_size = -200000")
+
+    # Users
+    cursor.executemany("INSERT OR IGNORE INTO users (username, password, role) VALUES (?, ?, ?)", CASHIERS)
+    user_ids = [row[0] for row in cursor.execute("SELECT id FROM users")]
+
+    # Medicines
+    today = datetime.now().date()
+    cursor.executemany("""
+        INSERT INTO medicines (name, batch, expiry, stock_packs, units_per_pack, pack_price, unit_price, supplier)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, medicine_rows(medicines, rng, today))
+    conn.commit()
+    catalog = cursor.execute("SELECT id, units_per_pack, pack_price, unit_price FROM medicines ORDER BY id").fetchall()
+    progress(f"{len(catalog)} medicines")
+
+    # Each medicine's opening stock becomes its first batch
+    batches.migrate_stock(cursor)
+    conn.commit()
+
+    # Trigram index for fuzzy name search
+    trigram_index.index_missing(cursor)
+    conn.commit()
+
+    # Barcodes: an in-store EAN-13 per pack, plus a unit barcode for some split-pack products
+    barcode_rows = []
+    for medicine_id, units_per_pack, _, _ in catalog:
+        body = f"200{medicine_id:09d}"
+        barcode_rows.append((barcodes.normalize_barcode(body + barcodes.gtin_check_digit(body)), medicine_id, "Pack"))
+        if units_per_pack > 1 and rng.random() < 0.3:
+            body = f"210{medicine_id:09d}"
+            barcode_rows.append((barcodes.normalize_barcode(body + barcodes.gtin_check_digit(body)), medicine_id, "Unit"))
+    cursor.executemany("INSERT INTO medicine_barcodes (barcode, medicine_id, sale_type) VALUES (?, ?, ?)", barcode_rows)
+    conn.commit()
+
+    # Zipf-like popularity: a few products account for most of the lines
+    ranks = list(range(len(catalog)))
+    rng.shuffle(ranks)
+    cum_weights = []
+    running = 0.0
+    for rank in ranks:
+        running += 1.0 / (rank + 1) ** 0.9
+        cum_weights.append(running)
+
+    # Sales, generated in baskets of 1-5 lines sharing a timestamp, cashier and invoice number
+    first_sale_id = cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM sales").fetchone()[0]
+
+    def sale_rows():
+        remaining_in_basket = 0
+        basket_time = basket_user = basket_invoice = None
+        picks = []
+        for sale_id, timestamp in enumerate(sale_timestamps(sales, days, rng, datetime.now()), first_sale_id):
+            if remaining_in_basket == 0:
+                remaining_in_basket = rng.choice((1, 1, 1, 2, 2, 3, 4, 5))
+                basket_time = timestamp
+                basket_user = rng.choice(user_ids)
+                basket_invoice = sale_id
+            remaining_in_basket -= 1
+            if not picks:
+                picks = rng.choices(catalog, cum_weights=cum_weights, k=BATCH_ROWS)
+            medicine_id, units_per_pack, pack_price, unit_price = picks.pop()
+            if units_per_pack > 1 and rng.random() < 0.35:
+                sale_type, qty, price = "Unit", rng.randint(1, units_per_pack), unit_price
+            else:
+                sale_type, qty, price = "Pack", rng.choice((1, 1, 1, 2, 3)), pack_price
+            units = qty * units_per_pack if sale_type == "Pack" else qty
+            yield (sale_id, str(basket_time), medicine_id, qty, sale_type, price, qty * price, basket_user,
+                   basket_invoice, units)
+
+    rows = sale_rows()
+    inserted = 0
+    while True:
+        chunk = [row for _, row in zip(range(BATCH_ROWS), rows)]
+        if not chunk:
+            break
+        cursor.executemany("""
+            INSERT INTO sales (id, date, medicine_id, qty, type, price, total, user_id, invoice_no, units)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, chunk)
+        inserted += len(chunk)
+        if inserted % (BATCH_ROWS * 20) == 0:
+            conn.commit()
+            progress(f"{inserted} sales")
+    conn.commit()
+    progress(f"{inserted} sales")
+
+    # Returns reference random sales, a few days after the sale
+    max_sale_id = cursor.execute("SELECT MAX(id) FROM sales").fetchone()[0] or 0
+    return_rows = []
+    if max_sale_id:
+        for sale_id in sorted(rng.sample(range(1, max_sale_id + 1), min(returns, max_sale_id))):
+            sale_date, medicine_id, qty, sale_type, price = cursor.execute(
+                "SELECT date, medicine_id, qty, type, price FROM sales WHERE id = ?", (sale_id,)).fetchone()
+            return_qty = rng.randint(1, qty)
+            return_date = datetime.fromisoformat(sale_date) + timedelta(days=rng.randint(0, 7),
+                                                                        minutes=rng.randint(0, 600))
+            return_rows.append((sale_id, medicine_id, str(return_date), return_qty, sale_type,
+                                rng.choice(RETURN_REASONS), return_qty * price))
+    cursor.executemany("""
+        INSERT INTO returns (sale_id, medicine_id, return_date, return_qty, return_type, reason, refunded_amount)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, return_rows)
+    cursor.executemany("UPDATE sales SET returned_qty = returned_qty + ? WHERE id = ?",
+                       [(row[3], row[0]) for row in return_rows])
+    conn.commit()
+    progress(f"{len(return_rows)} returns")
+
+    # Demand rates for reorder suggestions, as if every sale had gone through checkout
+    reorder.rebuild(cursor)
+    conn.commit()
+
+    cursor.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    progress(f"done: {db_path} ({os.path.getsize(db_path) / 1024 / 1024:.1f} MB)")
+    return {'medicines': len(catalog), 'sales': inserted, 'returns': len(return_rows)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Pharmacy POS database")
+    parser.add_argument("--out", default="bench.db", help="database file to create (overwritten)")
+    parser.add_argument("--scale", choices=sorted(SCALES), help="preset dataset size")
+    parser.add_argument("--medicines", type=int, help="number of medicines")
+    parser.add_argument("--sales", type=int, help="number of sale lines")
+    parser.add_argument("--returns", type=int, help="number of returns")
+    parser.add_argument("--days", type=int, default=730, help="days of sales history")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    args = parser.parse_args()
+
+    medicines, sales, returns = SCALES[args.scale or 'small']
+    medicines = args.medicines if args.medicines is not None else medicines
+    sales = args.sales if args.sales is not None else sales
+    returns = args.returns if args.returns is not None else returns
+
+    generate(args.out, medicines, sales, returns, days=args.days, seed=args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Headless benchmark runner for the Pharmacy POS hot paths.
+
+Drives the real PharmacyPOS methods through the headless harness against a
+database (typically one built with bench_data.py) and reports per-operation
+latency statistics as JSON, so results can be compared across versions.
+
+Usage:
+    python bench_data.py --out bench.db --scale medium
+    python benchmark.py --db bench.db --repeat 20 --out results.json
+    python benchmark.py --compare old.json new.json
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import headless
+import shards
+
+MISS_TERM = "zzqxv"
+
+
+def summarize(samples):
+    """Latency statistics (milliseconds) for a list of durations in seconds"""
+    ordered = sorted(samples)
+    count = len(ordered)
+
+    def pct(p):
+        return ordered[max(0, math.ceil(p / 100.0 * count) - 1)] * 1000
+
+    return {
+        'count': count,
+        'mean_ms': sum(ordered) / count * 1000,
+        'min_ms': ordered[0] * 1000,
+        'p50_ms': pct(50),
+        'p95_ms': pct(95),
+        'p99_ms': pct(99),
+        'max_ms': ordered[-1] * 1000,
+    }
+
+
+def timed_call(func, *args):
+    started = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started
+
+
+class Benchmark:
+    """Runs each benchmark case against one headless application instance"""
+
+    def __init__(self, db_path, repeat, seed=1):
+        self.app = headless.create_app(db_path)
+        headless.messagebox.clear()
+        self.repeat = repeat
+        self.rng = random.Random(seed)
+        self.results = {}
+        cursor = self.app.conn.cursor()
+        names = [row[0] for row in cursor.execute(
+            "SELECT name FROM medicines WHERE stock_packs > 5 AND expiry > date('now') ORDER BY RANDOM() LIMIT 50")]
+        if not names:
+            raise RuntimeError("Benchmark database has no medicines in stock; generate one with bench_data.py")
+        self.names = names
+        self.sale_ids = [row[0] for row in cursor.execute("SELECT id FROM sales ORDER BY RANDOM() LIMIT 50")]
+
+    def search_terms(self):
+        """Prefix, substring, full-name and miss terms, cycled to the repeat count"""
+        terms = []
+        for name in self.names:
+            terms.append(name[:4])
+            middle = len(name) // 3
+            terms.append(name[middle:middle + 5])
+            terms.append(name)
+        terms.append(MISS_TERM)
+        self.rng.shuffle(terms)
+        return [terms[i % len(terms)] for i in range(self.repeat)]
+
+    def record(self, case, samples):
+        errors = headless.messagebox.errors()
+        result = summarize(samples)
+        if errors:
+            result['errors'] = len(errors)
+            result['last_error'] = errors[-1]
+        headless.messagebox.clear()
+        self.results[case] = result
+
+    def select_medicine(self, name):
+        headless.set_entry(self.app.sales_search_entry, name)
+        self.app.search_medicine_for_sale()
+
+    def bench_medicine_search(self):
+        samples = []
+        for term in self.search_terms():
+            headless.set_entry(self.app.sales_search_entry, term)
+            samples.append(timed_call(self.app.search_medicine_for_sale))
+        self.record('sales.medicine_search', samples)
+
+        samples = []
+        for term in self.search_terms():
+            headless.set_entry(self.app.search_entry, term)
+            samples.append(timed_call(self.app.search_medicines))
+        self.record('medicines.search', samples)
+
+        # Misspelled names (one character dropped) exercise the trigram fallback
+        samples = []
+        for i in range(self.repeat):
+            name = self.names[i % len(self.names)]
+            cut = self.rng.randrange(1, max(2, len(name) - 1))
+            headless.set_entry(self.app.sales_search_entry, name[:cut] + name[cut + 1:])
+            samples.append(timed_call(self.app.search_medicine_for_sale))
+        self.record('sales.fuzzy_search', samples)
+
+        samples = [timed_call(self.app.load_medicines) for _ in range(max(1, self.repeat // 4))]
+        self.record('medicines.load_all', samples)
+
+    def bench_add_to_cart(self):
+        samples = []
+        self.app.clear_cart()
+        for i in range(self.repeat):
+            self.select_medicine(self.rng.choice(self.names))
+            self.app.sale_type_var.set("Pack")
+            headless.set_entry(self.app.quantity_entry, "1")
+            samples.append(timed_call(self.app.add_to_cart))
+            if len(self.app.cart_items) >= 5:
+                self.app.clear_cart()
+        self.app.clear_cart()
+        self.record('sales.add_to_cart', samples)
+
+    def bench_scan(self):
+        codes = [row[0] for row in self.app.conn.execute(
+            "SELECT barcode FROM medicine_barcodes ORDER BY RANDOM() LIMIT 50")]
+        if not codes:
+            return
+        samples = []
+        self.app.clear_cart()
+        for i in range(self.repeat):
+            samples.append(timed_call(self.app.scan_barcode, self.rng.choice(codes)))
+            if len(self.app.cart_items) >= 10:
+                self.app.clear_cart()
+        self.app.clear_cart()
+        self.record('sales.scan_to_line', samples)
+
+    def bench_checkout(self):
+        samples = []
+        for _ in range(self.repeat):
+            self.app.clear_cart()
+            for name in self.rng.sample(self.names, 3):
+                self.select_medicine(name)
+                self.app.sale_type_var.set(self.rng.choice(("Pack", "Unit")))
+                headless.set_entry(self.app.quantity_entry, "1")
+                self.app.add_to_cart()
+            samples.append(timed_call(self.app.checkout))
+        self.app.clear_cart()
+        self.record('sales.checkout', samples)
+
+    def bench_returns_search(self):
+        terms = [str(sale_id) for sale_id in self.sale_ids[:10]] + [name[:5] for name in self.names[:10]] + [""]
+        samples = []
+        for i in range(self.repeat):
+            headless.set_entry(self.app.return_search_entry, terms[i % len(terms)])
+            samples.append(timed_call(self.app.search_sales_for_return))
+        self.record('returns.search', samples)
+
+    def bench_reports(self):
+        today = datetime.now().date()
+        ranges = {'30d': today - timedelta(days=29), '365d': today - timedelta(days=364)}
+        report_types = list(self.app.report_type_menu.cget('values'))
+        runs = max(1, self.repeat // 4)
+        for report_type in report_types:
+            for range_name, from_date in ranges.items():
+                self.app.report_type_var.set(report_type)
+                headless.set_entry(self.app.from_date_entry, from_date.isoformat())
+                headless.set_entry(self.app.to_date_entry, today.isoformat())
+                case = report_type.lower().replace(' ', '_')
+                self.record(f'reports.{case}.{range_name}', self.cold_reports(runs))
+                # Cached: the last cold run stored the report, so these are served from report_cache
+                samples = [timed_call(self.app.view_report) for _ in range(runs)]
+                self.record(f'reports.{case}.{range_name}.cached', samples)
+
+    def cold_reports(self, runs):
+        """Samples of building the selected report, with the report cache emptied before each"""
+        samples = []
+        for _ in range(runs):
+            self.app.cursor.execute("DELETE FROM report_cache")
+            self.app.conn.commit()
+            samples.append(timed_call(self.app.view_report))
+        return samples
+
+    def bench_shards(self):
+        """365-day reports summed in-process and over month shards in worker processes"""
+        today = datetime.now().date()
+        runs = max(1, self.repeat // 4)
+        default = self.app.report_shards
+        try:
+            for mode, workers in (('inline', 1), ('sharded', max(2, shards.CPU_WORKERS))):
+                self.app.report_shards = shards.ShardedReports(self.app.db_path, workers)
+                try:
+                    for report_type in ("Daily Sales", "Top Sellers"):
+                        self.app.report_type_var.set(report_type)
+                        headless.set_entry(self.app.from_date_entry, (today - timedelta(days=364)).isoformat())
+                        headless.set_entry(self.app.to_date_entry, today.isoformat())
+                        # Start the worker processes before timing
+                        self.cold_reports(1)
+                        case = report_type.lower().replace(' ', '_')
+                        self.record(f'reports.{case}.365d.{mode}', self.cold_reports(runs))
+                finally:
+                    self.app.report_shards.close()
+        finally:
+            self.app.report_shards = default
+
+    def bench_dashboard(self):
+        samples = [timed_call(self.app.refresh_dashboard) for _ in range(self.repeat)]
+        self.record('dashboard.refresh', samples)
+
+    def bench_backup(self):
+        backup_dir = os.path.dirname(os.path.abspath(self.app.db_path))
+        samples = []
+        for _ in range(min(3, self.repeat)):
+            samples.append(timed_call(self.app.backup_database))
+            for path in glob.glob(os.path.join(backup_dir, "pharmacy_backup_*")):
+                shutil.rmtree(path)
+        self.record('backup', samples)
+
+    CASES = {
+        'search': 'bench_medicine_search',
+        'cart': 'bench_add_to_cart',
+        'scan': 'bench_scan',
+        'checkout': 'bench_checkout',
+        'returns': 'bench_returns_search',
+        'reports': 'bench_reports',
+        'shards': 'bench_shards',
+        'dashboard': 'bench_dashboard',
+        'backup': 'bench_backup',
+    }
+
+    def run(self, cases=None):
+        for case in cases or self.CASES:
+            getattr(self, self.CASES[case])()
+        return self.results
+
+
+def database_info(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                  for table in ("medicines", "sales", "returns")}
+    finally:
+        conn.close()
+    counts['size_bytes'] = os.path.getsize(db_path)
+    return counts
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_benchmark(db_path, repeat=20, cases=None, label=None, in_place=False):
+    """Benchmark db_path (on a scratch copy unless in_place) and return the JSON-ready result"""
+    work_dir = None
+    target = db_path
+    if not in_place:
+        # Checkout and backup write to the database, so work on a copy
+        work_dir = tempfile.mkdtemp(prefix="pos_bench_")
+        target = os.path.join(work_dir, "pharmacy.db")
+        source = sqlite3.connect(db_path)
+        copy = sqlite3.connect(target)
+        source.backup(copy)
+        copy.close()
+        source.close()
+    try:
+        info = database_info(target)
+        started = time.perf_counter()
+        bench = Benchmark(target, repeat)
+        results = bench.run(cases)
+        bench.app.conn.close()
+        return {
+            'meta': {
+                'label': label,
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'platform': platform.platform(),
+                'repeat': repeat,
+                'duration_s': round(time.perf_counter() - started, 3),
+                'database': info,
+            },
+            'results': results,
+        }
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def compare(old_path, new_path):
+    """Print p50/p95 changes between two benchmark result files"""
+    with open(old_path) as f:
+        old = json.load(f)['results']
+    with open(new_path) as f:
+        new = json.load(f)['results']
+    print(f"{'Case':<40}{'p50 old':>10}{'p50 new':>10}{'change':>9}{'p95 old':>10}{'p95 new':>10}{'change':>9}")
+    print("-" * 98)
+    for case in sorted(set(old) | set(new)):
+        if case not in old or case not in new:
+            print(f"{case:<40}{'(only in ' + ('new' if case in new else 'old') + ')':>20}")
+            continue
+        row = f"{case:<40}"
+        for key in ('p50_ms', 'p95_ms'):
+            before, after = old[case][key], new[case][key]
+            change = (after - before) / before * 100 if before else 0.0
+            row += f"{before:>10.2f}{after:>10.2f}{change:>+8.0f}%"
+        print(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Pharmacy POS hot paths headlessly")
+    parser.add_argument("--db", default="bench.db", help="database to benchmark")
+    parser.add_argument("--repeat", type=int, default=20, help="iterations per case")
+    parser.add_argument("--cases", help="comma-separated subset of: " + ", ".join(Benchmark.CASES))
+    parser.add_argument("--label", help="free-form label stored in the results")
+    parser.add_argument("--out", help="write JSON results to this file (default: stdout)")
+    parser.add_argument("--in-place", action="store_true", help="benchmark the database itself instead of a copy")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    if not os.path.exists(args.db):
+        print(f"Database {args.db} not found. Create one with: python bench_data.py --out {args.db}",
+              file=sys.stderr)
+        return 1
+
+    cases = args.cases.split(",") if args.cases else None
+    unknown = [case for case in cases or [] if case not in Benchmark.CASES]
+    if unknown:
+        print(f"Unknown cases: {', '.join(unknown)}", file=sys.stderr)
+        return 1
+
+    result = run_benchmark(args.db, args.repeat, cases, args.label, args.in_place)
+    output = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    # Human-readable summary on stderr so stdout stays valid JSON
+    for case, stats in result['results'].items():
+        note = f"  ({stats['errors']} errors)" if stats.get('errors') else ""
+        print(f"{case:<40} p50 {stats['p50_ms']:9.2f} ms   p95 {stats['p95_ms']:9.2f} ms{note}",
+              file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Day keys for the Pharmacy POS application.
+
+sales and returns carry day_key, the day of the row as an integer YYYYMMDD
+(20240110), next to their datetime text. It is a VIRTUAL generated column:
+nothing is added to the row, the value is stored only in its index, and
+SQLite keeps it right whenever the date changes. Reports filter and group on
+day_key, so a day range is a range scan of the index and a daily total is
+read from the index alone, instead of applying date() to every row and
+comparing text against '... 23:59:59'.
+
+The text timestamps stay as they are: they are shown in the returns list and
+on receipts, order the keyset paging of the returns search and date the
+archives.
+"""
+
+from datetime import date, datetime
+
+EXPRESSION = "CAST(strftime('%Y%m%d', {column}) AS INTEGER)"
+
+# Indexed columns per dated table; sales also covers the totals summed per day
+INDEXES = {
+    'sales': "day_key, total",
+    'returns': "day_key",
+}
+
+
+def column_definition(column):
+    """Column definition of day_key over the datetime column"""
+    return f"day_key INTEGER GENERATED ALWAYS AS ({EXPRESSION.format(column=column)}) VIRTUAL"
+
+
+def create_index(cursor, schema, table):
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_{table}_day_key ON {table} ({INDEXES[table]})")
+
+
+def day_key(value):
+    """20240110 for a date, a datetime or ISO text starting '2024-01-10'; raises ValueError otherwise"""
+    if isinstance(value, datetime):
+        value = value.date()
+    elif not isinstance(value, date):
+        value = date.fromisoformat(str(value)[:10])
+    return value.year * 10000 + value.month * 100 + value.day
+
+
+def day_text(key):
+    """'2024-01-10' for 20240110"""
+    return f"{key // 10000:04d}-{key // 100 % 100:02d}-{key % 100:02d}"
+
+
+def month_text(key):
+    """'2024-01' for the month key 202401 (a day key divided by 100)"""
+    return f"{key // 100:04d}-{key % 100:02d}"
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Expiry horizon for the Pharmacy POS application.
+
+expiry_buckets holds, for every expiry day, the number of batches with stock
+that expire on it. Triggers on medicine_batches keep it current as stock is
+received, sold, returned or written off, so it never needs a scan of the
+batches. ExpiryHorizon mirrors the buckets in memory as a sorted day list with
+running totals: the expired / 7 / 30 / 90 day counts for a given day are
+worked out once and then served from a cache, and the date on which the next
+batch crosses one of those thresholds is known in advance, so alerts can be
+scheduled for that moment instead of polling.
+"""
+
+import bisect
+from datetime import date, timedelta
+
+HORIZONS = (7, 30, 90)
+
+# Counts are "expiry <= today + offset"; expired stock is "expiry <= yesterday"
+_OFFSETS = {'expired': -1, 7: 7, 30: 30, 90: 90}
+
+
+def create_tables(cursor):
+    """Create the bucket table and the triggers that maintain it (filled from existing batches)"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'expiry_buckets'")
+    is_new = cursor.fetchone() is None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS expiry_buckets (
+            day DATE PRIMARY KEY,
+            batches INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    add = '''
+        INSERT INTO expiry_buckets (day, batches) VALUES (NEW.expiry, 1)
+        ON CONFLICT (day) DO UPDATE SET batches = batches + 1;
+    '''
+    remove = '''
+        UPDATE expiry_buckets SET batches = batches - 1 WHERE day = OLD.expiry;
+        DELETE FROM expiry_buckets WHERE day = OLD.expiry AND batches <= 0;
+    '''
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_expiry_buckets_insert
+        AFTER INSERT ON medicine_batches WHEN NEW.qty > 0
+        BEGIN {add} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_expiry_buckets_delete
+        AFTER DELETE ON medicine_batches WHEN OLD.qty > 0
+        BEGIN {remove} END
+    ''')
+    # An update only moves a bucket when the batch gains/loses its stock or changes expiry
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_expiry_buckets_update_out
+        AFTER UPDATE OF qty, expiry ON medicine_batches
+        WHEN OLD.qty > 0 AND (NEW.qty <= 0 OR NEW.expiry IS NOT OLD.expiry)
+        BEGIN {remove} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_expiry_buckets_update_in
+        AFTER UPDATE OF qty, expiry ON medicine_batches
+        WHEN NEW.qty > 0 AND (OLD.qty <= 0 OR NEW.expiry IS NOT OLD.expiry)
+        BEGIN {add} END
+    ''')
+    if is_new:
+        rebuild(cursor)
+
+
+def rebuild(cursor):
+    """Recount the buckets from the batches (startup, or after bulk loads that bypass the triggers)"""
+    cursor.execute("DELETE FROM expiry_buckets")
+    cursor.execute("""
+        INSERT INTO expiry_buckets (day, batches)
+        SELECT expiry, COUNT(*) FROM medicine_batches WHERE qty > 0 GROUP BY expiry
+    """)
+
+
+class ExpiryHorizon:
+    """In-memory running totals over expiry_buckets"""
+
+    def __init__(self):
+        self.days = []           # sorted expiry days (ISO strings)
+        self.running = []        # batches expiring on or before days[i]
+        self.version = None
+        self._counts = {}        # today -> counts, for the loaded version
+
+    def refresh(self, conn):
+        """Reload the buckets if the database changed since the last load"""
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA data_version")
+        # data_version covers other connections, total_changes this one
+        version = (cursor.fetchone()[0], conn.total_changes)
+        if version != self.version:
+            self.load(cursor)
+            self.version = version
+
+    def load(self, cursor):
+        cursor.execute("SELECT day, batches FROM expiry_buckets ORDER BY day")
+        days, running, total = [], [], 0
+        for day, count in cursor.fetchall():
+            total += count
+            days.append(day)
+            running.append(total)
+        self.days, self.running = days, running
+        self._counts = {}
+
+    def _through(self, day):
+        """Batches expiring on or before day"""
+        index = bisect.bisect_right(self.days, day.isoformat())
+        return self.running[index - 1] if index else 0
+
+    def counts(self, today):
+        """{'expired': n, 7: n, 30: n, 90: n} batches with stock, cumulative from the past"""
+        counts = self._counts.get(today)
+        if counts is None:
+            counts = {key: self._through(today + timedelta(days=offset)) for key, offset in _OFFSETS.items()}
+            self._counts = {today: counts}
+        return counts
+
+    def next_crossing(self, today):
+        """Earliest day after today on which a batch enters one of the horizons, or None"""
+        crossing = None
+        for offset in _OFFSETS.values():
+            index = bisect.bisect_right(self.days, (today + timedelta(days=offset)).isoformat())
+            if index < len(self.days):
+                try:
+                    candidate = date.fromisoformat(self.days[index][:10]) - timedelta(days=offset)
+                except ValueError:
+                    # Hand-typed expiry that is not an ISO date: it can never be scheduled
+                    continue
+                if crossing is None or candidate < crossing:
+                    crossing = candidate
+        return crossing
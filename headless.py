@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Headless harness for driving the Pharmacy POS application without a display.
+
+install() swaps the Tk widgets and dialogs used by main_fixed for lightweight
+stand-ins, so the real PharmacyPOS methods (searches, cart, checkout, returns,
+reports, backup) can be exercised by benchmarks and load tests. The stand-ins
+keep just enough state (entry text, treeview rows, selection, variables) for
+the application code to run unchanged.
+
+Tests create their databases with create_temp_app() or temp_path(): each
+gets a new temporary folder that is removed when the process exits.
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+import tkinter
+import tkinter.constants
+
+import main_fixed
+
+
+def _noop(*args, **kwargs):
+    return None
+
+
+def _zero(*args, **kwargs):
+    return 0
+
+
+class StubWidget:
+    """Stand-in for any Tk/ttk widget (entries, text, treeviews, windows...)"""
+
+    def __init__(self, master=None, *args, **kwargs):
+        self.master = master
+        self.options = dict(kwargs)
+        self._text = ""
+        self._rows = {}
+        self._order = []
+        self._selection = ()
+        self._next_iid = 0
+
+    def __getattr__(self, name):
+        # Geometry, binding, styling and window-manager calls are all no-ops
+        if name.startswith('winfo_'):
+            return _zero
+        return _noop
+
+    def config(self, *args, **kwargs):
+        # ttk.Style.configure(style, **options) passes the style name first
+        if not args:
+            self.options.update(kwargs)
+
+    configure = config
+
+    def cget(self, option):
+        return self.options.get(option)
+
+    def __setitem__(self, option, value):
+        self.options[option] = value
+
+    def __getitem__(self, option):
+        return self.options.get(option)
+
+    # Entry / Text behaviour
+    def get(self, *args):
+        return self._text
+
+    def insert(self, *args, **kwargs):
+        if 'values' in kwargs or 'iid' in kwargs or 'text' in kwargs:
+            # Treeview.insert(parent, index, ...)
+            return self._insert_row(args[1], kwargs)
+        index = args[0]
+        text = str(args[1]) if len(args) > 1 else ""
+        if index in (0, '0', 1.0, '1.0'):
+            self._text = text + self._text
+        else:
+            self._text += text
+
+    def delete(self, *args):
+        if args and args[0] in self._rows:
+            for iid in args:
+                self._rows.pop(iid, None)
+                if iid in self._order:
+                    self._order.remove(iid)
+            self._selection = tuple(iid for iid in self._selection if iid in self._rows)
+        else:
+            self._text = ""
+
+    # Treeview behaviour
+    def _insert_row(self, index, kwargs):
+        iid = kwargs.get('iid')
+        if iid is None:
+            self._next_iid += 1
+            iid = f"I{self._next_iid:03X}"
+        self._rows[iid] = {'text': kwargs.get('text', ''), 'values': list(kwargs.get('values', ())),
+                           'tags': kwargs.get('tags', '')}
+        if index in ('end', tkinter.END):
+            self._order.append(iid)
+        else:
+            self._order.insert(int(index), iid)
+        return iid
+
+    def get_children(self, item=''):
+        return tuple(self._order)
+
+    def item(self, iid, option=None, **kwargs):
+        row = self._rows[iid]
+        if kwargs:
+            if 'values' in kwargs:
+                kwargs['values'] = list(kwargs['values'])
+            row.update(kwargs)
+            return None
+        if option is not None:
+            return row.get(option)
+        return dict(row)
+
+    def exists(self, iid):
+        return iid in self._rows
+
+    def index(self, iid):
+        return self._order.index(iid)
+
+    def selection(self):
+        return self._selection
+
+    def selection_set(self, *items):
+        if len(items) == 1 and isinstance(items[0], (list, tuple)):
+            items = items[0]
+        self._selection = tuple(items)
+
+    def selection_remove(self, *items):
+        self._selection = tuple(iid for iid in self._selection if iid not in items)
+
+
+class StubVar:
+    """Stand-in for StringVar/IntVar/BooleanVar/DoubleVar"""
+
+    def __init__(self, master=None, value=None, name=None):
+        self._value = value
+
+    def get(self):
+        return self._value
+
+    def set(self, value):
+        self._value = value
+
+    def __getattr__(self, name):
+        return _noop
+
+
+class _StubModule:
+    """Stand-in for the tkinter / ttk modules: every class name is a StubWidget"""
+
+    def __init__(self):
+        for name in dir(tkinter.constants):
+            if name.isupper():
+                setattr(self, name, getattr(tkinter.constants, name))
+        self.TclError = tkinter.TclError
+
+    def __getattr__(self, name):
+        if name.endswith('Var'):
+            return StubVar
+        return StubWidget
+
+
+class HeadlessMessagebox:
+    """Records dialogs per thread instead of showing them"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self.answer = True
+
+    @property
+    def messages(self):
+        if not hasattr(self._local, 'messages'):
+            self._local.messages = []
+        return self._local.messages
+
+    def _record(self, kind, title, message=None, **kwargs):
+        self.messages.append((kind, title, message))
+        return self.answer
+
+    def showinfo(self, title=None, message=None, **kwargs):
+        return self._record('info', title, message)
+
+    def showwarning(self, title=None, message=None, **kwargs):
+        return self._record('warning', title, message)
+
+    def showerror(self, title=None, message=None, **kwargs):
+        return self._record('error', title, message)
+
+    def __getattr__(self, name):
+        # askyesno, askokcancel, askquestion...
+        if name.startswith('ask'):
+            return lambda title=None, message=None, **kwargs: self._record(name, title, message)
+        raise AttributeError(name)
+
+    def errors(self):
+        """Error messages recorded on the current thread"""
+        return [message for kind, _, message in self.messages if kind == 'error']
+
+    def clear(self):
+        self.messages.clear()
+
+
+messagebox = HeadlessMessagebox()
+_installed = False
+
+
+def install():
+    """Replace the GUI toolkit used by main_fixed with headless stand-ins"""
+    global _installed
+    if not _installed:
+        main_fixed.tk = _StubModule()
+        main_fixed.ttk = _StubModule()
+        main_fixed.messagebox = messagebox
+        _installed = True
+
+
+def create_app(db_path='pharmacy.db', username='admin', password='admin123'):
+    """Create a headless PharmacyPOS on db_path and log in"""
+    install()
+    app = main_fixed.PharmacyPOS(StubWidget(), db_path=db_path)
+    set_entry(app.username_entry, username)
+    set_entry(app.password_entry, password)
+    app.login()
+    if not app.current_user:
+        raise RuntimeError(f"Headless login failed for user {username!r}")
+    return app
+
+
+def temp_folder():
+    """A new temporary folder, removed with its contents when the process exits"""
+    folder = tempfile.mkdtemp(prefix="pharmacy_pos_")
+    atexit.register(shutil.rmtree, folder, ignore_errors=True)
+    return folder
+
+
+def temp_path(name="pharmacy.db"):
+    """Path of name in a new temporary folder (see temp_folder())"""
+    return os.path.join(temp_folder(), name)
+
+
+def create_temp_app(**kwargs):
+    """create_app() on a new database in a temporary folder"""
+    return create_app(temp_path(), **kwargs)
+
+
+def set_entry(entry, text):
+    """Replace the text of an entry widget"""
+    entry.delete(0, tkinter.END)
+    entry.insert(0, text)
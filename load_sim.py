@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Multi-cashier load simulator for the Pharmacy POS application.
+
+Spawns N tills (threads or processes) against one database. Each till runs
+scripted sessions through the real application code (search, add lines,
+checkout, occasionally a return) with think time between steps, retrying
+operations that fail with "database is locked". The report shows throughput,
+latency percentiles per operation, lock errors and retries, which tells us how
+many lanes one store machine can support.
+
+Usage:
+    python bench_data.py --out bench.db --scale small
+    python load_sim.py --db bench.db --tills 4 --duration 60
+    python load_sim.py --db bench.db --tills 8 --mode process --think-ms 0 --out load.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import benchmark
+import headless
+
+OPERATIONS = ("search", "add_to_cart", "checkout", "return_search", "process_return")
+
+
+def _is_locked(message):
+    return "locked" in message or "busy" in message
+
+
+class Till:
+    """One simulated cashier lane with its own application instance and connection"""
+
+    def __init__(self, till_id, db_path, options):
+        self.till_id = till_id
+        self.options = options
+        self.rng = random.Random(options['seed'] + till_id)
+        self.app = headless.create_app(db_path)
+        self.app.conn.execute(f"PRAGMA busy_timeout = {int(options['busy_timeout_ms'])}")
+        self.names = [row[0] for row in self.app.conn.execute(
+            "SELECT name FROM medicines WHERE stock_packs > 20 AND expiry > date('now') ORDER BY RANDOM() LIMIT 200")]
+        if not self.names:
+            raise RuntimeError("No medicines with stock; generate a database with bench_data.py")
+        self.last_sale_id = None
+        self.latencies = {operation: [] for operation in OPERATIONS}
+        self.counters = {'sessions': 0, 'checkouts': 0, 'returns': 0, 'locked_errors': 0,
+                         'retries': 0, 'failed_operations': 0, 'stock_rejections': 0, 'other_errors': 0}
+
+    def think(self):
+        mean_ms = self.options['think_ms']
+        if mean_ms > 0:
+            time.sleep(self.rng.expovariate(1000.0 / mean_ms))
+
+    def attempt(self, operation, func):
+        """Run func, retrying while it reports a locked database; returns True on success"""
+        started = time.perf_counter()
+        for attempt in range(self.options['max_retries'] + 1):
+            headless.messagebox.clear()
+            try:
+                func()
+                errors = headless.messagebox.errors()
+            except sqlite3.OperationalError as e:
+                # Read paths without their own error handling raise straight through
+                errors = [str(e)]
+            if not errors:
+                self.latencies[operation].append(time.perf_counter() - started)
+                return True
+            if any(_is_locked(message) for message in errors):
+                self.counters['locked_errors'] += 1
+                if attempt < self.options['max_retries']:
+                    self.counters['retries'] += 1
+                    # Exponential backoff with jitter
+                    time.sleep(self.rng.uniform(0.5, 1.0) * 0.01 * (2 ** attempt))
+                    continue
+            elif any("Insufficient stock" in message for message in errors):
+                self.counters['stock_rejections'] += 1
+                return False
+            else:
+                self.counters['other_errors'] += 1
+            break
+        self.counters['failed_operations'] += 1
+        return False
+
+    def run_session(self):
+        app = self.app
+        app.clear_cart()
+        for _ in range(self.rng.randint(1, self.options['max_lines'])):
+            headless.set_entry(app.sales_search_entry, self.rng.choice(self.names))
+            self.attempt('search', app.search_medicine_for_sale)
+            self.think()
+            app.sale_type_var.set(self.rng.choice(("Pack", "Pack", "Unit")))
+            headless.set_entry(app.quantity_entry, str(self.rng.choice((1, 1, 2))))
+            self.attempt('add_to_cart', app.add_to_cart)
+            self.think()
+        if app.cart_items and self.attempt('checkout', app.checkout):
+            self.counters['checkouts'] += 1
+            # lastrowid only changes on INSERT, so it is the last sale line just written
+            self.last_sale_id = app.cursor.lastrowid
+        self.think()
+
+        if self.last_sale_id and self.rng.random() < self.options['return_rate']:
+            sale_id = self.last_sale_id
+            headless.set_entry(app.return_search_entry, str(sale_id))
+            self.attempt('return_search', app.search_sales_for_return)
+            matches = [iid for iid in app.sales_tree.get_children()
+                       if app.sales_tree.item(iid)['values'][0] == sale_id]
+            if matches:
+                app.sales_tree.selection_set(matches[0])
+                headless.set_entry(app.return_qty_entry, "1")
+                if self.attempt('process_return', app.process_return):
+                    self.counters['returns'] += 1
+                    self.last_sale_id = None
+            self.think()
+        self.counters['sessions'] += 1
+
+    def run(self, deadline, max_sessions):
+        while time.time() < deadline and (not max_sessions or self.counters['sessions'] < max_sessions):
+            self.run_session()
+        self.app.conn.close()
+        return {'latencies': self.latencies, 'counters': self.counters}
+
+
+def run_till(args):
+    """Worker entry point (must be top level so process pools can pickle it)"""
+    till_id, db_path, options, deadline = args
+    headless.install()
+    till = Till(till_id, db_path, options)
+    return till.run(deadline, options['sessions'])
+
+
+def simulate(db_path, tills=4, mode='thread', duration=30.0, sessions=0, think_ms=200.0,
+             return_rate=0.1, max_lines=5, max_retries=5, busy_timeout_ms=5000, seed=7):
+    """Run the simulation and return an aggregated JSON-ready report"""
+    options = {'think_ms': think_ms, 'return_rate': return_rate, 'max_lines': max_lines,
+               'max_retries': max_retries, 'busy_timeout_ms': busy_timeout_ms, 'seed': seed,
+               'sessions': sessions}
+    # Make sure the schema exists before the tills start racing to create it
+    headless.create_app(db_path).conn.close()
+
+    started = time.time()
+    deadline = started + duration if duration else float('inf')
+    jobs = [(till_id, db_path, options, deadline) for till_id in range(tills)]
+    if mode == 'process':
+        with multiprocessing.Pool(tills) as pool:
+            outcomes = pool.map(run_till, jobs)
+    else:
+        outcomes = [None] * tills
+
+        def target(index):
+            outcomes[index] = run_till(jobs[index])
+
+        threads = [threading.Thread(target=target, args=(index,)) for index in range(tills)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.time() - started
+
+    counters = {}
+    latencies = {operation: [] for operation in OPERATIONS}
+    for outcome in outcomes:
+        if outcome is None:
+            continue
+        for key, value in outcome['counters'].items():
+            counters[key] = counters.get(key, 0) + value
+        for operation, samples in outcome['latencies'].items():
+            latencies[operation].extend(samples)
+
+    return {
+        'config': dict(options, tills=tills, mode=mode, duration=duration,
+                       database=os.path.abspath(db_path)),
+        'elapsed_s': round(elapsed, 3),
+        'throughput': {
+            'sessions_per_s': counters.get('sessions', 0) / elapsed if elapsed else 0.0,
+            'checkouts_per_s': counters.get('checkouts', 0) / elapsed if elapsed else 0.0,
+            'returns_per_s': counters.get('returns', 0) / elapsed if elapsed else 0.0,
+        },
+        'counters': counters,
+        'latency': {operation: benchmark.summarize(samples)
+                    for operation, samples in latencies.items() if samples},
+    }
+
+
+def print_report(report):
+    config = report['config']
+    throughput = report['throughput']
+    counters = report['counters']
+    print(f"===== LOAD SIMULATION: {config['tills']} tills ({config['mode']} mode), "
+          f"{report['elapsed_s']:.1f}s =====", file=sys.stderr)
+    print(f"Sessions: {counters.get('sessions', 0)}  Checkouts: {counters.get('checkouts', 0)}  "
+          f"Returns: {counters.get('returns', 0)}", file=sys.stderr)
+    print(f"Throughput: {throughput['checkouts_per_s']:.2f} checkouts/s, "
+          f"{throughput['sessions_per_s']:.2f} sessions/s", file=sys.stderr)
+    print(f"'database is locked' errors: {counters.get('locked_errors', 0)}  "
+          f"Retries: {counters.get('retries', 0)}  Failed: {counters.get('failed_operations', 0)}  "
+          f"Stock rejections: {counters.get('stock_rejections', 0)}", file=sys.stderr)
+    print(f"{'Operation':<18}{'Count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'Max ms':>10}", file=sys.stderr)
+    for operation, stats in report['latency'].items():
+        print(f"{operation:<18}{stats['count']:>8}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+              f"{stats['p99_ms']:>10.2f}{stats['max_ms']:>10.2f}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent cashier tills against one database")
+    parser.add_argument("--db", default="bench.db", help="database to load")
+    parser.add_argument("--tills", type=int, default=4, help="number of concurrent tills")
+    parser.add_argument("--mode", choices=("thread", "process"), default="thread", help="till worker type")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run (0 = until --sessions)")
+    parser.add_argument("--sessions", type=int, default=0, help="sessions per till (0 = until --duration)")
+    parser.add_argument("--think-ms", type=float, default=200.0, help="mean think time between steps")
+    parser.add_argument("--return-rate", type=float, default=0.1, help="share of sessions with a return")
+    parser.add_argument("--max-lines", type=int, default=5, help="maximum cart lines per session")
+    parser.add_argument("--max-retries", type=int, default=5, help="retries after a locked database")
+    parser.add_argument("--busy-timeout-ms", type=int, default=5000, help="SQLite busy timeout per till")
+    parser.add_argument("--seed", type=int, default=7, help="random seed")
+    parser.add_argument("--in-place", action="store_true", help="load the database itself instead of a copy")
+    parser.add_argument("--out", help="write the JSON report to this file (default: stdout)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"Database {args.db} not found. Create one with: python bench_data.py --out {args.db}",
+              file=sys.stderr)
+        return 1
+    if not args.duration and not args.sessions:
+        print("Set --duration and/or --sessions", file=sys.stderr)
+        return 1
+
+    work_dir = None
+    db_path = args.db
+    if not args.in_place:
+        work_dir = tempfile.mkdtemp(prefix="pos_load_")
+        db_path = os.path.join(work_dir, "pharmacy.db")
+        source = sqlite3.connect(args.db)
+        copy = sqlite3.connect(db_path)
+        source.backup(copy)
+        copy.close()
+        source.close()
+    try:
+        report = simulate(db_path, tills=args.tills, mode=args.mode, duration=args.duration,
+                          sessions=args.sessions, think_ms=args.think_ms, return_rate=args.return_rate,
+                          max_lines=args.max_lines, max_retries=args.max_retries,
+                          busy_timeout_ms=args.busy_timeout_ms, seed=args.seed)
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report['config']['database'] = os.path.abspath(args.db)
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
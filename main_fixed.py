@@ -1,21 +1,83 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
+import multiprocessing
 import os
+import sys
+import time
+
+import analytics
+import archive
+import barcodes
+import batches
+import daykey
+import expiry_horizon
+import maintenance
+import migrations
+import money
+import perf
+import readers
+import records
+import reorder
+import report_cache
+import rollup
+import shards
+import sqlstats
+import trigram_index
+from search_controller import IncrementalSearch
 
 class PharmacyPOS:
-    def __init__(self, root):
+    # Number of ranked candidates shown by the sales search
+    SALE_CANDIDATE_LIMIT = 8
+    # Sales velocity window (days) used to rank candidates
+    VELOCITY_DAYS = 30
+    # Sales shown per page on the returns tab
+    SALES_PAGE_SIZE = 50
+    # Longest single wait for the expiry alert timer (re-armed when it fires early)
+    EXPIRY_TIMER_MAX_MS = 24 * 60 * 60 * 1000
+    # How often the idle check for background maintenance runs, and the pause between steps
+    MAINTENANCE_POLL_MS = 60 * 1000
+    MAINTENANCE_STEP_MS = 50
+    # Change counters each cached report depends on: (counted per month of the date range,
+    # counted globally, also keyed by today's date)
+    REPORT_SOURCES = {
+        "Daily Sales": (("sales",), (), False),
+        "Monthly Sales": (("sales",), (), False),
+        "Stock Summary": ((), ("medicines",), False),
+        "Expired Medicines": ((), ("medicines", "medicine_batches"), True),
+        "Returns Report": (("returns",), ("medicine_names",), False),
+        "Reorder Suggestions": ((), ("medicines", "medicine_batches", "medicine_demand"), True),
+        "Top Sellers": (("sales",), ("medicine_names",), False),
+        "Slow Movers": (("sales",), ("medicines",), False),
+        "ABC Classification": (("sales",), ("medicine_names",), False),
+        "Traffic Heatmap": (("sales",), (), False),
+    }
+    # Reports read from the sales rollups (older archives get their rollup rows first)
+    ROLLUP_REPORTS = ("Top Sellers", "Slow Movers", "ABC Classification", "Traffic Heatmap")
+    # Monthly Sales over more days than this is summed by the columnar analytics engine
+    ANALYTICS_MIN_DAYS = 366
+    # Days of sales behind the dashboard's peak hours heatmap
+    HEATMAP_DAYS = 28
+    # Worker processes summing long report ranges per month shard (1 keeps every report in-process)
+    REPORT_WORKERS = shards.DEFAULT_WORKERS
+    
+    def __init__(self, root, profile_startup=False, db_path='pharmacy.db'):
         self.root = root
+        self.db_path = db_path
         self.root.title("Pharmacy POS System")
         self.root.geometry("1200x700")
         self.root.minsize(1000, 700)
         
+        startup_started = time.perf_counter()
+        
         # Set up modern styling
-        self.setup_styles()
+        with perf.timer("startup.setup_styles"):
+            self.setup_styles()
         
         # Initialize database
-        self.init_database()
+        with perf.timer("startup.init_database"):
+            self.init_database()
         
         # Create menu bar
         self.create_menu_bar()
@@ -28,19 +90,38 @@ class PharmacyPOS:
         self.notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 30))
         
         # Create tabs
-        self.create_dashboard_tab()
-        self.create_medicines_tab()
-        self.create_sales_tab()
-        self.create_returns_tab()
-        self.create_reports_tab()
-        self.create_settings_tab()
+        with perf.timer("startup.create_dashboard_tab"):
+            self.create_dashboard_tab()
+        with perf.timer("startup.create_medicines_tab"):
+            self.create_medicines_tab()
+        with perf.timer("startup.create_sales_tab"):
+            self.create_sales_tab()
+        with perf.timer("startup.create_returns_tab"):
+            self.create_returns_tab()
+        with perf.timer("startup.create_reports_tab"):
+            self.create_reports_tab()
+        with perf.timer("startup.create_settings_tab"):
+            self.create_settings_tab()
         
         # Bind keyboard shortcuts
         self.bind_shortcuts()
         
+        # Background maintenance while the till is idle
+        self.maintenance = maintenance.Maintenance(self.conn)
+        self.last_activity = time.monotonic()
+        self.root.bind_all('<KeyPress>', self.note_activity, add='+')
+        self.root.bind_all('<ButtonPress>', self.note_activity, add='+')
+        self.root.after(self.MAINTENANCE_POLL_MS, self.run_maintenance)
+        
         # Current user
         self.current_user = None
         
+        if perf.is_enabled():
+            perf.record("startup.total", time.perf_counter() - startup_started)
+        if profile_startup:
+            print(perf.format_report(perf.snapshot(), title="STARTUP PROFILE (ms)"))
+            sys.stdout.flush()
+        
         # Show login
         self.show_login()
 
@@ -93,9 +174,16 @@ class PharmacyPOS:
         
     def init_database(self):
         """Initialize SQLite database with required tables"""
-        self.conn = sqlite3.connect('pharmacy.db')
+        self.conn = sqlstats.connect(self.db_path)
         self.cursor = self.conn.cursor()
         
+        # Free pages are released in small steps by the maintenance scheduler (new databases only;
+        # existing ones switch over with Compact in Diagnostics)
+        maintenance.enable_incremental_vacuum(self.cursor)
+        
+        # Reports and searches read on their own read-only connections alongside the writer
+        readers.enable_wal(self.cursor)
+        
         # Create Users table
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -106,7 +194,7 @@ class PharmacyPOS:
             )
         ''')
         
-        # Create Medicines table (making batch optional)
+        # Create Medicines table (making batch optional; prices in integer cents, see money.py)
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS medicines (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -115,30 +203,74 @@ class PharmacyPOS:
                 expiry DATE NOT NULL,
                 stock_packs INTEGER NOT NULL,
                 units_per_pack INTEGER NOT NULL,
-                pack_price REAL NOT NULL,
-                unit_price REAL NOT NULL,
+                pack_price INTEGER NOT NULL,
+                unit_price INTEGER NOT NULL,
                 supplier TEXT NOT NULL
             )
         ''')
         
-        # Create Sales table
+        # Create Medicine Barcodes table (several barcodes per product, each for a pack or a unit)
         self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS medicine_barcodes (
+                barcode TEXT PRIMARY KEY,
+                medicine_id INTEGER NOT NULL,
+                sale_type TEXT NOT NULL DEFAULT 'Pack',
+                FOREIGN KEY (medicine_id) REFERENCES medicines (id)
+            ) WITHOUT ROWID
+        ''')
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_medicine_barcodes_medicine ON medicine_barcodes (medicine_id)")
+        
+        # Create Sales table (price and total in integer cents, day_key for day ranges, see daykey.py)
+        self.cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS sales (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 date DATETIME NOT NULL,
                 medicine_id INTEGER NOT NULL,
                 qty INTEGER NOT NULL,
                 type TEXT NOT NULL,
-                price REAL NOT NULL,
-                total REAL NOT NULL,
+                price INTEGER NOT NULL,
+                total INTEGER NOT NULL,
                 user_id INTEGER NOT NULL,
+                invoice_no INTEGER,
+                returned_qty INTEGER NOT NULL DEFAULT 0,
+                units INTEGER,
+                {daykey.column_definition('date')},
                 FOREIGN KEY (medicine_id) REFERENCES medicines (id),
                 FOREIGN KEY (user_id) REFERENCES users (id)
             )
         ''')
         
+        # Invoice number shared by the lines of one checkout (the first line's sale id);
+        # older databases get the column with each sale as its own invoice
+        self.cursor.execute("PRAGMA table_info(sales)")
+        if 'invoice_no' not in [column[1] for column in self.cursor.fetchall()]:
+            self.cursor.execute("ALTER TABLE sales ADD COLUMN invoice_no INTEGER")
+            self.cursor.execute("UPDATE sales SET invoice_no = id")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_invoice ON sales (invoice_no)")
+        
+        # Index for newest-first browsing and keyset paging of sales
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_date_id ON sales (date, id)")
+        
+        # Create batch-level stock tables (FEFO allocation) and move existing stock into batches
+        batches.create_tables(self.cursor)
+        expiry_horizon.create_tables(self.cursor)
+        batches.migrate_stock(self.cursor)
+        # Stock that expired since the last run is no longer counted as sellable
+        batches.sync_expired(self.cursor)
+        self.expiry_horizon = expiry_horizon.ExpiryHorizon()
+        self.expiry_day = None
+        self.expiry_after_id = None
+        
+        # Create name word/trigram tables (typo-tolerant name search)
+        trigram_index.create_tables(self.cursor)
+        trigram_index.index_missing(self.cursor)
+        self.name_index = trigram_index.TrigramIndex()
+        
+        # Index for per-medicine sales lookups (candidate ranking, returns)
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_medicine_date ON sales (medicine_id, date)")
+        
         # Create Returns table
-        self.cursor.execute('''
+        self.cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS returns (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 sale_id INTEGER NOT NULL,
@@ -147,12 +279,46 @@ class PharmacyPOS:
                 return_qty INTEGER NOT NULL,
                 return_type TEXT NOT NULL,
                 reason TEXT,
-                refunded_amount REAL NOT NULL,
+                refunded_amount INTEGER NOT NULL,
+                {daykey.column_definition('return_date')},
                 FOREIGN KEY (sale_id) REFERENCES sales (id),
                 FOREIGN KEY (medicine_id) REFERENCES medicines (id)
             )
         ''')
         
+        # Quantity already returned per sale line; older databases get it summed from returns
+        self.cursor.execute("PRAGMA table_info(sales)")
+        if 'returned_qty' not in [column[1] for column in self.cursor.fetchall()]:
+            self.cursor.execute("ALTER TABLE sales ADD COLUMN returned_qty INTEGER NOT NULL DEFAULT 0")
+            self.cursor.execute("""
+                UPDATE sales SET returned_qty = (SELECT SUM(return_qty) FROM returns WHERE sale_id = sales.id)
+                WHERE id IN (SELECT sale_id FROM returns)
+            """)
+        
+        # Index for returns by date (Returns Report, archiving)
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_returns_date ON returns (return_date)")
+        
+        # Create demand table for reorder suggestions (seeded from recent sales)
+        reorder.create_tables(self.cursor)
+        
+        # Create registry of yearly archive databases (closed sales/returns periods)
+        archive.create_tables(self.cursor)
+        
+        # Create log of background maintenance runs
+        maintenance.create_tables(self.cursor)
+        
+        # Create report cache and the change counters that validate it
+        report_cache.create_tables(self.cursor)
+        
+        # Units of each sale line as sold; older databases get them at the current pack sizes
+        rollup.add_sale_units(self.cursor)
+        
+        # Create per-day, per-medicine sales rollup for the product reports
+        rollup.create_tables(self.cursor)
+        
+        # Columnar copy of the sales for long-range analytics (loaded on first use)
+        self.sales_columns = analytics.SalesColumns()
+        
         # Create Settings table for receipt configuration
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS settings (
@@ -180,6 +346,13 @@ class PharmacyPOS:
             """)
         
         self.conn.commit()
+        
+        # Convert older databases and archives to the current schema (money in integer cents, day keys)
+        migrations.migrate(self.conn, self.db_path)
+        
+        # Read-only connections for reports, dashboard counts and searches
+        self.readers = readers.ReaderPool(self.db_path)
+        self.report_shards = shards.ShardedReports(self.db_path, self.REPORT_WORKERS)
 
     def create_menu_bar(self):
         """Create the menu bar"""
@@ -190,6 +363,7 @@ class PharmacyPOS:
         file_menu = tk.Menu(self.menubar, tearoff=0, bg='#f8f9fa', fg='#2c3e50', font=('Segoe UI', 10))
         self.menubar.add_cascade(label="File", menu=file_menu)
         file_menu.add_command(label="Backup", command=self.backup_database)
+        file_menu.add_command(label="Archive Old Sales", command=self.archive_old_sales)
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.exit_app)
         
@@ -201,6 +375,8 @@ class PharmacyPOS:
         # Help menu
         help_menu = tk.Menu(self.menubar, tearoff=0, bg='#f8f9fa', fg='#2c3e50', font=('Segoe UI', 10))
         self.menubar.add_cascade(label="Help", menu=help_menu)
+        help_menu.add_command(label="Diagnostics", command=self.show_diagnostics)
+        help_menu.add_separator()
         help_menu.add_command(label="About", command=self.show_about)
 
     def create_status_bar(self):
@@ -223,6 +399,21 @@ class PharmacyPOS:
         self.datetime_label.config(text=now)
         self.root.after(1000, self.update_datetime)
 
+    def note_activity(self, event=None):
+        """Remember the last key press or click (maintenance waits for the till to be idle)"""
+        self.last_activity = time.monotonic()
+
+    def run_maintenance(self):
+        """Run one maintenance step if the till is quiet, then reschedule"""
+        delay = self.MAINTENANCE_POLL_MS
+        try:
+            if maintenance.is_quiet(datetime.now(), time.monotonic() - self.last_activity) and self.maintenance.step():
+                delay = self.MAINTENANCE_STEP_MS
+        except Exception:
+            # A failed step leaves the database as it was; the cycle starts over when next quiet
+            self.maintenance.reset()
+        self.root.after(delay, self.run_maintenance)
+
     def create_dashboard_tab(self):
         """Create the dashboard tab"""
         self.dashboard_frame = ttk.Frame(self.notebook, style='Modern.TFrame')
@@ -248,20 +439,23 @@ class PharmacyPOS:
         # Low stock card
         low_stock_frame = tk.Frame(stats_frame, bg='#e74c3c', relief=tk.FLAT, bd=0)
         low_stock_frame.pack(side=tk.LEFT, padx=15, fill=tk.BOTH, expand=True)
-        tk.Label(low_stock_frame, text="Low Stock (<10 packs)", font=('Segoe UI', 12, 'bold'), 
+        tk.Label(low_stock_frame, text="Reorder Needed", font=('Segoe UI', 12, 'bold'), 
                 bg='#e74c3c', fg='white').pack(pady=(15, 5))
         self.low_stock_label = tk.Label(low_stock_frame, text="0", font=('Segoe UI', 24, 'bold'), 
                                        bg='#e74c3c', fg='white')
         self.low_stock_label.pack(pady=15)
         
-        # Expiry alerts card
+        # Expiry alerts card (counts batches: one medicine can hold several expiring batches)
         expiry_frame = tk.Frame(stats_frame, bg='#f39c12', relief=tk.FLAT, bd=0)
         expiry_frame.pack(side=tk.LEFT, padx=15, fill=tk.BOTH, expand=True)
-        tk.Label(expiry_frame, text="Expiry Alerts", font=('Segoe UI', 12, 'bold'), 
+        tk.Label(expiry_frame, text="Batches Expiring (30 days)", font=('Segoe UI', 12, 'bold'), 
                 bg='#f39c12', fg='white').pack(pady=(15, 5))
         self.expiry_label = tk.Label(expiry_frame, text="0", font=('Segoe UI', 24, 'bold'), 
                                     bg='#f39c12', fg='white')
-        self.expiry_label.pack(pady=15)
+        self.expiry_label.pack(pady=(15, 0))
+        self.expiry_horizon_label = tk.Label(expiry_frame, text="", font=('Segoe UI', 9), 
+                                            bg='#f39c12', fg='white')
+        self.expiry_horizon_label.pack(pady=(0, 10))
         
         # Daily sales card
         daily_sales_frame = tk.Frame(stats_frame, bg='#27ae60', relief=tk.FLAT, bd=0)
@@ -272,32 +466,102 @@ class PharmacyPOS:
                                          bg='#27ae60', fg='white')
         self.daily_sales_label.pack(pady=15)
         
+        # Peak hours: average transactions per weekday and hour over the last few weeks
+        traffic_frame = tk.LabelFrame(self.dashboard_frame, text=f"Peak Hours (last {self.HEATMAP_DAYS} days)",
+                                      font=('Segoe UI', 11, 'bold'), bg='#f8f9fa', fg='#2c3e50')
+        traffic_frame.pack(fill=tk.X, padx=45, pady=(0, 10))
+        self.heatmap_label = tk.Label(traffic_frame, text="", font=('Courier New', 9), justify=tk.LEFT,
+                                      bg='#f8f9fa', fg='#2c3e50')
+        self.heatmap_label.pack(side=tk.LEFT, padx=10, pady=5)
+        self.throughput_label = tk.Label(traffic_frame, text="", font=('Segoe UI', 10), justify=tk.LEFT,
+                                         bg='#f8f9fa', fg='#2c3e50')
+        self.throughput_label.pack(side=tk.LEFT, padx=10, pady=5, anchor=tk.N)
+        
+        # Expiry alerts raised as batches cross the 7/30/90 day thresholds
+        self.expiry_alert_label = tk.Label(self.dashboard_frame, text="", font=('Segoe UI', 11, 'bold'), 
+                                          bg='#f8f9fa', fg='#c0392b')
+        self.expiry_alert_label.pack(pady=(0, 10))
+        
         # Refresh dashboard
         self.refresh_dashboard()
 
+    @perf.timed("refresh_dashboard")
     def refresh_dashboard(self):
         """Refresh dashboard statistics"""
-        # Total medicines
-        self.cursor.execute("SELECT COUNT(*) FROM medicines")
-        total_medicines = self.cursor.fetchone()[0]
-        self.total_medicines_label.config(text=str(total_medicines))
-        
-        # Low stock medicines
-        self.cursor.execute("SELECT COUNT(*) FROM medicines WHERE stock_packs < 10")
-        low_stock = self.cursor.fetchone()[0]
-        self.low_stock_label.config(text=str(low_stock))
-        
-        # Expiry alerts (within 30 days)
+        # Expiry alerts: batches with stock expiring within 30 days (from the expiry horizon)
         today = datetime.now().date()
-        self.cursor.execute("SELECT COUNT(*) FROM medicines WHERE expiry <= date(?, '+30 days')", (today.isoformat(),))
-        expiry_alerts = self.cursor.fetchone()[0]
-        self.expiry_label.config(text=str(expiry_alerts))
+        self.expiry_horizon.refresh(self.conn)
+        counts = self.expiry_horizon.counts(today)
+        self.expiry_label.config(text=str(counts[30]))
+        self.expiry_horizon_label.config(
+            text=f"Expired: {counts['expired']}  7d: {counts[7]}  90d: {counts[90]}")
+        self.schedule_expiry_alert(today)
+        
+        # The counts are read together from one committed state, off the writer
+        with self.readers.reader() as conn, readers.snapshot(conn):
+            cursor = conn.cursor()
+            
+            # Total medicines
+            cursor.execute("SELECT COUNT(*) FROM medicines")
+            total_medicines = cursor.fetchone()[0]
+            self.total_medicines_label.config(text=str(total_medicines))
+            
+            # Medicines running short for their sales rate (see the Reorder Suggestions report)
+            low_stock = reorder.due_count(cursor)
+            self.low_stock_label.config(text=str(low_stock))
+            
+            # Today's sales
+            today_str = today.isoformat()
+            cursor.execute("SELECT SUM(total) FROM sales WHERE day_key = ?", (daykey.day_key(today),))
+            daily_sales = cursor.fetchone()[0] or 0
+            self.daily_sales_label.config(text=money.display(daily_sales))
+            
+            # Peak hours and transactions per trading hour, from the hourly rollup
+            since = (today - timedelta(days=self.HEATMAP_DAYS - 1)).isoformat()
+            traffic = rollup.hourly_traffic(cursor, "sales_by_hour", since, today_str)
+            transactions, hours = rollup.throughput(cursor, "sales_by_hour", since, today_str)
+        self.heatmap_label.config(text=rollup.heatmap(traffic, since, today_str, shades=True) or "No sales yet")
+        busiest = rollup.peak(traffic, since, today_str)
+        text = f"{transactions / hours:.1f} transactions/hour\nover {hours} trading hours" if hours else ""
+        if busiest:
+            (weekday, hour), average = busiest
+            text += f"\n\nBusiest: {rollup.WEEKDAYS[weekday]} {hour:02d}:00\n({average:.1f} transactions)"
+        self.throughput_label.config(text=text)
+
+    def schedule_expiry_alert(self, today):
+        """Arm a timer for the next day a batch crosses an expiry threshold"""
+        if self.expiry_after_id is not None:
+            self.root.after_cancel(self.expiry_after_id)
+            self.expiry_after_id = None
+        self.expiry_day = today
+        crossing = self.expiry_horizon.next_crossing(today)
+        if crossing is None:
+            return
+        # Fire just after midnight of the crossing day; long waits are re-armed daily
+        wait = datetime.combine(crossing, datetime.min.time()) - datetime.now() + timedelta(seconds=1)
+        delay_ms = min(max(int(wait.total_seconds() * 1000), 0), self.EXPIRY_TIMER_MAX_MS)
+        self.expiry_after_id = self.root.after(delay_ms, self.on_expiry_crossing)
+
+    def on_expiry_crossing(self):
+        """Timer callback: refresh the counts and raise an alert for batches that crossed a threshold"""
+        self.expiry_after_id = None
+        before = self.expiry_horizon.counts(self.expiry_day)
+        self.refresh_dashboard()
+        after = self.expiry_horizon.counts(self.expiry_day)
         
-        # Today's sales
-        today_str = today.isoformat()
-        self.cursor.execute("SELECT SUM(total) FROM sales WHERE date(date) = ?", (today_str,))
-        daily_sales = self.cursor.fetchone()[0] or 0
-        self.daily_sales_label.config(text=f"${daily_sales:.2f}")
+        alerts = []
+        if after['expired'] > before['expired']:
+            # The expired units leave the sellable stock shown on the medicines and checked by the cart
+            batches.sync_expired(self.cursor, self.expiry_day)
+            self.conn.commit()
+            self.load_medicines()
+            alerts.append(f"{after['expired'] - before['expired']} batch(es) expired")
+        for days in expiry_horizon.HORIZONS:
+            if after[days] > before[days]:
+                alerts.append(f"{after[days] - before[days]} batch(es) now expire within {days} days")
+        if alerts:
+            self.expiry_alert_label.config(
+                text=f"Expiry alert {self.expiry_day.isoformat()}: " + "; ".join(alerts))
 
     def create_medicines_tab(self):
         """Create the medicines tab"""
@@ -354,6 +618,15 @@ class PharmacyPOS:
         self.unit_price_entry = ttk.Entry(fields_frame, width=20, style='Modern.TEntry', state='readonly')
         self.unit_price_entry.grid(row=3, column=3, padx=5, pady=8)
         
+        # Barcodes (comma separated, optional)
+        tk.Label(fields_frame, text="Pack Barcodes:", font=('Segoe UI', 10), bg='#f8f9fa', fg='#34495e').grid(row=4, column=0, sticky=tk.W, padx=5, pady=8)
+        self.pack_barcodes_entry = ttk.Entry(fields_frame, width=30, style='Modern.TEntry')
+        self.pack_barcodes_entry.grid(row=4, column=1, padx=5, pady=8)
+        
+        tk.Label(fields_frame, text="Unit Barcodes:", font=('Segoe UI', 10), bg='#f8f9fa', fg='#34495e').grid(row=4, column=2, sticky=tk.W, padx=(20, 5), pady=8)
+        self.unit_barcodes_entry = ttk.Entry(fields_frame, width=20, style='Modern.TEntry')
+        self.unit_barcodes_entry.grid(row=4, column=3, padx=5, pady=8)
+        
         # Bind pack price and units to auto-calculate unit price
         self.pack_price_entry.bind('<KeyRelease>', self.calculate_unit_price)
         self.units_entry.bind('<KeyRelease>', self.calculate_unit_price)
@@ -385,7 +658,12 @@ class PharmacyPOS:
         tk.Label(search_frame, text="Search (Name or Batch):", font=('Segoe UI', 10), bg='#f8f9fa', fg='#34495e').pack(side=tk.LEFT, padx=5)
         self.search_entry = ttk.Entry(search_frame, width=30, style='Modern.TEntry')
         self.search_entry.pack(side=tk.LEFT, padx=5)
-        self.search_entry.bind('<KeyRelease>', self.search_medicines)
+        
+        # Search as you type: debounced, runs off the UI thread and narrows cached results
+        self.medicine_search = IncrementalSearch(self.root, self.db_path, self.fetch_medicine_matches,
+                                                 self.medicine_matches, self.fill_medicines_tree,
+                                                 name="medicines.search", limit=500, readers=self.readers)
+        self.search_entry.bind('<KeyRelease>', self.medicine_search.on_key)
         
         search_btn = ttk.Button(search_frame, text="Search", command=self.search_medicines, 
                            style='Modern.TButton')
@@ -477,8 +755,17 @@ class PharmacyPOS:
             if result:
                 self.units_entry.insert(0, result[0])
                 self.pack_price_entry.delete(0, tk.END)
-                self.pack_price_entry.insert(0, result[1])
+                self.pack_price_entry.insert(0, money.plain(result[1]))
                 self.calculate_unit_price()
+            
+            # Fill barcodes
+            self.pack_barcodes_entry.delete(0, tk.END)
+            self.unit_barcodes_entry.delete(0, tk.END)
+            self.cursor.execute("SELECT barcode, sale_type FROM medicine_barcodes WHERE medicine_id = ? ORDER BY barcode",
+                              (medicine_id,))
+            codes = self.cursor.fetchall()
+            self.pack_barcodes_entry.insert(0, ", ".join(code for code, sale_type in codes if sale_type == "Pack"))
+            self.unit_barcodes_entry.insert(0, ", ".join(code for code, sale_type in codes if sale_type == "Unit"))
 
     def clear_medicine_form(self):
         """Clear the medicine form"""
@@ -492,6 +779,8 @@ class PharmacyPOS:
         self.unit_price_entry.delete(0, tk.END)
         self.unit_price_entry.config(state='readonly')
         self.supplier_entry.delete(0, tk.END)
+        self.pack_barcodes_entry.delete(0, tk.END)
+        self.unit_barcodes_entry.delete(0, tk.END)
         
         # Disable update and delete buttons
         self.update_btn.config(state='disabled')
@@ -505,8 +794,8 @@ class PharmacyPOS:
             expiry = self.expiry_entry.get().strip()
             stock = int(self.stock_entry.get() or 0)
             units = int(self.units_entry.get() or 1)
-            pack_price = float(self.pack_price_entry.get() or 0)
-            unit_price = pack_price / units if units > 0 else 0
+            pack_price = money.to_cents(self.pack_price_entry.get() or 0)
+            unit_price = money.divide(pack_price, units)
             supplier = self.supplier_entry.get().strip()
             
             if not name or not expiry or not supplier:
@@ -519,7 +808,12 @@ class PharmacyPOS:
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """, (name, batch, expiry, stock, units, pack_price, unit_price, supplier))
             
+            medicine_id = self.cursor.lastrowid
+            batches.receive(self.cursor, medicine_id, batch, expiry, stock * units)
+            self.save_medicine_barcodes(medicine_id)
+            self.name_index.add(self.cursor, medicine_id, name)
             self.conn.commit()
+            self.name_index.commit()
             
             # Refresh medicines list
             self.load_medicines()
@@ -534,6 +828,8 @@ class PharmacyPOS:
         except ValueError:
             messagebox.showerror("Error", "Please enter valid numbers for stock, units, and price")
         except Exception as e:
+            self.conn.rollback()
+            self.name_index.rollback()
             messagebox.showerror("Error", f"Failed to add medicine: {str(e)}")
 
     def update_medicine(self):
@@ -552,14 +848,21 @@ class PharmacyPOS:
             expiry = self.expiry_entry.get().strip()
             stock = int(self.stock_entry.get() or 0)
             units = int(self.units_entry.get() or 1)
-            pack_price = float(self.pack_price_entry.get() or 0)
-            unit_price = pack_price / units if units > 0 else 0
+            pack_price = money.to_cents(self.pack_price_entry.get() or 0)
+            unit_price = money.divide(pack_price, units)
             supplier = self.supplier_entry.get().strip()
             
             if not name or not expiry or not supplier:
                 messagebox.showerror("Error", "Please fill in all required fields (Name, Expiry Date, Supplier)")
                 return
             
+            # Stock held before the edit, to tell a stock change from a relabel
+            batches.migrate_stock(self.cursor, medicine_id)
+            self.cursor.execute("SELECT stock_packs, units_per_pack FROM medicines WHERE id=?", (medicine_id,))
+            old_stock, old_units = self.cursor.fetchone()
+            self.cursor.execute("SELECT COALESCE(SUM(qty), 0) FROM medicine_batches WHERE medicine_id=?", (medicine_id,))
+            units_on_hand = self.cursor.fetchone()[0]
+            
             # Update in database (batch is now optional)
             self.cursor.execute("""
                 UPDATE medicines 
@@ -567,7 +870,18 @@ class PharmacyPOS:
                 WHERE id=?
             """, (name, batch, expiry, stock, units, pack_price, unit_price, supplier, medicine_id))
             
+            # Loose units stay on hand when only the pack count changes
+            if units == old_units:
+                target_units = units_on_hand + (stock - old_stock) * units
+            else:
+                target_units = stock * units
+            batches.adjust_stock(self.cursor, medicine_id, batch, expiry, target_units)
+            batches.sync_medicines(self.cursor, [medicine_id])
+            
+            self.save_medicine_barcodes(medicine_id)
+            self.name_index.update(self.cursor, medicine_id, name)
             self.conn.commit()
+            self.name_index.commit()
             
             # Refresh medicines list
             self.load_medicines()
@@ -582,6 +896,8 @@ class PharmacyPOS:
         except ValueError:
             messagebox.showerror("Error", "Please enter valid numbers for stock, units, and price")
         except Exception as e:
+            self.conn.rollback()
+            self.name_index.rollback()
             messagebox.showerror("Error", f"Failed to update medicine: {str(e)}")
 
     def delete_medicine(self):
@@ -598,8 +914,13 @@ class PharmacyPOS:
                 medicine_id = item['values'][0]
                 
                 # Delete from database
+                self.cursor.execute("DELETE FROM medicine_barcodes WHERE medicine_id=?", (medicine_id,))
+                self.cursor.execute("DELETE FROM medicine_batches WHERE medicine_id=?", (medicine_id,))
+                self.cursor.execute("DELETE FROM medicine_demand WHERE medicine_id=?", (medicine_id,))
+                self.name_index.remove(self.cursor, medicine_id)
                 self.cursor.execute("DELETE FROM medicines WHERE id=?", (medicine_id,))
                 self.conn.commit()
+                self.name_index.commit()
                 
                 # Refresh medicines list
                 self.load_medicines()
@@ -612,8 +933,30 @@ class PharmacyPOS:
                 
                 messagebox.showinfo("Success", "Medicine deleted successfully")
             except Exception as e:
+                self.conn.rollback()
+                self.name_index.rollback()
                 messagebox.showerror("Error", f"Failed to delete medicine: {str(e)}")
 
+    def save_medicine_barcodes(self, medicine_id):
+        """Replace the barcodes of a medicine with those entered in the form (caller commits)"""
+        codes = [(code, "Pack") for code in barcodes.parse_barcode_list(self.pack_barcodes_entry.get())]
+        codes += [(code, "Unit") for code in barcodes.parse_barcode_list(self.unit_barcodes_entry.get())
+                  if code not in dict(codes)]
+        
+        # Reject codes already assigned to another product with a readable message
+        for code, _ in codes:
+            self.cursor.execute("""
+                SELECT m.name FROM medicine_barcodes b JOIN medicines m ON m.id = b.medicine_id
+                WHERE b.barcode = ? AND b.medicine_id != ?
+            """, (code, medicine_id))
+            owner = self.cursor.fetchone()
+            if owner:
+                raise sqlite3.IntegrityError(f"Barcode {code} is already assigned to {owner[0]}")
+        
+        self.cursor.execute("DELETE FROM medicine_barcodes WHERE medicine_id = ?", (medicine_id,))
+        self.cursor.executemany("INSERT INTO medicine_barcodes (barcode, medicine_id, sale_type) VALUES (?, ?, ?)",
+                                [(code, medicine_id, sale_type) for code, sale_type in codes])
+
     def create_sales_tab(self):
         """Create the sales/POS tab"""
         self.sales_frame = ttk.Frame(self.notebook, style='Modern.TFrame')
@@ -628,18 +971,48 @@ class PharmacyPOS:
         tk.Label(search_frame, text="Search by Name (Batch Optional):", font=('Segoe UI', 10), bg='#f8f9fa', fg='#34495e').pack(side=tk.LEFT, padx=5)
         self.sales_search_entry = ttk.Entry(search_frame, width=30, style='Modern.TEntry')
         self.sales_search_entry.pack(side=tk.LEFT, padx=5)
-        self.sales_search_entry.bind('<Return>', self.search_medicine_for_sale)
+        self.sales_search_entry.bind('<Return>', self.on_sales_search_return)
+        self.sales_search_entry.bind('<Down>', lambda e: self.move_sale_candidate(1))
+        self.sales_search_entry.bind('<Up>', lambda e: self.move_sale_candidate(-1))
+        
+        # Ranked candidates are refreshed as the cashier types
+        self.sale_search = IncrementalSearch(self.root, self.db_path, self.fetch_sale_candidates,
+                                             self.medicine_matches, self.show_sale_candidates,
+                                             name="sales.search", limit=self.SALE_CANDIDATE_LIMIT,
+                                             readers=self.readers)
+        self.sales_search_entry.bind('<KeyRelease>', self.on_sales_search_key)
         
         search_btn = ttk.Button(search_frame, text="Search", command=self.search_medicine_for_sale, 
                                style='Modern.TButton')
         search_btn.pack(side=tk.LEFT, padx=5)
         
+        # Scanner mode: Enter does an exact barcode lookup and adds the item straight to the cart
+        self.scanner_mode_var = tk.BooleanVar(value=False)
+        scanner_check = tk.Checkbutton(search_frame, text="Scanner Mode", variable=self.scanner_mode_var,
+                                       command=self.sales_search_entry.focus_set,
+                                       font=('Segoe UI', 10), bg='#f8f9fa', fg='#2c3e50', selectcolor='white')
+        scanner_check.pack(side=tk.LEFT, padx=(20, 5))
+        
+        self.scan_status_label = tk.Label(search_frame, text="", font=('Segoe UI', 10), bg='#f8f9fa', fg='#27ae60')
+        self.scan_status_label.pack(side=tk.LEFT, padx=5)
+        
         # Medicine info frame with modern styling
         info_frame = tk.LabelFrame(self.sales_frame, text="Medicine Information", 
                                   font=('Segoe UI', 12, 'bold'), bg='#f8f9fa', fg='#2c3e50',
                                   relief=tk.RAISED, bd=2)
         info_frame.pack(fill=tk.X, padx=20, pady=5)
         
+        # Ranked candidate list (Up/Down to choose, Enter to add)
+        self.candidate_listbox = tk.Listbox(info_frame, height=6, width=50, font=('Segoe UI', 10),
+                                            bg='white', fg='#2c3e50', relief=tk.SUNKEN, bd=1,
+                                            selectbackground='#3498db', exportselection=False)
+        self.candidate_listbox.pack(side=tk.LEFT, fill=tk.Y, padx=(10, 0), pady=10)
+        self.candidate_listbox.bind('<<ListboxSelect>>', self.on_candidate_click)
+        self.candidate_listbox.bind('<Double-Button-1>', lambda e: self.add_selected_candidate())
+        self.candidate_listbox.bind('<Return>', lambda e: self.add_selected_candidate())
+        self.sale_candidates = []
+        self.candidate_index = 0
+        
         # Medicine details with modern text widget
         self.medicine_info_text = tk.Text(info_frame, height=6, font=('Segoe UI', 10), 
                                          bg='white', fg='#2c3e50', relief=tk.SUNKEN, bd=1)
@@ -728,38 +1101,72 @@ class PharmacyPOS:
         
         # Initialize cart
         self.cart_items = []
+        self.current_medicine = None
 
+    @perf.timed("search_medicine_for_sale")
     def search_medicine_for_sale(self, event=None):
         """Search medicine for sale"""
-        search_term = self.sales_search_entry.get().strip()
-        
-        self.cursor.execute("""
-            SELECT * FROM medicines 
-            WHERE name LIKE ? OR batch LIKE ?
-        """, (f"%{search_term}%", f"%{search_term}%"))
-        
-        medicines = self.cursor.fetchall()
-        
+        with self.readers.reader() as conn:
+            self.sale_search.search_now(conn.cursor(), self.sales_search_entry.get().strip())
+
+    def fetch_sale_candidates(self, cursor, search_term, limit):
+        """Fetch the best matches: exact, then prefix, then substring; in stock and fast sellers first"""
+        if not search_term:
+            return []
+        since = (datetime.now() - timedelta(days=self.VELOCITY_DAYS)).date().isoformat()
+        # Velocity is the number of sale lines over the window, summed once per medicine from the daily rollup
+        candidates = records.fetch(cursor, records.Medicine, f"""
+            SELECT {records.Medicine.columns("m")},
+                   CASE WHEN m.name = ? COLLATE NOCASE OR m.batch = ? THEN 0
+                        WHEN m.name LIKE ? THEN 1
+                        ELSE 2 END AS match_rank
+            FROM medicines m
+            LEFT JOIN (SELECT medicine_id, SUM(lines) AS velocity
+                       FROM sales_by_medicine_day
+                       WHERE day >= ?
+                       GROUP BY medicine_id) v ON v.medicine_id = m.id
+            WHERE m.name LIKE ? OR m.batch LIKE ?
+            ORDER BY match_rank, m.stock_packs > 0 DESC, COALESCE(v.velocity, 0) DESC, m.name
+            LIMIT ?
+        """, (search_term, search_term, f"{search_term}%", since,
+              f"%{search_term}%", f"%{search_term}%", limit + 1))
+        
+        # Nothing contains the term: fall back to typo-tolerant matching
+        if not candidates:
+            candidates = self.fetch_fuzzy_medicines(cursor, search_term, limit)
+        return candidates
+
+    def show_sale_candidates(self, medicines):
+        """Fill the candidate list and select the best match"""
+        self.sale_candidates = medicines
+        self.candidate_listbox.delete(0, tk.END)
+        for medicine in medicines:
+            stock = f"{medicine.stock_packs} packs" if medicine.stock_packs > 0 else "out of stock"
+            self.candidate_listbox.insert(tk.END, f"{medicine.name}  ({medicine.batch_display})  {stock}  "
+                                                  f"{medicine.pack_price_text}")
+        self.select_sale_candidate(0)
+
+    def select_sale_candidate(self, index):
+        """Make the candidate at index the current medicine and show its details"""
         # Always make text widget editable first
         self.medicine_info_text.config(state='normal')
         self.medicine_info_text.delete(1.0, tk.END)
         
-        if medicines:
-            # Display first medicine found
-            medicine = medicines[0]
-            info_text = f"ID: {medicine[0]}\n"
-            info_text += f"Name: {medicine[1]}\n"
-            
-            # Only show batch if it exists
-            if medicine[2]:  # batch number
-                info_text += f"Batch: {medicine[2]}\n"
-            else:
-                info_text += "Batch: N/A\n"
-            
-            info_text += f"Expiry: {medicine[3]}\n"
-            info_text += f"Stock: {medicine[4]} packs ({medicine[4] * medicine[5]} units)\n"
-            info_text += f"Pack Price: ${medicine[6]:.2f}\n"
-            info_text += f"Unit Price: ${medicine[7]:.2f}"
+        if self.sale_candidates:
+            index = max(0, min(index, len(self.sale_candidates) - 1))
+            self.candidate_index = index
+            self.candidate_listbox.selection_clear(0, tk.END)
+            self.candidate_listbox.selection_set(index)
+            self.candidate_listbox.see(index)
+            
+            medicine = self.sale_candidates[index]
+            info_text = f"ID: {medicine.id}\n"
+            info_text += f"Name: {medicine.name}\n"
+            info_text += f"Batch: {medicine.batch_display}\n"
+            info_text += f"Expiry: {medicine.expiry}\n"
+            info_text += f"Stock: {medicine.stock_packs} packs ({medicine.total_units} units)\n"
+            info_text += f"Pack Price: {medicine.pack_price_text}\n"
+            info_text += f"Unit Price: {medicine.unit_price_text}"
             
             self.medicine_info_text.insert(1.0, info_text)
             
@@ -772,6 +1179,113 @@ class PharmacyPOS:
         # Make text widget read-only
         self.medicine_info_text.config(state='disabled')
 
+    def move_sale_candidate(self, step):
+        """Move the candidate selection up or down (arrow keys in the search box)"""
+        if self.sale_candidates:
+            self.select_sale_candidate(self.candidate_index + step)
+        return "break"
+
+    def on_candidate_click(self, event=None):
+        """Handle mouse selection in the candidate list"""
+        selection = self.candidate_listbox.curselection()
+        if selection and selection[0] != self.candidate_index:
+            self.select_sale_candidate(selection[0])
+
+    def add_selected_candidate(self):
+        """Add the selected candidate to the cart (quantity defaults to 1)"""
+        if not self.quantity_entry.get().strip():
+            self.quantity_entry.insert(0, "1")
+        self.add_to_cart()
+        return "break"
+
+    def on_sales_search_key(self, event):
+        """KeyRelease in the sales search box: refresh candidates unless scanning or navigating"""
+        if self.scanner_mode_var.get() or event.keysym in ("Return", "KP_Enter", "Up", "Down"):
+            return
+        self.sale_search.on_key(event)
+
+    def on_sales_search_return(self, event=None):
+        """Handle Enter in the sales search box (scan in scanner mode, search otherwise)"""
+        if self.scanner_mode_var.get():
+            self.scan_barcode()
+            return "break"
+        
+        # Enter on a term whose candidates are already shown adds the selected one
+        search_term = self.sales_search_entry.get().strip()
+        if self.current_medicine and search_term and search_term == self.sale_search.last_term:
+            return self.add_selected_candidate()
+        self.search_medicine_for_sale()
+
+    @perf.timed("scan_to_line")
+    def scan_barcode(self, code=None):
+        """Add one pack or unit of the scanned product to the cart"""
+        if code is None:
+            code = self.sales_search_entry.get()
+            self.sales_search_entry.delete(0, tk.END)
+        code = barcodes.normalize_barcode(code)
+        if not code:
+            return False
+        
+        # A GTIN whose check digit does not match was misread; never guess a product from it
+        if code.isdigit() and len(code) in barcodes.GTIN_LENGTHS and not barcodes.is_valid_gtin(code):
+            self.root.bell()
+            self.scan_status_label.config(text=f"Misread barcode: {code}", fg='#e74c3c')
+            return False
+        
+        # Exact lookup on the barcode primary key
+        self.cursor.execute("""
+            SELECT m.id, m.name, m.stock_packs, m.units_per_pack, m.pack_price, m.unit_price, b.sale_type
+            FROM medicine_barcodes b JOIN medicines m ON m.id = b.medicine_id
+            WHERE b.barcode = ?
+        """, (code,))
+        result = self.cursor.fetchone()
+        if not result:
+            self.root.bell()
+            self.scan_status_label.config(text=f"Unknown barcode: {code}", fg='#e74c3c')
+            return False
+        
+        medicine_id, name, stock_packs, units_per_pack, pack_price, unit_price, sale_type = result
+        price = pack_price if sale_type == "Pack" else unit_price
+        
+        # Check stock against everything of this medicine already in the cart
+        units_in_cart = sum(item['quantity'] * (units_per_pack if item['type'] == "Pack" else 1)
+                            for item in self.cart_items if item['id'] == medicine_id)
+        units_needed = units_per_pack if sale_type == "Pack" else 1
+        if units_in_cart + units_needed > stock_packs * units_per_pack:
+            self.root.bell()
+            self.scan_status_label.config(text=f"Insufficient stock: {name}", fg='#e74c3c')
+            return False
+        
+        # Increment an existing line or append a new one, touching only that tree row
+        for index, item in enumerate(self.cart_items):
+            if item['id'] == medicine_id and item['type'] == sale_type:
+                item['quantity'] += 1
+                item['total'] = item['quantity'] * item['price']
+                break
+        else:
+            index = len(self.cart_items)
+            item = {
+                'id': medicine_id,
+                'name': name,
+                'type': sale_type,
+                'quantity': 1,
+                'price': price,
+                'total': price
+            }
+            self.cart_items.append(item)
+        
+        values = (item['id'], item['name'], item['type'], item['quantity'],
+                  money.display(item['price']), money.display(item['total']))
+        if self.cart_tree.exists(str(index)):
+            self.cart_tree.item(str(index), values=values)
+        else:
+            self.cart_tree.insert('', tk.END, iid=str(index), values=values)
+        self.cart_tree.see(str(index))
+        self.update_total_amount()
+        self.scan_status_label.config(text=f"Added: {name} ({sale_type}) x{item['quantity']}", fg='#27ae60')
+        return True
+
+    @perf.timed("add_to_cart")
     def add_to_cart(self, event=None):
         """Add medicine to cart"""
         if not hasattr(self, 'current_medicine') or not self.current_medicine:
@@ -789,24 +1303,23 @@ class PharmacyPOS:
             
             # Check stock
             if sale_type == "Pack":
-                if quantity > medicine[4]:  # stock_packs
-                    messagebox.showerror("Error", f"Insufficient stock. Available: {medicine[4]} packs")
+                if quantity > medicine.stock_packs:
+                    messagebox.showerror("Error", f"Insufficient stock. Available: {medicine.stock_packs} packs")
                     return
-                price = medicine[6]  # pack_price
+                price = medicine.pack_price
             else:  # Unit
-                total_units = medicine[4] * medicine[5]  # stock_packs * units_per_pack
-                if quantity > total_units:
-                    messagebox.showerror("Error", f"Insufficient stock. Available: {total_units} units")
+                if quantity > medicine.total_units:
+                    messagebox.showerror("Error", f"Insufficient stock. Available: {medicine.total_units} units")
                     return
-                price = medicine[7]  # unit_price
+                price = medicine.unit_price
             
             # Calculate total
             total = quantity * price
             
             # Add to cart items
             cart_item = {
-                'id': medicine[0],
-                'name': medicine[1],
+                'id': medicine.id,
+                'name': medicine.name,
                 'type': sale_type,
                 'quantity': quantity,
                 'price': price,
@@ -820,6 +1333,9 @@ class PharmacyPOS:
             
             # Clear search
             self.sales_search_entry.delete(0, tk.END)
+            self.sale_search.reset()
+            self.sale_candidates = []
+            self.candidate_listbox.delete(0, tk.END)
             self.medicine_info_text.config(state='normal')
             self.medicine_info_text.delete(1.0, tk.END)
             self.medicine_info_text.config(state='disabled')
@@ -834,21 +1350,21 @@ class PharmacyPOS:
         for item in self.cart_tree.get_children():
             self.cart_tree.delete(item)
         
-        # Add cart items
-        for item in self.cart_items:
-            self.cart_tree.insert('', tk.END, values=(
+        # Add cart items (the row id is the cart index so scans can update a single row)
+        for index, item in enumerate(self.cart_items):
+            self.cart_tree.insert('', tk.END, iid=str(index), values=(
                 item['id'], 
                 item['name'], 
                 item['type'], 
                 item['quantity'], 
-                f"${item['price']:.2f}", 
-                f"${item['total']:.2f}"
+                money.display(item['price']), 
+                money.display(item['total'])
             ))
 
     def update_total_amount(self):
         """Update the total amount label"""
         total = sum(item['total'] for item in self.cart_items)
-        self.total_amount_label.config(text=f"${total:.2f}")
+        self.total_amount_label.config(text=money.display(total))
 
     def remove_from_cart(self):
         """Remove selected item from cart"""
@@ -890,49 +1406,8 @@ class PharmacyPOS:
             return
         
         try:
-            # Process each item in cart
-            total_amount = 0
-            sale_ids = []
-            
-            for item in self.cart_items:
-                # Insert sale record
-                self.cursor.execute("""
-                    INSERT INTO sales (date, medicine_id, qty, type, price, total, user_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (datetime.now(), item['id'], item['quantity'], item['type'], 
-                      item['price'], item['total'], self.current_user[0]))
-                
-                sale_id = self.cursor.lastrowid
-                sale_ids.append(sale_id)
-                total_amount += item['total']
-                
-                # Update medicine stock
-                if item['type'] == "Pack":
-                    self.cursor.execute("""
-                        UPDATE medicines 
-                        SET stock_packs = stock_packs - ? 
-                        WHERE id = ?
-                    """, (item['quantity'], item['id']))
-                else:  # Unit
-                    # Get medicine details to calculate packs and units
-                    self.cursor.execute("SELECT stock_packs, units_per_pack FROM medicines WHERE id = ?", (item['id'],))
-                    result = self.cursor.fetchone()
-                    if result:
-                        stock_packs, units_per_pack = result
-                        total_units = stock_packs * units_per_pack
-                        remaining_units = total_units - item['quantity']
-                        
-                        # Calculate new packs and units
-                        new_packs = remaining_units // units_per_pack
-                        new_units = remaining_units % units_per_pack
-                        
-                        self.cursor.execute("""
-                            UPDATE medicines 
-                            SET stock_packs = ? 
-                            WHERE id = ?
-                        """, (new_packs, item['id']))
-            
-            self.conn.commit()
+            # Save sales and update stock
+            sale_ids, total_amount = self.save_sale_transaction()
             
             # Generate professional receipt
             receipt_text = self.generate_receipt(sale_ids, total_amount)
@@ -946,26 +1421,72 @@ class PharmacyPOS:
             # Refresh dashboard
             self.refresh_dashboard()
             
+            # New sales invalidate cached return search results
+            self.return_search.reset()
+            
             # Reload medicines
             if hasattr(self, 'medicines_tree'):
                 self.load_medicines()
                 
         except Exception as e:
+            # Undo any partially written sale so a retry starts clean
+            self.conn.rollback()
             messagebox.showerror("Error", f"Checkout failed: {str(e)}")
 
+    @perf.timed("checkout")
+    def save_sale_transaction(self):
+        """Insert the cart as sales rows and update stock in one transaction"""
+        # Process each item in cart
+        total_amount = 0
+        sale_ids = []
+        sold_units = []
+        invoice_no = None
+        
+        for item in self.cart_items:
+            # Units sold at today's pack size, kept on the line for the rollups and analytics
+            units = item['quantity']
+            if item['type'] == "Pack":
+                self.cursor.execute("SELECT units_per_pack FROM medicines WHERE id = ?", (item['id'],))
+                units *= self.cursor.fetchone()[0]
+            
+            # Insert sale record
+            self.cursor.execute("""
+                INSERT INTO sales (date, medicine_id, qty, type, price, total, user_id, invoice_no, units)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (datetime.now(), item['id'], item['quantity'], item['type'], 
+                  item['price'], item['total'], self.current_user.id, invoice_no, units))
+            
+            sale_id = self.cursor.lastrowid
+            if invoice_no is None:
+                # The first line's id is the invoice number printed on the receipt
+                invoice_no = sale_id
+                self.cursor.execute("UPDATE sales SET invoice_no = ? WHERE id = ?", (invoice_no, sale_id))
+            sale_ids.append(sale_id)
+            total_amount += item['total']
+            
+            # Take the stock from the earliest-expiring batches (FEFO)
+            batches.allocate(self.cursor, sale_id, item['id'], units)
+            sold_units.append((item['id'], units))
+        
+        batches.sync_medicines(self.cursor, [item['id'] for item in self.cart_items])
+        reorder.record(self.cursor, sold_units)
+        self.conn.commit()
+        return sale_ids, total_amount
+
+    @perf.timed("generate_receipt")
     def generate_receipt(self, sale_ids, total_amount):
         """Generate a professional formatted receipt"""
         try:
             # Get settings
-            self.cursor.execute("SELECT * FROM settings WHERE id = 1")
-            settings = self.cursor.fetchone()
+            settings = records.fetchone(self.cursor, records.Settings,
+                                        f"SELECT {records.Settings.COLUMNS} FROM settings WHERE id = 1")
             
             if settings:
-                pharmacy_name = settings[1]
-                pharmacy_address = settings[2]
-                pharmacy_phone = settings[3]
-                receipt_header = settings[4]
-                receipt_footer = settings[5]
+                pharmacy_name = settings.pharmacy_name
+                pharmacy_address = settings.pharmacy_address
+                pharmacy_phone = settings.pharmacy_phone
+                receipt_header = settings.receipt_header
+                receipt_footer = settings.receipt_footer
             else:
                 # Default values if settings not found
                 pharmacy_name = "My Pharmacy"
@@ -986,7 +1507,7 @@ class PharmacyPOS:
             
             # Add transaction details
             receipt_lines.append(f"Invoice: {invoice_number:<15} Date: {datetime.now().strftime('%d-%m-%Y')}")
-            cashier_name = self.current_user[1] if self.current_user else "Unknown"
+            cashier_name = self.current_user.username if self.current_user else "Unknown"
             receipt_lines.append(f"Cashier: {cashier_name}")
             receipt_lines.append("-" * 40)
             
@@ -1000,17 +1521,17 @@ class PharmacyPOS:
                 # Format quantity with type
                 qty_with_type = f"{item['quantity']}{item['type'][0]}"  # P for Pack, U for Unit
                 # Format prices
-                price = f"{item['price']:.2f}"
-                total = f"{item['total']:.2f}"
+                price = money.plain(item['price'])
+                total = money.plain(item['total'])
                 
                 # Add item line
                 receipt_lines.append(f"{item_name:<18} {qty_with_type:>3}  {price:>7}  {total:>7}")
             
             # Add totals section
             receipt_lines.append("-" * 40)
-            receipt_lines.append(f"{'Subtotal:':>30}  {total_amount:>7.2f}")
-            receipt_lines.append(f"{'Discount:':>30}  {0.00:>7.2f}")
-            receipt_lines.append(f"{'Total:':>30}  {total_amount:>7.2f}")
+            receipt_lines.append(f"{'Subtotal:':>30}  {money.plain(total_amount):>7}")
+            receipt_lines.append(f"{'Discount:':>30}  {money.plain(0):>7}")
+            receipt_lines.append(f"{'Total:':>30}  {money.plain(total_amount):>7}")
             receipt_lines.append("-" * 40)
             
             # Add header/footer messages
@@ -1022,16 +1543,16 @@ class PharmacyPOS:
             # Fallback to simple receipt if formatting fails
             receipt = "===== RECEIPT =====\n"
             receipt += f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-            cashier_name = self.current_user[1] if self.current_user else "Unknown"
+            cashier_name = self.current_user.username if self.current_user else "Unknown"
             receipt += f"Cashier: {cashier_name}\n"
             receipt += "-" * 30 + "\n"
             
             for item in self.cart_items:
                 receipt += f"{item['name']} ({item['type']})\n"
-                receipt += f"  {item['quantity']} x ${item['price']:.2f} = ${item['total']:.2f}\n"
+                receipt += f"  {item['quantity']} x {money.display(item['price'])} = {money.display(item['total'])}\n"
             
             receipt += "-" * 30 + "\n"
-            receipt += f"TOTAL: ${total_amount:.2f}\n"
+            receipt += f"TOTAL: {money.display(total_amount)}\n"
             receipt += "=" * 30 + "\n"
             receipt += "Thank you for your purchase!"
             return receipt
@@ -1162,10 +1683,30 @@ class PharmacyPOS:
         self.return_search_entry.pack(side=tk.LEFT, padx=5)
         self.return_search_entry.bind('<Return>', self.search_sales_for_return)
         
+        # Search as you type: debounced, runs off the UI thread and narrows cached results
+        self.return_search = IncrementalSearch(self.root, self.db_path, self.fetch_sale_matches,
+                                               self.sale_matches, self.fill_sales_tree,
+                                               name="returns.search", limit=self.SALES_PAGE_SIZE,
+                                               readers=self.readers)
+        self.return_search_entry.bind('<KeyRelease>', self.return_search.on_key)
+        
         search_btn = ttk.Button(search_frame, text="Search", command=self.search_sales_for_return, 
                                style='Modern.TButton')
         search_btn.pack(side=tk.LEFT, padx=5)
         
+        # Keyset paging through the results (newest first)
+        older_btn = ttk.Button(search_frame, text="Older ▶", command=lambda: self.page_sales(older=True), 
+                              style='Modern.TButton')
+        older_btn.pack(side=tk.RIGHT, padx=5)
+        newer_btn = ttk.Button(search_frame, text="◀ Newer", command=lambda: self.page_sales(older=False), 
+                              style='Modern.TButton')
+        newer_btn.pack(side=tk.RIGHT, padx=5)
+        self.return_search_entry.bind('<Next>', lambda e: self.page_sales(older=True))
+        self.return_search_entry.bind('<Prior>', lambda e: self.page_sales(older=False))
+        
+        # Rows currently shown (the page the Older/Newer buttons move from)
+        self.sales_page = []
+        
         # Sales treeview with modern styling
         sales_frame = tk.LabelFrame(self.returns_frame, text="Sales Records", 
                                    font=('Segoe UI', 12, 'bold'), bg='#f8f9fa', fg='#2c3e50',
@@ -1173,22 +1714,29 @@ class PharmacyPOS:
         sales_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=5)
         
         self.sales_tree = ttk.Treeview(sales_frame, 
-                                      columns=("ID", "Date", "Medicine", "Qty", "Type", "Price", "Total"),
+                                      columns=("ID", "Date", "Medicine", "Qty", "Type", "Price", "Total", "Invoice",
+                                               "Returnable"),
+                                      displaycolumns=("Invoice", "ID", "Date", "Medicine", "Qty", "Returnable", "Type",
+                                                      "Price", "Total"),
                                       show='headings', 
                                       style='Modern.Treeview')
         
-        self.sales_tree.heading("ID", text="Invoice No")
+        self.sales_tree.heading("Invoice", text="Invoice No")
+        self.sales_tree.heading("ID", text="Sale ID")
         self.sales_tree.heading("Date", text="Date")
         self.sales_tree.heading("Medicine", text="Medicine")
         self.sales_tree.heading("Qty", text="Quantity")
+        self.sales_tree.heading("Returnable", text="Returnable")
         self.sales_tree.heading("Type", text="Type")
         self.sales_tree.heading("Price", text="Price")
         self.sales_tree.heading("Total", text="Total")
         
+        self.sales_tree.column("Invoice", width=80, anchor=tk.CENTER)
         self.sales_tree.column("ID", width=80, anchor=tk.CENTER)
         self.sales_tree.column("Date", width=120, anchor=tk.CENTER)
         self.sales_tree.column("Medicine", width=150, anchor=tk.W)
         self.sales_tree.column("Qty", width=80, anchor=tk.CENTER)
+        self.sales_tree.column("Returnable", width=80, anchor=tk.CENTER)
         self.sales_tree.column("Type", width=80, anchor=tk.CENTER)
         self.sales_tree.column("Price", width=80, anchor=tk.E)
         self.sales_tree.column("Total", width=80, anchor=tk.E)
@@ -1220,124 +1768,212 @@ class PharmacyPOS:
                                 style='Danger.TButton')
         process_btn.pack(side=tk.LEFT, padx=5)
         
+        invoice_btn = ttk.Button(buttons_frame, text="Return Whole Invoice", command=self.return_invoice, 
+                                style='Danger.TButton')
+        invoice_btn.pack(side=tk.LEFT, padx=5)
+        
         cancel_btn = ttk.Button(buttons_frame, text="Cancel Return", command=self.cancel_return, 
                                style='Modern.TButton')
         cancel_btn.pack(side=tk.LEFT, padx=5)
 
+    @perf.timed("search_sales_for_return")
     def search_sales_for_return(self, event=None):
         """Search sales for return"""
-        search_term = self.return_search_entry.get().strip()
+        with self.readers.reader() as conn:
+            self.return_search.search_now(conn.cursor(), self.return_search_entry.get().strip())
+
+    def fetch_sale_matches(self, cursor, search_term, limit, older_than=None, newer_than=None):
+        """Fetch sales for an invoice/sale number or medicine name/batch, newest first
+
+        Numeric terms are exact invoice or sale id lookups. older_than/newer_than
+        take a (date, id) key for keyset paging; up to limit + 1 rows are returned
+        so the caller can tell whether another page exists.
+        """
+        conditions = []
+        params = []
+        if search_term.isdigit():
+            conditions.append("(s.invoice_no = ? OR s.id = ?)")
+            params += [int(search_term), int(search_term)]
+        elif search_term:
+            # Resolve matching medicines first, then their sales through idx_sales_medicine_date
+            conditions.append("s.medicine_id IN (SELECT id FROM medicines WHERE name LIKE ? OR batch LIKE ?)")
+            params += [f"%{search_term}%", f"%{search_term}%"]
+        if older_than is not None:
+            conditions.append("(s.date, s.id) < (?, ?)")
+            params += list(older_than)
+        elif newer_than is not None:
+            conditions.append("(s.date, s.id) > (?, ?)")
+            params += list(newer_than)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        order = "ASC" if newer_than is not None else "DESC"
+        
+        rows = records.fetch(cursor, records.Sale, f"""
+            SELECT s.id, s.date, m.name, s.qty, s.type, s.price, s.total, m.batch, s.invoice_no,
+                   s.qty - s.returned_qty
+            FROM sales s
+            JOIN medicines m ON s.medicine_id = m.id
+            {where}
+            ORDER BY s.date {order}, s.id {order}
+            LIMIT ?
+        """, params + [limit + 1])
+        if newer_than is not None:
+            # Keep the rows nearest the current page, shown newest first
+            rows = rows[:limit][::-1]
+        return rows
+
+    def sale_matches(self, sale, search_term):
+        """In-memory equivalent of the fetch_sale_matches filter"""
+        if search_term.isdigit():
+            return str(sale.id) == search_term or str(sale.invoice_no) == search_term
+        term = search_term.lower()
+        return term in sale.name.lower() or term in (sale.batch or "").lower()
+
+    def fill_sales_tree(self, sales):
+        """Show sales rows in the returns treeview"""
+        self.sales_page = sales
         
         # Clear existing items
-        for item in self.sales_tree.get_children():
-            self.sales_tree.delete(item)
-        
-        if search_term:
-            # Search by sale ID or medicine name/batch
-            self.cursor.execute("""
-                SELECT s.id, s.date, m.name, s.qty, s.type, s.price, s.total
-                FROM sales s
-                JOIN medicines m ON s.medicine_id = m.id
-                WHERE s.id LIKE ? OR m.name LIKE ? OR m.batch LIKE ?
-                ORDER BY s.date DESC
-            """, (f"%{search_term}%", f"%{search_term}%", f"%{search_term}%"))
-        else:
-            # Load recent sales
-            self.cursor.execute("""
-                SELECT s.id, s.date, m.name, s.qty, s.type, s.price, s.total
-                FROM sales s
-                JOIN medicines m ON s.medicine_id = m.id
-                ORDER BY s.date DESC
-                LIMIT 50
-            """)
-        
-        sales = self.cursor.fetchall()
+        self.sales_tree.delete(*self.sales_tree.get_children())
         
         for sale in sales:
-            self.sales_tree.insert('', tk.END, values=(
-                sale[0], sale[1], sale[2], sale[3], sale[4], f"${sale[5]:.2f}", f"${sale[6]:.2f}"
-            ))
+            self.sales_tree.insert('', tk.END, values=sale.tree_values())
+
+    @perf.timed("page_sales")
+    def page_sales(self, older=True):
+        """Show the next older or newer page of the current returns search"""
+        if not self.sales_page:
+            return
+        term = self.return_search_entry.get().strip()
+        with self.readers.reader() as conn:
+            if older:
+                rows = self.fetch_sale_matches(conn.cursor(), term, self.SALES_PAGE_SIZE,
+                                               older_than=self.sales_page[-1].key)[:self.SALES_PAGE_SIZE]
+            else:
+                rows = self.fetch_sale_matches(conn.cursor(), term, self.SALES_PAGE_SIZE,
+                                               newer_than=self.sales_page[0].key)
+        if rows:
+            # A page is not a complete result, so it must not be narrowed by the next keystroke
+            self.return_search.reset()
+            self.fill_sales_tree(rows)
+        return "break"
 
     def process_return(self):
-        """Process a return"""
+        """Return the selected sale lines (the entered quantity, or everything returnable on each line)"""
         selection = self.sales_tree.selection()
         if not selection:
             messagebox.showerror("Error", "Please select a sale to return")
             return
         
         try:
-            # Get selected sale
-            item = self.sales_tree.item(selection[0])
-            values = item['values']
-            sale_id = values[0]
+            sale_ids = [self.sales_tree.item(iid)['values'][0] for iid in selection]
             
-            # Get return quantity
-            return_qty = int(self.return_qty_entry.get() or 0)
-            if return_qty <= 0:
+            # Get return quantity (optional when several lines are selected)
+            qty_text = self.return_qty_entry.get().strip()
+            return_qty = int(qty_text) if qty_text else None
+            if (return_qty is None and len(sale_ids) == 1) or (return_qty is not None and return_qty <= 0):
                 messagebox.showerror("Error", "Please enter a valid return quantity")
                 return
-            
-            # Check if return quantity exceeds sold quantity
-            self.cursor.execute("SELECT qty, type, price, medicine_id FROM sales WHERE id = ?", (sale_id,))
-            sale = self.cursor.fetchone()
-            
-            if not sale:
-                messagebox.showerror("Error", "Sale record not found")
-                return
-            
-            sold_qty, sale_type, price, medicine_id = sale
-            
-            if return_qty > sold_qty:
-                messagebox.showerror("Error", f"Return quantity cannot exceed sold quantity ({sold_qty})")
-                return
-            
-            # Calculate refunded amount
-            refunded_amount = return_qty * price
+        except ValueError:
+            messagebox.showerror("Error", "Please enter a valid return quantity")
+            return
+        
+        self.return_sale_lines([(sale_id, return_qty) for sale_id in sale_ids])
+
+    def return_invoice(self):
+        """Return everything still returnable on the invoice of the selected sale line"""
+        selection = self.sales_tree.selection()
+        if not selection:
+            messagebox.showerror("Error", "Please select a sale from the invoice to return")
+            return
+        
+        sale_id = self.sales_tree.item(selection[0])['values'][0]
+        self.cursor.execute("""
+            SELECT id FROM sales
+            WHERE invoice_no = (SELECT invoice_no FROM sales WHERE id = ?) AND returned_qty < qty
+            ORDER BY id
+        """, (sale_id,))
+        lines = [(row[0], None) for row in self.cursor.fetchall()]
+        if not lines:
+            messagebox.showerror("Error", "Everything on this invoice has already been returned")
+            return
+        self.return_sale_lines(lines)
+
+    @perf.timed("return_sale_lines")
+    def return_sale_lines(self, lines):
+        """Return [(sale_id, qty or None for all returnable)] in one transaction with one receipt"""
+        try:
+            # One read for every line: what was sold, what is still returnable
+            placeholders = ",".join("?" * len(lines))
+            self.cursor.execute(f"""
+                SELECT s.id, s.qty, s.type, s.price, s.medicine_id, s.date, s.invoice_no, s.returned_qty,
+                       m.units_per_pack, m.name
+                FROM sales s
+                JOIN medicines m ON s.medicine_id = m.id
+                WHERE s.id IN ({placeholders})
+            """, [sale_id for sale_id, _ in lines])
+            sales = {row[0]: row for row in self.cursor.fetchall()}
+            
+            returned = []
+            for sale_id, return_qty in lines:
+                if sale_id not in sales:
+                    messagebox.showerror("Error", "Sale record not found")
+                    return
+                _, sold_qty, sale_type, price, medicine_id, sale_date, invoice_no, returned_qty, units_per_pack, name = sales[sale_id]
+                returnable = sold_qty - returned_qty
+                if return_qty is None:
+                    return_qty = returnable
+                if return_qty > returnable or return_qty <= 0:
+                    messagebox.showerror("Error", f"Return quantity for sale {sale_id} ({name}) cannot exceed the "
+                                                  f"returnable quantity ({returnable} of {sold_qty} sold)")
+                    return
+                units = return_qty * (units_per_pack if sale_type == "Pack" else 1)
+                returned.append((sale_id, return_qty, sale_type, return_qty * price, medicine_id, sale_date,
+                                 invoice_no, name, units))
             
             # Get reason
             reason = self.return_reason_entry.get().strip()
+            now = datetime.now()
+            
+            # Guarded update: another till may have returned some of these lines since the read above
+            self.cursor.executemany("""
+                UPDATE sales SET returned_qty = returned_qty + ?
+                WHERE id = ? AND returned_qty + ? <= qty
+            """, [(line[1], line[0], line[1]) for line in returned])
+            if self.cursor.rowcount != len(returned):
+                self.conn.rollback()
+                messagebox.showerror("Error", "Some of these sale lines have already been returned in the meantime")
+                return
             
-            # Insert return record
-            self.cursor.execute("""
+            # Insert return records
+            self.cursor.executemany("""
                 INSERT INTO returns (sale_id, medicine_id, return_date, return_qty, return_type, reason, refunded_amount)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (sale_id, medicine_id, datetime.now(), return_qty, sale_type, reason, refunded_amount))
+            """, [(line[0], line[4], now, line[1], line[2], reason, line[3]) for line in returned])
             
-            # Update medicine stock
-            if sale_type == "Pack":
-                self.cursor.execute("""
-                    UPDATE medicines 
-                    SET stock_packs = stock_packs + ? 
-                    WHERE id = ?
-                """, (return_qty, medicine_id))
-            else:  # Unit
-                # Get medicine details to calculate packs and units
-                self.cursor.execute("SELECT stock_packs, units_per_pack FROM medicines WHERE id = ?", (medicine_id,))
-                result = self.cursor.fetchone()
-                if result:
-                    stock_packs, units_per_pack = result
-                    total_units = stock_packs * units_per_pack
-                    new_units = total_units + return_qty
-                    
-                    # Calculate new packs and units
-                    new_packs = new_units // units_per_pack
-                    new_units_remaining = new_units % units_per_pack
-                    
-                    self.cursor.execute("""
-                        UPDATE medicines 
-                        SET stock_packs = ? 
-                        WHERE id = ?
-                    """, (new_packs, medicine_id))
+            # Put the stock back into the batches each line was sold from
+            for sale_id, _, _, _, medicine_id, _, _, _, units in returned:
+                batches.restore(self.cursor, sale_id, medicine_id, units)
+            batches.sync_medicines(self.cursor, [line[4] for line in returned])
+            
+            # Take the units back out of the demand rates, grouped by sale day
+            by_day = {}
+            for line in returned:
+                by_day.setdefault(str(line[5])[:10], []).append((line[4], -line[8]))
+            for day, quantities in by_day.items():
+                reorder.record(self.cursor, quantities, day=day)
             
             self.conn.commit()
             
-            # Show receipt
+            # Show one receipt for all lines
+            invoices = sorted({line[6] or line[0] for line in returned})
+            refunded_amount = sum(line[3] for line in returned)
             receipt = "===== RETURN RECEIPT =====\n"
-            receipt += f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-            receipt += f"Invoice No: {sale_id}\n"
-            receipt += f"Medicine: {values[2]}\n"
-            receipt += f"Returned: {return_qty} {sale_type}(s)\n"
-            receipt += f"Refunded Amount: ${refunded_amount:.2f}\n"
+            receipt += f"Date: {now.strftime('%Y-%m-%d %H:%M:%S')}\n"
+            receipt += f"Invoice No: {', '.join(str(invoice) for invoice in invoices)}\n"
+            for line in returned:
+                receipt += f"Medicine: {line[7]}\n"
+                receipt += f"Returned: {line[1]} {line[2]}(s)  {money.display(line[3])}\n"
+            receipt += f"Refunded Amount: {money.display(refunded_amount)}\n"
             receipt += "=" * 30 + "\n"
             receipt += "Thank you!"
             
@@ -1347,6 +1983,10 @@ class PharmacyPOS:
             self.return_qty_entry.delete(0, tk.END)
             self.return_reason_entry.delete(0, tk.END)
             
+            # Show the reduced returnable quantities
+            self.return_search.reset()
+            self.search_sales_for_return()
+            
             # Refresh dashboard
             self.refresh_dashboard()
             
@@ -1354,9 +1994,8 @@ class PharmacyPOS:
             if hasattr(self, 'medicines_tree'):
                 self.load_medicines()
                 
-        except ValueError:
-            messagebox.showerror("Error", "Please enter a valid return quantity")
         except Exception as e:
+            self.conn.rollback()
             messagebox.showerror("Error", f"Return processing failed: {str(e)}")
 
     def cancel_return(self):
@@ -1389,7 +2028,9 @@ class PharmacyPOS:
         # Report type with modern styling
         tk.Label(options_frame, text="Report Type:", font=('Segoe UI', 10), bg='#f0f0f0').grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
         self.report_type_var = tk.StringVar(value="Daily Sales")
-        report_types = ["Daily Sales", "Monthly Sales", "Stock Summary", "Expired Medicines", "Returns Report"]
+        report_types = ["Daily Sales", "Monthly Sales", "Sales Comparison", "Top Sellers", "Slow Movers",
+                        "ABC Classification", "Traffic Heatmap", "Stock Summary", "Expired Medicines", "Returns Report",
+                        "Reorder Suggestions"]
         self.report_type_menu = ttk.Combobox(options_frame, textvariable=self.report_type_var, 
                                            values=report_types, state="readonly", 
                                            font=('Segoe UI', 10), width=20)
@@ -1427,8 +2068,9 @@ class PharmacyPOS:
         report_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.report_text.configure(yscrollcommand=report_scrollbar.set)
 
+    @perf.timed("view_report")
     def view_report(self):
-        """View selected report"""
+        """View selected report (served from the report cache while its data is unchanged)"""
         report_type = self.report_type_var.get()
         from_date = self.from_date_entry.get().strip()
         to_date = self.to_date_entry.get().strip()
@@ -1440,122 +2082,292 @@ class PharmacyPOS:
         self.report_text.delete(1.0, tk.END)
         
         try:
-            if report_type == "Daily Sales":
-                self.cursor.execute("""
-                    SELECT date, SUM(total) as daily_total
-                    FROM sales
-                    WHERE date BETWEEN ? AND ?
-                    GROUP BY date(date)
-                    ORDER BY date
-                """, (from_date, f"{to_date} 23:59:59"))
-                
-                results = self.cursor.fetchall()
-                
-                report = "===== DAILY SALES REPORT =====\n"
-                report += f"Period: {from_date} to {to_date}\n\n"
-                report += "Date\t\tSales Amount\n"
-                report += "-" * 40 + "\n"
-                
-                total = 0
-                for row in results:
-                    report += f"{row[0][:10]}\t${row[1]:.2f}\n"
-                    total += row[1]
-                
-                report += "-" * 40 + "\n"
-                report += f"TOTAL:\t\t${total:.2f}\n"
-                self.report_text.insert(1.0, report)
-                
-            elif report_type == "Monthly Sales":
-                self.cursor.execute("""
-                    SELECT strftime('%Y-%m', date) as month, SUM(total) as monthly_total
-                    FROM sales
-                    WHERE date BETWEEN ? AND ?
-                    GROUP BY strftime('%Y-%m', date)
-                    ORDER BY month
-                """, (from_date, f"{to_date} 23:59:59"))
-                
-                results = self.cursor.fetchall()
+            # Reports are read on a reader, which sees committed data only: the watermark must not count more
+            self.conn.commit()
+            if report_type in self.REPORT_SOURCES:
+                monthly, global_names, by_day = self.REPORT_SOURCES[report_type]
+                # Reports without a date range are cached once, not per range
+                key = (report_type, from_date if monthly else "", to_date if monthly else "",
+                       datetime.now().strftime("%Y-%m-%d") if by_day else "")
+                current = report_cache.watermark(self.cursor, monthly, global_names, from_date, to_date)
+                report = report_cache.lookup(self.cursor, key, current)
+                if report is None:
+                    report = self.read_report(report_type, from_date, to_date)
+                    report_cache.store(self.cursor, key, current, report)
+            else:
+                report = self.read_report(report_type, from_date, to_date)
+            self.conn.commit()
+            self.report_text.insert(1.0, report)
+        except Exception as e:
+            self.conn.rollback()
+            messagebox.showerror("Error", f"Failed to generate report: {str(e)}")
+
+    def read_report(self, report_type, from_date, to_date):
+        """Generate a report on a reader connection, from one snapshot of the live tables and archives"""
+        if report_type in self.ROLLUP_REPORTS:
+            # Writes to the archives are done on the writer before the reader attaches them
+            with archive.attached(self.conn, self.db_path, from_date, to_date) as schemas:
+                if rollup.backfill_archives(self.cursor, schemas):
+                    # Commit before the archives are detached again
+                    self.conn.commit()
+        with self.readers.reader() as conn, archive.attached(conn, self.db_path, from_date, to_date), \
+                readers.snapshot(conn):
+            return self.generate_report_text(conn.cursor(), report_type, from_date, to_date)
+
+    def generate_report_text(self, cursor, report_type, from_date, to_date):
+        """Build the text of a report from the live tables (and any archives the range needs)"""
+        report = ""
+        if report_type == "Daily Sales":
+            # Long ranges are summed per month shard in the worker processes
+            results = sorted(self.report_shards.totals(cursor, 'daily', from_date, to_date).items())
+            
+            report = "===== DAILY SALES REPORT =====\n"
+            report += f"Period: {from_date} to {to_date}\n\n"
+            report += "Date\t\tSales Amount\n"
+            report += "-" * 40 + "\n"
+            
+            total = 0
+            for row in results:
+                report += f"{daykey.day_text(row[0])}\t{money.display(row[1])}\n"
+                total += row[1]
+            
+            report += "-" * 40 + "\n"
+            report += f"TOTAL:\t\t{money.display(total)}\n"
+            
+        elif report_type == "Monthly Sales":
+            if self.report_days(from_date, to_date) > self.ANALYTICS_MIN_DAYS:
+                # Multi-year ranges are summed from the in-memory columns (kept current from the writer)
+                self.sales_columns.refresh(self.conn, self.db_path)
+                results = sorted(self.sales_columns.totals_by('month', from_date, to_date).items())
+            else:
+                totals = self.report_shards.totals(cursor, 'monthly', from_date, to_date)
+                results = [(daykey.month_text(month), total) for month, total in sorted(totals.items())]
+            
+            report = "===== MONTHLY SALES REPORT =====\n"
+            report += f"Period: {from_date} to {to_date}\n\n"
+            report += "Month\t\tSales Amount\n"
+            report += "-" * 40 + "\n"
+            
+            total = 0
+            for row in results:
+                report += f"{row[0]}\t{money.display(row[1])}\n"
+                total += row[1]
+            
+            report += "-" * 40 + "\n"
+            report += f"TOTAL:\t\t{money.display(total)}\n"
+            
+        elif report_type == "Stock Summary":
+            cursor.execute("""
+                SELECT name, batch, expiry, stock_packs, units_per_pack, pack_price
+                FROM medicines
+                ORDER BY name
+            """)
+            
+            results = cursor.fetchall()
+            
+            report = "===== STOCK SUMMARY REPORT =====\n\n"
+            report += "Medicine\t\tBatch\t\tExpiry\t\tStock\tUnits\tPrice\n"
+            report += "-" * 80 + "\n"
+            
+            for row in results:
+                total_units = row[3] * row[4]
+                report += f"{row[0][:15]}\t{row[1]}\t{row[2]}\t{row[3]}\t{total_units}\t{money.display(row[5])}\n"
+            
+            
+        elif report_type == "Expired Medicines":
+            # One line per expired batch still holding stock
+            cursor.execute("""
+                SELECT m.name, b.batch, b.expiry, b.qty / m.units_per_pack, b.qty
+                FROM medicine_batches b
+                JOIN medicines m ON b.medicine_id = m.id
+                WHERE b.qty > 0 AND b.expiry < date('now')
+                ORDER BY b.expiry
+            """)
+            
+            results = cursor.fetchall()
+            
+            report = "===== EXPIRED MEDICINES REPORT =====\n\n"
+            report += "Medicine\t\tBatch\t\tExpiry\t\tStock\tUnits\n"
+            report += "-" * 70 + "\n"
+            
+            for row in results:
+                report += f"{row[0][:15]}\t{row[1]}\t{row[2]}\t{row[3]}\t{row[4]}\n"
+            
+            
+        elif report_type == "Returns Report":
+            with archive.attached(cursor.connection, self.db_path, from_date, to_date) as schemas:
+                returns = archive.union('returns', 'return_date, medicine_id, return_qty, return_type, '
+                                                   'refunded_amount, reason, day_key', schemas)
+                results = records.fetch(cursor, records.Return, f"""
+                    SELECT r.return_date, m.name, r.return_qty, r.return_type, r.refunded_amount, r.reason
+                    FROM {returns} r
+                    JOIN medicines m ON r.medicine_id = m.id
+                    WHERE r.day_key BETWEEN ? AND ?
+                    ORDER BY r.return_date
+                """, (daykey.day_key(from_date), daykey.day_key(to_date)))
+            
+            report = "===== RETURNS REPORT =====\n"
+            report += f"Period: {from_date} to {to_date}\n\n"
+            report += "Date\t\tMedicine\t\tQty\tType\tAmount\tReason\n"
+            report += "-" * 80 + "\n"
+            
+            total_refunded = 0
+            for returned in results:
+                report += (f"{returned.return_date[:10]}\t{returned.name[:15]}\t{returned.return_qty}\t"
+                           f"{returned.return_type}\t{returned.refunded_text}\t{returned.reason_display[:20]}\n")
+                total_refunded += returned.refunded_amount
+            
+            report += "-" * 80 + "\n"
+            report += f"TOTAL REFUNDED:\t\t\t\t\t{money.display(total_refunded)}\n"
+            
+        elif report_type == "Reorder Suggestions":
+            # Built from the maintained demand rates, not from sales history
+            suggestions = reorder.suggestions(cursor)
+            
+            report = "===== REORDER SUGGESTIONS =====\n"
+            report += (f"Reorder below {reorder.REORDER_POINT_DAYS} days of cover, "
+                       f"up to {reorder.TARGET_COVER_DAYS} days\n\n")
+            
+            supplier = None
+            for item in suggestions:
+                if item['supplier'] != supplier:
+                    supplier = item['supplier']
+                    report += f"\n{supplier}\n"
+                    report += "Medicine\t\tPer Day\tOn Hand\tCover\tOrder Packs\n"
+                    report += "-" * 70 + "\n"
+                report += (f"{item['name'][:15]}\t{item['rate']:.1f}\t{item['on_hand']}\t"
+                           f"{item['cover_days']:.1f}d\t{item['packs']}\n")
+            
+            report += "-" * 70 + "\n"
+            report += f"TOTAL: {len(suggestions)} medicines\n"
+            
+        elif report_type == "Sales Comparison":
+            # Selected period against the same number of days just before it
+            start = datetime.strptime(from_date, "%Y-%m-%d").date()
+            end = datetime.strptime(to_date, "%Y-%m-%d").date()
+            previous = (start - (end - start) - timedelta(days=1), start - timedelta(days=1))
+            self.sales_columns.refresh(self.conn, self.db_path)
+            changes = self.sales_columns.compare((start, end), previous)
+            current_total = sum(now for now, _ in changes.values())
+            previous_total = sum(before for _, before in changes.values())
+            
+            report = "===== SALES COMPARISON =====\n"
+            report += f"Period: {from_date} to {to_date}\n"
+            report += f"Compared with: {previous[0].isoformat()} to {previous[1].isoformat()}\n\n"
+            report += f"This period:\t{money.display(current_total)}\n"
+            report += f"Previous:\t{money.display(previous_total)}\n"
+            if previous_total:
+                report += f"Change:\t\t{(current_total - previous_total) / previous_total * 100:+.1f}%\n"
+            
+            ranked = sorted(changes.items(), key=lambda item: (item[1][1] - item[1][0], item[0]))
+            names = self.medicine_names(cursor, [medicine_id for medicine_id, _ in ranked[:10] + ranked[-10:]])
+            for title, rows in (("Biggest Gains", [row for row in ranked[:10] if row[1][0] > row[1][1]]),
+                                ("Biggest Drops", [row for row in ranked[::-1][:10] if row[1][0] < row[1][1]])):
+                report += f"\n{title}\n"
+                report += "Medicine\t\tThis Period\tPrevious\tChange\n"
+                report += "-" * 70 + "\n"
+                for medicine_id, (now, before) in rows:
+                    report += (f"{names.get(medicine_id, f'#{medicine_id}')[:15]}\t{money.display(now)}\t\t"
+                               f"{money.display(before)}\t\t{money.signed(now - before)}\n")
+        
+        elif report_type in ("Top Sellers", "Slow Movers", "ABC Classification"):
+            totals = self.medicine_totals(cursor, from_date, to_date)
+            
+            if report_type == "Top Sellers":
+                ranked = sorted(totals, key=lambda row: (-row[2], row[0]))[:rollup.TOP_N]
+                names = self.medicine_names(cursor, [row[0] for row in ranked])
                 
-                report = "===== MONTHLY SALES REPORT =====\n"
+                report = "===== TOP SELLERS =====\n"
                 report += f"Period: {from_date} to {to_date}\n\n"
-                report += "Month\t\tSales Amount\n"
-                report += "-" * 40 + "\n"
-                
-                total = 0
-                for row in results:
-                    report += f"{row[0]}\t${row[1]:.2f}\n"
-                    total += row[1]
-                
-                report += "-" * 40 + "\n"
-                report += f"TOTAL:\t\t${total:.2f}\n"
-                self.report_text.insert(1.0, report)
-                
-            elif report_type == "Stock Summary":
-                self.cursor.execute("""
-                    SELECT name, batch, expiry, stock_packs, units_per_pack, pack_price
-                    FROM medicines
-                    ORDER BY name
-                """)
-                
-                results = self.cursor.fetchall()
-                
-                report = "===== STOCK SUMMARY REPORT =====\n\n"
-                report += "Medicine\t\tBatch\t\tExpiry\t\tStock\tUnits\tPrice\n"
-                report += "-" * 80 + "\n"
-                
-                for row in results:
-                    total_units = row[3] * row[4]
-                    report += f"{row[0][:15]}\t{row[1]}\t{row[2]}\t{row[3]}\t{total_units}\t${row[5]:.2f}\n"
-                
-                self.report_text.insert(1.0, report)
+                report += "Rank\tMedicine\t\tUnits\tSales Amount\n"
+                report += "-" * 60 + "\n"
+                for rank, (medicine_id, units, amount) in enumerate(ranked, 1):
+                    report += f"{rank}\t{names.get(medicine_id, f'#{medicine_id}')[:15]}\t{units}\t{money.display(amount)}\n"
                 
-            elif report_type == "Expired Medicines":
-                self.cursor.execute("""
-                    SELECT name, batch, expiry, stock_packs
+            elif report_type == "Slow Movers":
+                # Medicines in stock that sold least over the period, unsold ones first
+                sold = {medicine_id: (units, amount) for medicine_id, units, amount in totals}
+                cursor.execute("""
+                    SELECT id, name, stock_packs, units_per_pack
                     FROM medicines
-                    WHERE expiry < date('now')
-                    ORDER BY expiry
+                    WHERE stock_packs > 0
                 """)
+                ranked = sorted(cursor.fetchall(),
+                                key=lambda row: (sold.get(row[0], (0, 0))[0], row[1]))[:rollup.TOP_N]
                 
-                results = self.cursor.fetchall()
-                
-                report = "===== EXPIRED MEDICINES REPORT =====\n\n"
-                report += "Medicine\t\tBatch\t\tExpiry\t\tStock\n"
+                report = "===== SLOW MOVERS =====\n"
+                report += f"Period: {from_date} to {to_date}\n\n"
+                report += "Medicine\t\tUnits Sold\tSales Amount\tStock\n"
                 report += "-" * 60 + "\n"
+                for medicine_id, name, stock_packs, units_per_pack in ranked:
+                    units, amount = sold.get(medicine_id, (0, 0))
+                    report += f"{name[:15]}\t{units}\t\t{money.display(amount)}\t\t{stock_packs * units_per_pack}\n"
                 
-                for row in results:
-                    report += f"{row[0][:15]}\t{row[1]}\t{row[2]}\t{row[3]}\n"
-                
-                self.report_text.insert(1.0, report)
-                
-            elif report_type == "Returns Report":
-                self.cursor.execute("""
-                    SELECT r.return_date, m.name, r.return_qty, r.return_type, r.refunded_amount, r.reason
-                    FROM returns r
-                    JOIN medicines m ON r.medicine_id = m.id
-                    WHERE r.return_date BETWEEN ? AND ?
-                    ORDER BY r.return_date
-                """, (from_date, f"{to_date} 23:59:59"))
-                
-                results = self.cursor.fetchall()
+            else:
+                classes = rollup.abc_classes(totals)
+                grand_total = sum(row[2] for row in totals)
                 
-                report = "===== RETURNS REPORT =====\n"
+                report = "===== ABC CLASSIFICATION =====\n"
                 report += f"Period: {from_date} to {to_date}\n\n"
-                report += "Date\t\tMedicine\t\tQty\tType\tAmount\tReason\n"
-                report += "-" * 80 + "\n"
-                
-                total_refunded = 0
-                for row in results:
-                    reason = row[5] if row[5] else "N/A"
-                    report += f"{row[0][:10]}\t{row[1][:15]}\t{row[2]}\t{row[3]}\t${row[4]:.2f}\t{reason[:20]}\n"
-                    total_refunded += row[4]
-                
-                report += "-" * 80 + "\n"
-                report += f"TOTAL REFUNDED:\t\t\t\t\t${total_refunded:.2f}\n"
-                self.report_text.insert(1.0, report)
+                report += "Class\tMedicines\tSales Amount\tShare\n"
+                report += "-" * 60 + "\n"
+                for name, _ in rollup.ABC_LIMITS:
+                    rows = [row for row in totals if classes[row[0]] == name]
+                    amount = sum(row[2] for row in rows)
+                    share = amount / grand_total * 100 if grand_total else 0
+                    report += f"{name}\t{len(rows)}\t\t{money.display(amount)}\t\t{share:.1f}%\n"
                 
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate report: {str(e)}")
+                a_items = sorted((row for row in totals if classes[row[0]] == 'A'),
+                                 key=lambda row: (-row[2], row[0]))[:rollup.TOP_N]
+                names = self.medicine_names(cursor, [row[0] for row in a_items])
+                report += "\nClass A Medicines\n"
+                report += "Medicine\t\tUnits\tSales Amount\n"
+                report += "-" * 60 + "\n"
+                for medicine_id, units, amount in a_items:
+                    report += f"{names.get(medicine_id, f'#{medicine_id}')[:15]}\t{units}\t{money.display(amount)}\n"
+        
+        elif report_type == "Traffic Heatmap":
+            with archive.attached(cursor.connection, self.db_path, from_date, to_date) as schemas:
+                source = archive.union('sales_by_hour', 'day, hour, transactions, lines, amount', schemas)
+                traffic = rollup.hourly_traffic(cursor, source, from_date, to_date)
+                transactions, hours = rollup.throughput(cursor, source, from_date, to_date)
+            
+            report = "===== TRAFFIC HEATMAP =====\n"
+            report += f"Period: {from_date} to {to_date}\n"
+            report += "Average transactions per weekday and hour\n\n"
+            report += rollup.heatmap(traffic, from_date, to_date)
+            report += "\n" + rollup.heatmap(traffic, from_date, to_date, shades=True)
+            report += "-" * 60 + "\n"
+            if hours:
+                report += f"Transactions:\t{transactions} in {hours} trading hours\n"
+                report += f"Throughput:\t{transactions / hours:.1f} transactions/hour\n"
+            busiest = rollup.peak(traffic, from_date, to_date)
+            if busiest:
+                (weekday, hour), average = busiest
+                report += f"Busiest hour:\t{rollup.WEEKDAYS[weekday]} {hour:02d}:00 ({average:.1f} transactions)\n"
+        
+        return report
+
+    @staticmethod
+    def report_days(from_date, to_date):
+        """Days in a report range (0 if the dates do not parse; the SQL reports then show nothing)"""
+        try:
+            return (datetime.strptime(to_date, "%Y-%m-%d") - datetime.strptime(from_date, "%Y-%m-%d")).days + 1
+        except ValueError:
+            return 0
+
+    def medicine_totals(self, cursor, from_date, to_date):
+        """[(medicine_id, units, amount)] over the period from the sales rollup, archives included"""
+        totals = self.report_shards.totals(cursor, 'medicine', from_date, to_date)
+        return [(medicine_id, units, amount) for medicine_id, (units, amount) in sorted(totals.items())]
+
+    def medicine_names(self, cursor, ids):
+        """{id: name} for the given medicine ids"""
+        ids = list(set(ids))
+        if not ids:
+            return {}
+        cursor.execute(f"SELECT id, name FROM medicines WHERE id IN ({','.join('?' * len(ids))})", ids)
+        return dict(cursor.fetchall())
 
     def export_excel(self):
         """Export report to Excel"""
@@ -1626,24 +2438,24 @@ class PharmacyPOS:
     def load_settings(self):
         """Load receipt settings from database"""
         try:
-            self.cursor.execute("SELECT * FROM settings WHERE id = 1")
-            settings = self.cursor.fetchone()
+            settings = records.fetchone(self.cursor, records.Settings,
+                                        f"SELECT {records.Settings.COLUMNS} FROM settings WHERE id = 1")
             
             if settings:
                 self.pharmacy_name_entry.delete(0, tk.END)
-                self.pharmacy_name_entry.insert(0, settings[1])
+                self.pharmacy_name_entry.insert(0, settings.pharmacy_name)
                 
                 self.pharmacy_address_entry.delete(0, tk.END)
-                self.pharmacy_address_entry.insert(0, settings[2])
+                self.pharmacy_address_entry.insert(0, settings.pharmacy_address)
                 
                 self.pharmacy_phone_entry.delete(0, tk.END)
-                self.pharmacy_phone_entry.insert(0, settings[3])
+                self.pharmacy_phone_entry.insert(0, settings.pharmacy_phone)
                 
                 self.receipt_header_entry.delete(0, tk.END)
-                self.receipt_header_entry.insert(0, settings[4])
+                self.receipt_header_entry.insert(0, settings.receipt_header)
                 
                 self.receipt_footer_entry.delete(0, tk.END)
-                self.receipt_footer_entry.insert(0, settings[5])
+                self.receipt_footer_entry.insert(0, settings.receipt_footer)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load settings: {str(e)}")
 
@@ -1693,6 +2505,8 @@ class PharmacyPOS:
         self.root.bind('<Control-c>', lambda e: self.checkout())
         self.root.bind('<Control-u>', lambda e: self.sale_type_var.set("Unit"))
         self.root.bind('<Control-k>', lambda e: self.sale_type_var.set("Pack"))
+        self.root.bind('<Control-b>', lambda e: [self.scanner_mode_var.set(not self.scanner_mode_var.get()),
+                                                 self.sales_search_entry.focus_set()])
         
         # Returns shortcuts
         # (Ctrl+F already bound for search)
@@ -1760,16 +2574,17 @@ class PharmacyPOS:
             return
         
         # Check credentials
-        self.cursor.execute("SELECT * FROM users WHERE username = ? AND password = ?", (username, password))
-        user = self.cursor.fetchone()
+        user = records.fetchone(self.cursor, records.User,
+                                f"SELECT {records.User.COLUMNS} FROM users WHERE username = ? AND password = ?",
+                                (username, password))
         
         if user:
             self.current_user = user
-            self.status_label.config(text=f"Logged in as: {user[1]} ({user[3]})")
+            self.status_label.config(text=f"Logged in as: {user.username} ({user.role})")
             self.login_window.destroy()
             
             # Enable tabs based on user role
-            if user[3] == "Admin":
+            if user.is_admin:
                 # Enable ALL tabs for Admin
                 self.notebook.tab(self.dashboard_frame, state='normal')
                 self.notebook.tab(self.medicines_frame, state='normal')
@@ -1777,7 +2592,7 @@ class PharmacyPOS:
                 self.notebook.tab(self.returns_frame, state='normal')
                 self.notebook.tab(self.reports_frame, state='normal')
                 self.notebook.tab(self.settings_frame, state='normal')
-            elif user[3] == "Pharmacist":
+            elif user.role == "Pharmacist":
                 # Enable limited tabs for Pharmacist
                 self.notebook.tab(self.dashboard_frame, state='normal')
                 self.notebook.tab(self.medicines_frame, state='normal')
@@ -1810,24 +2625,170 @@ class PharmacyPOS:
         # Show login
         self.show_login()
 
+    @perf.timed("backup_database")
     def backup_database(self):
         """Backup database"""
         try:
-            import shutil
-            backup_name = f"pharmacy_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
-            shutil.copy2("pharmacy.db", backup_name)
-            messagebox.showinfo("Backup", f"Database backed up successfully as {backup_name}")
+            # One folder per backup: the live database and its yearly archives, under their own names
+            backup_dir = os.path.join(os.path.dirname(os.path.abspath(self.db_path)),
+                                      f"pharmacy_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+            copies = archive.backup(self.conn, self.db_path, backup_dir)
+            messagebox.showinfo("Backup", f"Database backed up successfully to {backup_dir} ({len(copies)} files)")
         except Exception as e:
             messagebox.showerror("Error", f"Backup failed: {str(e)}")
 
+    def archive_old_sales(self):
+        """Move sales and returns from closed periods into the yearly archive databases (Admin only)"""
+        if not self.current_user or not self.current_user.is_admin:
+            messagebox.showerror("Error", "Access denied. Admin rights required.")
+            return
+        
+        before = archive.cutoff()
+        if not messagebox.askyesno("Archive Old Sales",
+                                   f"Move sales and returns before {before.isoformat()} into yearly archive files?\n"
+                                   "They stay available to the date-range reports but can no longer be returned."):
+            return
+        
+        try:
+            moved = archive.archive(self.conn, self.db_path)
+            if not moved:
+                messagebox.showinfo("Archive", f"Nothing to archive before {before.isoformat()}")
+                return
+            summary = "\n".join(f"{year}: {sales} sales, {returns} returns -> {archive.archive_path(self.db_path, year)}"
+                                for year, (sales, returns) in sorted(moved.items()))
+            messagebox.showinfo("Archive", f"Archived:\n{summary}")
+            self.return_search.reset()
+            self.search_sales_for_return()
+            self.refresh_dashboard()
+        except Exception as e:
+            messagebox.showerror("Error", f"Archiving failed: {str(e)}")
+
     def manage_users(self):
         """Manage users (Admin only)"""
-        if not self.current_user or self.current_user[3] != "Admin":
+        if not self.current_user or not self.current_user.is_admin:
             messagebox.showerror("Error", "Access denied. Admin rights required.")
             return
         
         messagebox.showinfo("Manage Users", "User management functionality would be implemented here.")
 
+    def show_diagnostics(self):
+        """Show live timing statistics collected by the instrumentation layer"""
+        diag_window = tk.Toplevel(self.root)
+        diag_window.title("Diagnostics")
+        diag_window.geometry("1000x500")
+        diag_window.configure(bg='#f8f9fa')
+        
+        title_label = ttk.Label(diag_window, text="Performance Diagnostics", style='Header.TLabel')
+        title_label.pack(pady=(15, 10))
+        
+        # Controls
+        controls_frame = tk.Frame(diag_window, bg='#f8f9fa')
+        controls_frame.pack(fill=tk.X, padx=20, pady=5)
+        
+        enabled_var = tk.BooleanVar(value=perf.is_enabled())
+        
+        def toggle_instrumentation():
+            if enabled_var.get():
+                perf.enable()
+            else:
+                perf.disable()
+        
+        tk.Checkbutton(controls_frame, text="Enable instrumentation", variable=enabled_var,
+                       command=toggle_instrumentation, font=('Segoe UI', 10),
+                       bg='#f8f9fa', fg='#2c3e50', selectcolor='white').pack(side=tk.LEFT, padx=5)
+        
+        def reset_stats():
+            perf.reset()
+            sqlstats.reset()
+        
+        ttk.Button(controls_frame, text="Reset", command=reset_stats,
+                   style='Modern.TButton').pack(side=tk.LEFT, padx=5)
+        tk.Label(controls_frame, text=f"Slow query log: {sqlstats.SLOW_QUERY_LOG} "
+                                      f"(> {sqlstats.slow_query_threshold_ms:.0f} ms)",
+                 font=('Segoe UI', 9), bg='#f8f9fa', fg='#7f8c8d').pack(side=tk.LEFT, padx=15)
+        ttk.Button(controls_frame, text="Close", command=diag_window.destroy,
+                   style='Modern.TButton').pack(side=tk.RIGHT, padx=5)
+        
+        diag_notebook = ttk.Notebook(diag_window)
+        diag_notebook.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+        
+        def create_stats_tree(title, columns, first_width):
+            tree_frame = tk.Frame(diag_notebook, bg='#f8f9fa')
+            diag_notebook.add(tree_frame, text=title)
+            tree = ttk.Treeview(tree_frame, columns=columns, show='headings', style='Modern.Treeview')
+            for column in columns:
+                tree.heading(column, text=column if column in (columns[0], "Count", "Rows") else f"{column} (ms)")
+                tree.column(column, width=first_width if column == columns[0] else 80,
+                            anchor=tk.W if column == columns[0] else tk.E)
+            tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=tree.yview)
+            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+            tree.configure(yscrollcommand=scrollbar.set)
+            return tree
+        
+        # Timings tables (all times in milliseconds)
+        ops_tree = create_stats_tree("Operations", ("Operation", "Count", "Mean", "p50", "p95", "p99", "Max", "Total"), 220)
+        sql_tree = create_stats_tree("SQL Statements", ("Statement", "Count", "Rows", "Mean", "Max", "Total"), 480)
+        
+        # Database size, free space and maintenance runs
+        db_frame = tk.Frame(diag_notebook, bg='#f8f9fa')
+        diag_notebook.add(db_frame, text="Database")
+        db_buttons = tk.Frame(db_frame, bg='#f8f9fa')
+        db_buttons.pack(fill=tk.X, pady=5)
+        db_text = tk.Text(db_frame, wrap=tk.NONE, font=('Courier New', 10), bg='white', fg='#2c3e50')
+        db_text.pack(fill=tk.BOTH, expand=True)
+        
+        def show_database_report():
+            db_text.delete(1.0, tk.END)
+            db_text.insert(1.0, maintenance.report(self.cursor))
+        
+        def run_maintenance_now():
+            try:
+                self.maintenance.run_all()
+            except Exception as e:
+                messagebox.showerror("Error", f"Maintenance failed: {str(e)}")
+            show_database_report()
+        
+        def compact_database():
+            if not messagebox.askyesno("Compact Database",
+                                       "Rebuild the database file now? Sales cannot be saved until it finishes."):
+                return
+            try:
+                maintenance.compact(self.conn)
+            except Exception as e:
+                messagebox.showerror("Error", f"Compact failed: {str(e)}")
+            show_database_report()
+        
+        ttk.Button(db_buttons, text="Run Maintenance Now", command=run_maintenance_now,
+                   style='Modern.TButton').pack(side=tk.LEFT, padx=5)
+        ttk.Button(db_buttons, text="Compact (VACUUM)", command=compact_database,
+                   style='Modern.TButton').pack(side=tk.LEFT, padx=5)
+        show_database_report()
+        
+        def refresh_stats():
+            if not diag_window.winfo_exists():
+                return
+            for item in ops_tree.get_children():
+                ops_tree.delete(item)
+            for row in perf.snapshot():
+                ops_tree.insert('', tk.END, values=(
+                    row['name'], row['count'],
+                    f"{row['mean'] * 1000:.2f}", f"{row['p50'] * 1000:.2f}",
+                    f"{row['p95'] * 1000:.2f}", f"{row['p99'] * 1000:.2f}",
+                    f"{row['max'] * 1000:.2f}", f"{row['total'] * 1000:.1f}"
+                ))
+            for item in sql_tree.get_children():
+                sql_tree.delete(item)
+            for row in sqlstats.snapshot():
+                sql_tree.insert('', tk.END, values=(
+                    row['statement'], row['count'], row['rows'],
+                    f"{row['mean'] * 1000:.2f}", f"{row['max'] * 1000:.2f}", f"{row['total'] * 1000:.1f}"
+                ))
+            diag_window.after(1000, refresh_stats)
+        
+        refresh_stats()
+        diag_window.transient(self.root)
+
     def show_about(self):
         """Show about dialog"""
         messagebox.showinfo("About", "Pharmacy POS System\nVersion 1.0\n\nBuilt with Python and Tkinter")
@@ -1836,80 +2797,91 @@ class PharmacyPOS:
         """Exit the application"""
         result = messagebox.askyesno("Exit", "Are you sure you want to exit?")
         if result:
+            self.report_shards.close()
+            self.readers.close()
             self.conn.close()
             self.root.quit()
 
     def calculate_unit_price(self, event=None):
         """Calculate unit price based on pack price and units per pack"""
         try:
-            pack_price = float(self.pack_price_entry.get() or 0)
+            pack_price = money.to_cents(self.pack_price_entry.get() or 0)
             units = int(self.units_entry.get() or 1)
-            unit_price = pack_price / units if units > 0 else 0
+            unit_price = money.divide(pack_price, units)
             self.unit_price_entry.config(state='normal')
             self.unit_price_entry.delete(0, tk.END)
-            self.unit_price_entry.insert(0, f"{unit_price:.2f}")
+            self.unit_price_entry.insert(0, money.plain(unit_price))
             self.unit_price_entry.config(state='readonly')
         except ValueError:
             pass  # Ignore invalid input
 
+    @perf.timed("search_medicines")
     def search_medicines(self, event=None):
         """Search medicines by name or batch"""
-        search_term = self.search_entry.get().strip()
-        
-        # Clear existing items
-        for item in self.medicines_tree.get_children():
-            self.medicines_tree.delete(item)
-        
+        with self.readers.reader() as conn:
+            self.medicine_search.search_now(conn.cursor(), self.search_entry.get().strip())
+
+    def fetch_medicine_matches(self, cursor, search_term, limit):
+        """Fetch medicines whose name or batch contains the term (all medicines for an empty term)"""
         if search_term:
-            self.cursor.execute("""
-                SELECT * FROM medicines 
+            medicines = records.fetch(cursor, records.Medicine, f"""
+                SELECT {records.Medicine.COLUMNS} FROM medicines 
                 WHERE name LIKE ? OR batch LIKE ?
                 ORDER BY name
-            """, (f"%{search_term}%", f"%{search_term}%"))
+                LIMIT ?
+            """, (f"%{search_term}%", f"%{search_term}%", limit + 1))
         else:
-            self.cursor.execute("SELECT * FROM medicines ORDER BY name")
+            medicines = records.fetch(cursor, records.Medicine,
+                                      f"SELECT {records.Medicine.COLUMNS} FROM medicines ORDER BY name")
         
-        medicines = self.cursor.fetchall()
+        # Nothing contains the term: fall back to typo-tolerant matching
+        if not medicines and search_term:
+            medicines = self.fetch_fuzzy_medicines(cursor, search_term, limit)
+        return medicines
+
+    def fetch_fuzzy_medicines(self, cursor, search_term, limit):
+        """Fetch medicines whose names are similar to the term, most similar first"""
+        with perf.timer("fuzzy_search"):
+            matches = self.name_index.search(cursor, search_term, limit)
+        if not matches:
+            return []
+        medicine_ids = [medicine_id for medicine_id, _ in matches]
+        medicines = records.fetch(cursor, records.Medicine, f"""
+            SELECT {records.Medicine.COLUMNS} FROM medicines WHERE id IN ({', '.join('?' * len(medicine_ids))})
+        """, medicine_ids)
+        by_id = {medicine.id: medicine for medicine in medicines}
+        return [by_id[medicine_id] for medicine_id in medicine_ids if medicine_id in by_id]
+
+    def medicine_matches(self, medicine, search_term):
+        """In-memory equivalent of the fetch_medicine_matches filter"""
+        term = search_term.lower()
+        return term in medicine.name.lower() or term in (medicine.batch or "").lower()
+
+    def fill_medicines_tree(self, medicines):
+        """Show medicine rows in the medicines treeview"""
+        # Clear existing items
+        self.medicines_tree.delete(*self.medicines_tree.get_children())
         
         for medicine in medicines:
-            total_units = medicine[4] * medicine[5]  # stock_packs * units_per_pack
-            batch_display = medicine[2] if medicine[2] else "N/A"  # Handle optional batch
-            self.medicines_tree.insert('', tk.END, values=(
-                medicine[0],           # id
-                medicine[1],           # name
-                batch_display,         # batch (with N/A fallback)
-                medicine[3],           # expiry
-                medicine[4],           # stock_packs
-                total_units,           # calculated total units
-                f"${medicine[6]:.2f}", # pack_price
-                f"${medicine[7]:.2f}"  # unit_price
-            ))
+            self.medicines_tree.insert('', tk.END, values=medicine.tree_values())
 
+    @perf.timed("load_medicines")
     def load_medicines(self):
         """Load all medicines into the treeview"""
-        # Clear existing items
-        for item in self.medicines_tree.get_children():
-            self.medicines_tree.delete(item)
+        # Any cached search results are out of date once the inventory is reloaded
+        self.medicine_search.reset()
         
         # Load medicines from database
-        self.cursor.execute("SELECT * FROM medicines ORDER BY name")
-        medicines = self.cursor.fetchall()
-        
-        for medicine in medicines:
-            total_units = medicine[4] * medicine[5]  # stock_packs * units_per_pack
-            batch_display = medicine[2] if medicine[2] else "N/A"  # Handle optional batch
-            self.medicines_tree.insert('', tk.END, values=(
-                medicine[0],           # id
-                medicine[1],           # name
-                batch_display,         # batch (with N/A fallback)
-                medicine[3],           # expiry
-                medicine[4],           # stock_packs
-                total_units,           # calculated total units
-                f"${medicine[6]:.2f}", # pack_price
-                f"${medicine[7]:.2f}"  # unit_price
-            ))
+        self.fill_medicines_tree(records.fetch(self.cursor, records.Medicine,
+                                               f"SELECT {records.Medicine.COLUMNS} FROM medicines ORDER BY name"))
 
 if __name__ == "__main__":
+    # Report worker processes (shards.py) start from this executable in a frozen build
+    multiprocessing.freeze_support()
+    # --profile enables instrumentation, --profile-startup also prints a startup breakdown
+    profile_startup = "--profile-startup" in sys.argv
+    if profile_startup or "--profile" in sys.argv:
+        perf.enable()
     root = tk.Tk()
-    app = PharmacyPOS(root)
+    app = PharmacyPOS(root, profile_startup=profile_startup)
     root.mainloop()
\ No newline at end of file
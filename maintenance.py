@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Database maintenance for the Pharmacy POS application.
+
+Maintenance runs in the UI thread while the till is quiet (no key press or
+click for IDLE_SECONDS, or a shorter pause during OFF_HOURS). Each task is
+cut into steps short enough that a checkout arriving meanwhile waits at most
+one step, and any user activity pauses the cycle until the next quiet spell:
+
+    optimize      PRAGMA optimize with a bounded analysis_limit (a full ANALYZE
+                  the first time, when no statistics exist yet)
+    vacuum        PRAGMA incremental_vacuum, VACUUM_PAGES free pages per step
+                  (databases created before incremental vacuum was enabled need
+                  one compact() first)
+    quick_check   PRAGMA quick_check one table at a time
+
+Each task runs at most once per INTERVAL_HOURS. maintenance_runs keeps the last
+run, its duration and its result, shown with the page counts and free-space
+figures by report().
+"""
+
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+IDLE_SECONDS = 300
+# Hours in which a short pause is enough (the shop is normally closed)
+OFF_HOURS = range(0, 6)
+OFF_HOURS_IDLE_SECONDS = 30
+INTERVAL_HOURS = 24
+
+# Free pages released per incremental_vacuum step (800 KB with 4 KB pages)
+VACUUM_PAGES = 200
+# Rows sampled per index by ANALYZE, bounding its run time on large tables
+ANALYSIS_LIMIT = 1000
+
+TASKS = ("optimize", "vacuum", "quick_check")
+
+_AUTO_VACUUM = {0: "none", 1: "full", 2: "incremental"}
+
+
+def create_tables(cursor):
+    """Create the maintenance log"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS maintenance_runs (
+            task TEXT PRIMARY KEY,
+            last_run DATETIME NOT NULL,
+            duration_ms REAL NOT NULL,
+            result TEXT NOT NULL
+        )
+    ''')
+
+
+def enable_incremental_vacuum(cursor):
+    """Use incremental auto-vacuum; takes effect at once on a new database, otherwise after compact()"""
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+
+def stats(cursor):
+    """Page counts and free space of the main database"""
+    result = {}
+    for pragma in ("page_size", "page_count", "freelist_count", "auto_vacuum"):
+        cursor.execute(f"PRAGMA {pragma}")
+        result[pragma] = cursor.fetchone()[0]
+    result['auto_vacuum'] = _AUTO_VACUUM.get(result['auto_vacuum'], result['auto_vacuum'])
+    result['free_percent'] = 100.0 * result['freelist_count'] / max(result['page_count'], 1)
+    # Unused space inside pages; dbstat is an optional SQLite build feature
+    try:
+        cursor.execute("SELECT SUM(unused), SUM(pgsize) FROM dbstat WHERE aggregate = TRUE")
+        unused, size = cursor.fetchone()
+        result['unused_percent'] = 100.0 * (unused or 0) / size if size else 0.0
+    except sqlite3.OperationalError:
+        result['unused_percent'] = None
+    return result
+
+
+def last_runs(cursor):
+    """{task: (last_run, duration_ms, result)}"""
+    cursor.execute("SELECT task, last_run, duration_ms, result FROM maintenance_runs")
+    return {task: (last_run, duration_ms, result) for task, last_run, duration_ms, result in cursor.fetchall()}
+
+
+def report(cursor):
+    """Text summary for the diagnostics window"""
+    info = stats(cursor)
+    size_mb = info['page_count'] * info['page_size'] / (1024 * 1024)
+    text = f"Database size: {size_mb:.1f} MB ({info['page_count']} pages of {info['page_size']} bytes)\n"
+    text += f"Free pages: {info['freelist_count']} ({info['free_percent']:.1f}%)\n"
+    if info['unused_percent'] is not None:
+        text += f"Unused space in pages: {info['unused_percent']:.1f}%\n"
+    text += f"Auto-vacuum: {info['auto_vacuum']}\n\n"
+    runs = last_runs(cursor)
+    text += "Task\t\tLast Run\t\t\tTime\tResult\n"
+    text += "-" * 70 + "\n"
+    for task in TASKS:
+        if task in runs:
+            last_run, duration_ms, result = runs[task]
+            text += f"{task:<12}\t{str(last_run)[:19]}\t{duration_ms:.0f} ms\t{result}\n"
+        else:
+            text += f"{task:<12}\tnever\n"
+    return text
+
+
+def is_quiet(now, idle_seconds):
+    """True when maintenance may run: idle long enough, or a short pause off-hours"""
+    if now.hour in OFF_HOURS:
+        return idle_seconds >= OFF_HOURS_IDLE_SECONDS
+    return idle_seconds >= IDLE_SECONDS
+
+
+def compact(conn):
+    """Full VACUUM (switching to incremental auto-vacuum); blocks all writers, so run it by hand only"""
+    conn.commit()
+    cursor = conn.cursor()
+    enable_incremental_vacuum(cursor)
+    cursor.execute("VACUUM")
+
+
+class Maintenance:
+    """Maintenance cycle that advances one short step per call"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._steps = None
+
+    def due(self, now=None):
+        """Tasks not run within INTERVAL_HOURS"""
+        now = now or datetime.now()
+        runs = last_runs(self.conn.cursor())
+        since = (now - timedelta(hours=INTERVAL_HOURS)).isoformat(" ")
+        return [task for task in TASKS if task not in runs or str(runs[task][0]) < since]
+
+    def step(self, now=None):
+        """Run the next step; returns True while the cycle has more work"""
+        # Never join (or commit) a transaction the app has open
+        if self.conn.in_transaction:
+            return False
+        if self._steps is None:
+            tasks = self.due(now)
+            if not tasks:
+                return False
+            self._steps = self._cycle(tasks)
+        try:
+            next(self._steps)
+            return True
+        except StopIteration:
+            self._steps = None
+            return False
+        except sqlite3.OperationalError:
+            # Another connection holds a lock: give up this cycle, retry when next quiet
+            self._steps = None
+            return False
+
+    def reset(self):
+        """Abandon the current cycle"""
+        self._steps = None
+
+    def run_all(self, now=None):
+        """Run every task now, regardless of when it last ran"""
+        self._steps = self._cycle(TASKS)
+        while self.step(now):
+            pass
+
+    def _record(self, task, duration_ms, result):
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            INSERT INTO maintenance_runs (task, last_run, duration_ms, result) VALUES (?, ?, ?, ?)
+            ON CONFLICT (task) DO UPDATE SET last_run = excluded.last_run, duration_ms = excluded.duration_ms,
+                                             result = excluded.result
+        """, (task, datetime.now(), duration_ms, result))
+        self.conn.commit()
+
+    def _cycle(self, tasks):
+        """Generator over the maintenance steps; each yield is a point where the UI gets control back"""
+        cursor = self.conn.cursor()
+        if "optimize" in tasks:
+            started = time.perf_counter()
+            cursor.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                cursor.execute("ANALYZE")
+                result = "analyzed"
+            else:
+                cursor.execute("PRAGMA optimize")
+                result = "optimized"
+            self.conn.commit()
+            self._record("optimize", (time.perf_counter() - started) * 1000, result)
+            yield "optimize"
+
+        if "vacuum" in tasks:
+            elapsed = 0.0
+            cursor.execute("PRAGMA auto_vacuum")
+            if cursor.fetchone()[0] == 2:
+                cursor.execute("PRAGMA page_count")
+                pages = cursor.fetchone()[0]
+                while True:
+                    cursor.execute("PRAGMA freelist_count")
+                    if cursor.fetchone()[0] == 0:
+                        break
+                    started = time.perf_counter()
+                    cursor.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES})")
+                    # The pragma frees pages as its rows are stepped
+                    cursor.fetchall()
+                    self.conn.commit()
+                    elapsed += time.perf_counter() - started
+                    yield "vacuum"
+                cursor.execute("PRAGMA page_count")
+                result = f"{pages - cursor.fetchone()[0]} pages released"
+            else:
+                result = "skipped (needs Compact)"
+            self._record("vacuum", elapsed * 1000, result)
+            yield "vacuum"
+
+        if "quick_check" in tasks:
+            elapsed = 0.0
+            problems = []
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")
+            for (table,) in cursor.fetchall():
+                started = time.perf_counter()
+                cursor.execute(f'PRAGMA quick_check("{table}")')
+                problems += [row[0] for row in cursor.fetchall() if row[0] != "ok"]
+                elapsed += time.perf_counter() - started
+                yield "quick_check"
+            self._record("quick_check", elapsed * 1000, "ok" if not problems else "; ".join(problems[:5]))
+            yield "quick_check"
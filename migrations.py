@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Schema migrations for the Pharmacy POS application.
+
+PRAGMA user_version records the last migration applied to a database file.
+migrate() brings the live database and every registered archive up to
+SCHEMA_VERSION, one step at a time, each step in its own transaction. New
+databases are created with the current schema, so for them the steps find
+nothing to convert and only the version is recorded.
+
+SQLite cannot change a column's type in place, so a step that needs to
+rebuilds the table: the new definition is created under a temporary name, the
+rows are copied across (converted on the way), the old table is dropped and
+the new one renamed, and its indexes and triggers are created again. Adding a
+VIRTUAL generated column needs no rebuild: ALTER TABLE adds it in place.
+"""
+
+import os
+import re
+
+import archive
+import daykey
+import rollup
+
+SCHEMA_VERSION = 3
+
+# Money columns stored as integer cents from version 1 (see money.py)
+MONEY_COLUMNS = {
+    'medicines': ('pack_price', 'unit_price'),
+    'sales': ('price', 'total'),
+    'returns': ('refunded_amount',),
+}
+
+_CREATE_TABLE = re.compile(r'^CREATE TABLE\s+(IF NOT EXISTS\s+)?"?(\w+)"?', re.IGNORECASE)
+_CREATE_INDEX = re.compile(r'^CREATE (UNIQUE )?INDEX\s+(IF NOT EXISTS\s+)?"?(\w+)"?', re.IGNORECASE)
+
+
+def user_version(cursor, schema="main"):
+    cursor.execute(f"PRAGMA {schema}.user_version")
+    return cursor.fetchone()[0]
+
+
+def _column_types(cursor, schema, table):
+    cursor.execute(f"PRAGMA {schema}.table_info({table})")
+    return {column[1]: column[2].upper() for column in cursor.fetchall()}
+
+
+def rebuild_table(cursor, schema, table, types, conversions):
+    """Recreate schema.table with new column types ({column: type}), copying rows through
+    conversions ({column: SQL expression over the old row})"""
+    cursor.execute(f"SELECT sql FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    sql = cursor.fetchone()[0]
+    for column, column_type in types.items():
+        sql = re.sub(rf'(\b{column}\s+)\w+', rf'\g<1>{column_type}', sql, count=1)
+    sql = _CREATE_TABLE.sub(f"CREATE TABLE {schema}.{table}_migrating", sql, count=1)
+    cursor.execute(f"""
+        SELECT sql FROM {schema}.sqlite_master
+        WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    """, (table,))
+    dependents = [row[0] for row in cursor.fetchall()]
+    sequence = None
+    if _table_exists(cursor, schema, "sqlite_sequence"):
+        cursor.execute(f"SELECT seq FROM {schema}.sqlite_sequence WHERE name = ?", (table,))
+        row = cursor.fetchone()
+        sequence = row[0] if row else None
+
+    columns = list(_column_types(cursor, schema, table))
+    cursor.execute(sql)
+    cursor.execute(f"""
+        INSERT INTO {schema}.{table}_migrating ({', '.join(columns)})
+        SELECT {', '.join(conversions.get(column, column) for column in columns)} FROM {schema}.{table}
+    """)
+    cursor.execute(f"DROP TABLE {schema}.{table}")
+    cursor.execute(f"ALTER TABLE {schema}.{table}_migrating RENAME TO {table}")
+    if sequence is not None:
+        cursor.execute(f"UPDATE {schema}.sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence, table))
+    for statement in dependents:
+        if schema != "main":
+            statement = _CREATE_INDEX.sub(lambda m: f"CREATE {m.group(1) or ''}INDEX {schema}.{m.group(3)}",
+                                          statement, count=1)
+        cursor.execute(statement)
+
+
+def _has_column(cursor, schema, table, column):
+    # table_info leaves out generated columns; table_xinfo lists them too
+    cursor.execute(f"PRAGMA {schema}.table_xinfo({table})")
+    return column in [row[1] for row in cursor.fetchall()]
+
+
+def _table_exists(cursor, schema, table):
+    cursor.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    return cursor.fetchone() is not None
+
+
+def _money_to_cents(cursor, schema):
+    """Version 1: money columns from REAL amounts to INTEGER cents"""
+    for table, columns in MONEY_COLUMNS.items():
+        if not _table_exists(cursor, schema, table):
+            continue
+        types = _column_types(cursor, schema, table)
+        if all(types.get(column) == 'INTEGER' for column in columns):
+            continue
+        rebuild_table(cursor, schema, table, {column: 'INTEGER' for column in columns},
+                      {column: f"CAST(ROUND({column} * 100) AS INTEGER)" for column in columns})
+    # Rollup amounts are sums of the old totals, even in INTEGER columns (init_database seeds new
+    # rollups from the REAL totals before migrating): rebuild them from the converted sales
+    # (archived rollups are rebuilt the next time a report reads them)
+    for table in archive.ROLLUPS:
+        if _table_exists(cursor, schema, table):
+            cursor.execute(f"DROP TABLE {schema}.{table}")
+    if schema == "main":
+        rollup.create_tables(cursor)
+        cursor.execute("DELETE FROM report_cache")
+
+
+def _day_keys(cursor, schema):
+    """Version 2: day_key (YYYYMMDD) on sales and returns, indexed for day ranges"""
+    for table, column in archive.DATE_COLUMNS.items():
+        if not _table_exists(cursor, schema, table):
+            continue
+        if not _has_column(cursor, schema, table, 'day_key'):
+            cursor.execute(f"ALTER TABLE {schema}.{table} ADD COLUMN {daykey.column_definition(column)}")
+        daykey.create_index(cursor, schema, table)
+
+
+def _sale_units(cursor, schema):
+    """Version 3: units on sale lines, and rollup triggers adding and subtracting that stored count"""
+    if _table_exists(cursor, schema, 'sales'):
+        rollup.add_sale_units(cursor, schema)
+    if schema == "main":
+        for event in ('insert', 'delete', 'update'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_sales_by_medicine_day_{event}")
+        rollup.create_tables(cursor)
+
+
+# Migration steps in order: (version reached, step(cursor, schema))
+STEPS = [
+    (1, _money_to_cents),
+    (2, _day_keys),
+    (3, _sale_units),
+]
+
+
+def _upgrade(conn, schema):
+    cursor = conn.cursor()
+    for version, step in STEPS:
+        if user_version(cursor, schema) >= version:
+            continue
+        cursor.execute("SAVEPOINT migrate")
+        try:
+            step(cursor, schema)
+            cursor.execute(f"PRAGMA {schema}.user_version = {version}")
+            cursor.execute("RELEASE migrate")
+        except Exception:
+            cursor.execute("ROLLBACK TO migrate")
+            cursor.execute("RELEASE migrate")
+            raise
+
+
+def migrate(conn, db_path):
+    """Bring the live database and its archives up to SCHEMA_VERSION (commits pending work first)"""
+    conn.commit()
+    cursor = conn.cursor()
+    # Triggers on other tables name the rebuilt tables: keep them as they are through the rename
+    cursor.execute("PRAGMA legacy_alter_table = ON")
+    try:
+        _upgrade(conn, "main")
+        cursor.execute("SELECT year, path FROM archive_periods ORDER BY year")
+        for _, path in cursor.fetchall():
+            path = archive._resolve(db_path, path)
+            if not os.path.exists(path):
+                continue
+            cursor.execute("ATTACH DATABASE ? AS archive_migrate", (path,))
+            try:
+                _upgrade(conn, "archive_migrate")
+            finally:
+                cursor.execute("DETACH DATABASE archive_migrate")
+    finally:
+        cursor.execute("PRAGMA legacy_alter_table = OFF")
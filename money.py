@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Money handling for the Pharmacy POS application.
+
+Prices and amounts are stored and computed as integer cents: pack_price,
+unit_price, sale price and total, refunded_amount and the rollup amounts are
+INTEGER columns, so SUM(total) is an exact integer sum and nothing needs
+rounding afterwards. Text typed by the user is parsed with to_cents() and
+amounts are shown with display() ("$12.34") or plain() ("12.34").
+
+Arithmetic that cannot stay in whole cents (the unit price of a pack) rounds
+half up, once, when the value is stored.
+"""
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+CENTS_PER_UNIT = 100
+SYMBOL = "$"
+
+
+def to_cents(value):
+    """Integer cents for a user-entered amount ("12.5", "$12.50", 12.5); raises ValueError if it is not one"""
+    text = str(value).strip().replace(SYMBOL, "").replace(",", "")
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f"Not an amount: {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"Not an amount: {value!r}")
+    return int((amount * CENTS_PER_UNIT).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def divide(cents, parts):
+    """cents / parts rounded half up to whole cents (0 when there are no parts)"""
+    if parts <= 0:
+        return 0
+    quotient, remainder = divmod(abs(cents), parts)
+    if remainder * 2 >= parts:
+        quotient += 1
+    return quotient if cents >= 0 else -quotient
+
+
+def plain(cents):
+    """'12.34' for 1234 cents"""
+    sign = "-" if cents < 0 else ""
+    units, rest = divmod(abs(int(cents)), CENTS_PER_UNIT)
+    return f"{sign}{units}.{rest:02d}"
+
+
+def display(cents):
+    """'$12.34' for 1234 cents ('-$12.34' when negative)"""
+    text = plain(cents)
+    return f"-{SYMBOL}{text[1:]}" if text.startswith("-") else f"{SYMBOL}{text}"
+
+
+def signed(cents):
+    """'+12.34' / '-12.34', for changes between periods"""
+    text = plain(cents)
+    return text if text.startswith("-") else f"+{text}"
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Lightweight timing instrumentation for the Pharmacy POS application.
+
+Timings are grouped by name and recorded into fixed-size log-scale histograms,
+so recording is O(1) and memory stays constant however long the app runs.
+Instrumentation is disabled by default; while disabled the decorator and the
+context manager reduce to a single flag check.
+"""
+
+import math
+import os
+import threading
+import time
+from functools import wraps
+
+# Histogram buckets grow by 9% per step starting at 1 microsecond,
+# enough to cover anything up to about an hour
+_BUCKET_BASE = 1e-6
+_BUCKET_GROWTH = 1.09
+_BUCKET_COUNT = 260
+_LOG_GROWTH = math.log(_BUCKET_GROWTH)
+
+_enabled = os.environ.get("POS_PROFILE", "") not in ("", "0")
+_stats = {}
+_lock = threading.Lock()
+
+
+class Histogram:
+    """Log-scale latency histogram with percentile estimates"""
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * _BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+
+    def record(self, seconds):
+        """Add one sample (in seconds)"""
+        if seconds <= _BUCKET_BASE:
+            index = 0
+        else:
+            index = min(_BUCKET_COUNT - 1, int(math.log(seconds / _BUCKET_BASE) / _LOG_GROWTH) + 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, pct):
+        """Estimate the given percentile (0-100) in seconds"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(pct / 100.0 * self.count))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                upper = _BUCKET_BASE * (_BUCKET_GROWTH ** index)
+                # The bucket bound can overshoot the real extremes
+                return min(max(upper, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+def enable():
+    """Turn instrumentation on"""
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """Turn instrumentation off (collected stats are kept)"""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def record(name, seconds):
+    """Record a timing sample for the named operation"""
+    with _lock:
+        histogram = _stats.get(name)
+        if histogram is None:
+            histogram = _stats[name] = Histogram()
+        histogram.record(seconds)
+
+
+def reset():
+    """Discard all collected stats"""
+    with _lock:
+        _stats.clear()
+
+
+def timed(name=None):
+    """Decorator recording the wall time of every call while enabled"""
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(label, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class timer:
+    """Context manager recording the wall time of a block while enabled"""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        if _enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.start is not None:
+            record(self.name, time.perf_counter() - self.start)
+            self.start = None
+        return False
+
+
+def snapshot(prefix=None):
+    """Return collected stats as a list of dicts, slowest total first"""
+    with _lock:
+        items = list(_stats.items())
+    rows = []
+    for name, histogram in items:
+        if prefix and not name.startswith(prefix):
+            continue
+        rows.append({
+            'name': name,
+            'count': histogram.count,
+            'total': histogram.total,
+            'mean': histogram.mean,
+            'p50': histogram.percentile(50),
+            'p95': histogram.percentile(95),
+            'p99': histogram.percentile(99),
+            'max': histogram.max,
+        })
+    rows.sort(key=lambda row: row['total'], reverse=True)
+    return rows
+
+
+def format_report(rows, title="TIMINGS"):
+    """Format snapshot rows as a fixed-width text table (times in ms)"""
+    lines = [f"===== {title} =====",
+             f"{'Operation':<36}{'Count':>7}{'Total':>10}{'Mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'Max':>9}",
+             "-" * 98]
+    for row in rows:
+        lines.append(f"{row['name'][:35]:<36}{row['count']:>7}"
+                     f"{row['total'] * 1000:>10.1f}{row['mean'] * 1000:>9.2f}"
+                     f"{row['p50'] * 1000:>9.2f}{row['p95'] * 1000:>9.2f}"
+                     f"{row['p99'] * 1000:>9.2f}{row['max'] * 1000:>9.2f}")
+    return "\n".join(lines)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Read-only connections for the Pharmacy POS application.
+
+The live database runs in WAL mode: the writer (checkout, returns, stock
+edits) appends to the write-ahead log while readers keep reading the last
+committed state, so neither waits for the other. Reports, dashboard counts
+and the searches read through a ReaderPool of read-only connections
+(file:...?mode=ro URIs) and never see a checkout half written.
+
+A borrowed connection runs in autocommit, each statement reading the latest
+commit. snapshot() holds one read transaction open instead, so every
+statement in the block reads the same committed state, as a report made of
+several queries needs. ATTACH is not allowed inside a transaction: archives
+a report reads are attached before the snapshot starts (archive.attached()
+leaves schemas that are already attached in place).
+"""
+
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+import sqlstats
+
+POOL_SIZE = 3
+
+
+def enable_wal(cursor):
+    """Switch the database to WAL mode (it stays in WAL mode; in-memory databases keep their own mode)"""
+    cursor.execute("PRAGMA journal_mode = WAL")
+    return cursor.fetchone()[0]
+
+
+def connect(db_path):
+    """Open a read-only connection to db_path, usable from any one thread at a time"""
+    uri = f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro"
+    return sqlstats.connect(uri, uri=True, check_same_thread=False)
+
+
+@contextmanager
+def snapshot(conn):
+    """Read everything in the block from one committed state of the database"""
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+
+
+class ReaderPool:
+    """Up to size read-only connections, opened on first use and reused"""
+
+    def __init__(self, db_path, size=POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._opened = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def reader(self):
+        """Borrow a connection for the block (waits while all size are in use)"""
+        conn = self._take()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def _take(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._opened) < self.size:
+                conn = connect(self.db_path)
+                self._opened.append(conn)
+                return conn
+        return self._idle.get()
+
+    def close(self):
+        """Close every connection (borrowed ones must have been returned)"""
+        with self._lock:
+            for conn in self._opened:
+                conn.close()
+            self._opened = []
+            self._idle = queue.LifoQueue()
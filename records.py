@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Row objects for the Pharmacy POS application.
+
+Queries that feed the UI return Medicine, Sale, Return, User and Settings
+objects instead of positional tuples, so code reads medicine.stock_packs
+rather than medicine[4]. Each class keeps its fields in __slots__ (no
+per-object __dict__) and works out its derived fields once, when the row is
+read: total units, the batch shown as "N/A" when there is none, and prices
+formatted for display, so tree loads, the candidate list and the reports do
+not format the same row again on every refresh.
+
+fetch() and fetchone() install the class as the cursor's row_factory for one
+query, so the objects are built straight from SQLite's rows without an
+intermediate list of tuples. The column order of each class is its COLUMNS.
+"""
+
+import money
+
+
+class Record:
+    """Base for the row classes: a row factory and a readable repr"""
+    __slots__ = ()
+    COLUMNS = ""
+
+    @classmethod
+    def factory(cls, cursor, row):
+        """sqlite3 row_factory building cls from a row in COLUMNS order"""
+        return cls(row)
+
+    @classmethod
+    def columns(cls, alias=None):
+        """COLUMNS for a SELECT list, qualified with a table alias when given"""
+        if not alias:
+            return cls.COLUMNS
+        return ", ".join(f"{alias}.{column}" for column in cls.COLUMNS.split(", "))
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.COLUMNS.split(", "))
+        return f"{type(self).__name__}({fields})"
+
+
+class Medicine(Record):
+    __slots__ = ('id', 'name', 'batch', 'expiry', 'stock_packs', 'units_per_pack', 'pack_price', 'unit_price',
+                 'supplier', 'total_units', 'batch_display', 'pack_price_text', 'unit_price_text')
+    COLUMNS = "id, name, batch, expiry, stock_packs, units_per_pack, pack_price, unit_price, supplier"
+
+    def __init__(self, row):
+        (self.id, self.name, self.batch, self.expiry, self.stock_packs, self.units_per_pack,
+         self.pack_price, self.unit_price, self.supplier) = row[:9]
+        self.total_units = self.stock_packs * self.units_per_pack
+        self.batch_display = self.batch or "N/A"
+        self.pack_price_text = money.display(self.pack_price)
+        self.unit_price_text = money.display(self.unit_price)
+
+    def tree_values(self):
+        """Values of the medicines treeview row"""
+        return (self.id, self.name, self.batch_display, self.expiry, self.stock_packs, self.total_units,
+                self.pack_price_text, self.unit_price_text)
+
+
+class Sale(Record):
+    """A sale line as listed by the returns search, with its medicine and what is left to return"""
+    __slots__ = ('id', 'date', 'name', 'qty', 'type', 'price', 'total', 'batch', 'invoice_no', 'returnable',
+                 'price_text', 'total_text')
+    COLUMNS = "id, date, name, qty, type, price, total, batch, invoice_no, returnable"
+
+    def __init__(self, row):
+        (self.id, self.date, self.name, self.qty, self.type, self.price, self.total, self.batch,
+         self.invoice_no, self.returnable) = row[:10]
+        self.price_text = money.display(self.price)
+        self.total_text = money.display(self.total)
+
+    @property
+    def key(self):
+        """(date, id), the keyset paging position of the line"""
+        return (self.date, self.id)
+
+    def tree_values(self):
+        """Values of the returns treeview row"""
+        return (self.id, self.date, self.name, self.qty, self.type, self.price_text, self.total_text,
+                self.invoice_no, self.returnable)
+
+
+class Return(Record):
+    """A return as listed by the Returns Report, with the medicine name"""
+    __slots__ = ('return_date', 'name', 'return_qty', 'return_type', 'refunded_amount', 'reason',
+                 'refunded_text', 'reason_display')
+    COLUMNS = "return_date, name, return_qty, return_type, refunded_amount, reason"
+
+    def __init__(self, row):
+        (self.return_date, self.name, self.return_qty, self.return_type, self.refunded_amount,
+         self.reason) = row[:6]
+        self.refunded_text = money.display(self.refunded_amount)
+        self.reason_display = self.reason or "N/A"
+
+
+class User(Record):
+    """A logged-in user (the password is not kept)"""
+    __slots__ = ('id', 'username', 'role', 'is_admin')
+    COLUMNS = "id, username, role"
+
+    def __init__(self, row):
+        self.id, self.username, self.role = row[:3]
+        self.is_admin = self.role == "Admin"
+
+
+class Settings(Record):
+    __slots__ = ('pharmacy_name', 'pharmacy_address', 'pharmacy_phone', 'receipt_header', 'receipt_footer')
+    COLUMNS = "pharmacy_name, pharmacy_address, pharmacy_phone, receipt_header, receipt_footer"
+
+    def __init__(self, row):
+        (self.pharmacy_name, self.pharmacy_address, self.pharmacy_phone, self.receipt_header,
+         self.receipt_footer) = row[:5]
+
+
+def fetch(cursor, cls, sql, parameters=()):
+    """Run sql and return its rows as cls objects"""
+    cursor.row_factory = cls.factory
+    try:
+        cursor.execute(sql, parameters)
+        return cursor.fetchall()
+    finally:
+        cursor.row_factory = None
+
+
+def fetchone(cursor, cls, sql, parameters=()):
+    """Run sql and return its first row as a cls object, or None"""
+    cursor.row_factory = cls.factory
+    try:
+        cursor.execute(sql, parameters)
+        return cursor.fetchone()
+    finally:
+        cursor.row_factory = None
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Reorder suggestions for the Pharmacy POS application.
+
+medicine_demand keeps one row per medicine with its demand rate in units per
+day, an exponentially weighted moving average of daily sales with a two week
+half-life. Checkout adds each sold line to it and returns take their units
+back out, so the rate is always current without re-reading sales history:
+
+    rate(today) = rate(updated) * DECAY ** (today - updated) + (1 - DECAY) * units
+
+The row also carries the units on hand, kept current by triggers on
+medicine_batches, and a partial index holds just the rows below the reorder
+point, so the suggestion report reads a few thousand index entries instead of
+aggregating sales and batches. Days of cover is the unexpired stock on hand
+divided by the rate. Medicines whose cover falls below the lead time plus
+safety stock are suggested for reordering, with enough packs to reach the
+target cover, grouped by supplier.
+"""
+
+import math
+from datetime import date, datetime, timedelta
+
+HALF_LIFE_DAYS = 14
+DECAY = 0.5 ** (1.0 / HALF_LIFE_DAYS)
+# Sales older than this contribute less than 0.5% and are ignored when seeding
+HISTORY_DAYS = 8 * HALF_LIFE_DAYS
+
+LEAD_TIME_DAYS = 7
+SAFETY_DAYS = 7
+REORDER_POINT_DAYS = LEAD_TIME_DAYS + SAFETY_DAYS
+TARGET_COVER_DAYS = 30
+# Below this (about one unit every three weeks) a medicine is not reordered automatically
+MIN_RATE = 0.05
+
+# Ids per IN (...) lookup, well under SQLite's bound parameter limit
+CHUNK_SIZE = 500
+
+# Rows that may need reordering; the query repeats this expression so the partial index is used
+_REORDER_WHERE = f"rate >= {MIN_RATE} AND on_hand < rate * {REORDER_POINT_DAYS}"
+
+
+def _day(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def create_tables(cursor, today=None):
+    """Create the demand table, seeding it from recent sales when it is new"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'medicine_demand'")
+    is_new = cursor.fetchone() is None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS medicine_demand (
+            medicine_id INTEGER PRIMARY KEY,
+            rate REAL NOT NULL,
+            updated DATE NOT NULL,
+            on_hand INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (medicine_id) REFERENCES medicines (id)
+        )
+    ''')
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_medicine_demand_reorder_{REORDER_POINT_DAYS}
+        ON medicine_demand (medicine_id) WHERE {_REORDER_WHERE}
+    """)
+    # Units on hand follow every change to the batches (sales, returns, deliveries, write-offs)
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_medicine_demand_stock_insert
+        AFTER INSERT ON medicine_batches
+        BEGIN
+            UPDATE medicine_demand SET on_hand = on_hand + NEW.qty WHERE medicine_id = NEW.medicine_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_medicine_demand_stock_update
+        AFTER UPDATE OF qty ON medicine_batches
+        BEGIN
+            UPDATE medicine_demand SET on_hand = on_hand + NEW.qty - OLD.qty WHERE medicine_id = NEW.medicine_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_medicine_demand_stock_delete
+        AFTER DELETE ON medicine_batches
+        BEGIN
+            UPDATE medicine_demand SET on_hand = on_hand - OLD.qty WHERE medicine_id = OLD.medicine_id;
+        END
+    ''')
+    if is_new:
+        rebuild(cursor, today)
+
+
+def _decayed(rate, updated, today):
+    return rate * DECAY ** max((today - _day(updated)).days, 0)
+
+
+def record(cursor, quantities, day=None, today=None):
+    """Add (medicine_id, units) sold on day to the demand rates; negative units undo a sale"""
+    today = _day(today or date.today())
+    weight = (1 - DECAY) * DECAY ** max((today - _day(day or today)).days, 0)
+    totals = {}
+    for medicine_id, units in quantities:
+        totals[medicine_id] = totals.get(medicine_id, 0) + units
+    if not totals:
+        return
+
+    placeholders = ",".join("?" * len(totals))
+    cursor.execute(f"SELECT medicine_id, rate, updated FROM medicine_demand WHERE medicine_id IN ({placeholders})",
+                   list(totals))
+    current = {medicine_id: _decayed(rate, updated, today) for medicine_id, rate, updated in cursor.fetchall()}
+    # New rows start with the current stock; existing rows keep the trigger-maintained on_hand
+    cursor.executemany("""
+        INSERT INTO medicine_demand (medicine_id, rate, updated, on_hand)
+        VALUES (?1, ?2, ?3, (SELECT COALESCE(SUM(qty), 0) FROM medicine_batches WHERE medicine_id = ?1))
+        ON CONFLICT (medicine_id) DO UPDATE SET rate = excluded.rate, updated = excluded.updated
+    """, [(medicine_id, max(current.get(medicine_id, 0.0) + weight * units, 0.0), today.isoformat())
+          for medicine_id, units in totals.items()])
+
+
+def rebuild(cursor, today=None):
+    """Recompute every demand rate from the last HISTORY_DAYS of sales and returns"""
+    today = _day(today or date.today())
+    since = (today - timedelta(days=HISTORY_DAYS)).isoformat()
+    units = "s.qty * CASE WHEN s.type = 'Pack' THEN m.units_per_pack ELSE 1 END"
+    cursor.execute(f"""
+        SELECT s.medicine_id, date(s.date), SUM({units})
+        FROM sales s JOIN medicines m ON m.id = s.medicine_id
+        WHERE s.date >= ?
+        GROUP BY s.medicine_id, date(s.date)
+    """, (since,))
+    daily = cursor.fetchall()
+    cursor.execute("""
+        SELECT r.medicine_id, date(r.return_date),
+               -SUM(r.return_qty * CASE WHEN r.return_type = 'Pack' THEN m.units_per_pack ELSE 1 END)
+        FROM returns r JOIN medicines m ON m.id = r.medicine_id
+        WHERE r.return_date >= ?
+        GROUP BY r.medicine_id, date(r.return_date)
+    """, (since,))
+    daily += cursor.fetchall()
+
+    rates = {}
+    for medicine_id, day, day_units in daily:
+        weight = (1 - DECAY) * DECAY ** max((today - _day(day)).days, 0)
+        rates[medicine_id] = rates.get(medicine_id, 0.0) + weight * day_units
+    cursor.execute("DELETE FROM medicine_demand")
+    cursor.executemany("""
+        INSERT INTO medicine_demand (medicine_id, rate, updated, on_hand)
+        VALUES (?1, ?2, ?3, (SELECT COALESCE(SUM(qty), 0) FROM medicine_batches WHERE medicine_id = ?1))
+    """, [(medicine_id, max(rate, 0.0), today.isoformat()) for medicine_id, rate in rates.items()])
+
+
+def _due(cursor, today):
+    """{medicine_id: (rate today, usable units on hand)} for medicines below the reorder point"""
+    # Expired units still sit in on_hand until written off, but cannot be sold
+    cursor.execute("SELECT medicine_id, qty FROM medicine_batches WHERE qty > 0 AND expiry < ?",
+                   (today.isoformat(),))
+    expired = {}
+    for medicine_id, qty in cursor.fetchall():
+        expired[medicine_id] = expired.get(medicine_id, 0) + qty
+
+    # Rows below the reorder point (partial index), plus rows above it only thanks to
+    # expired stock. The stored rate is never below today's decayed rate, so nothing due is missed.
+    cursor.execute(f"SELECT medicine_id, rate, updated, on_hand FROM medicine_demand WHERE {_REORDER_WHERE}")
+    rows = cursor.fetchall()
+    if expired:
+        cursor.execute(f"""
+            SELECT medicine_id, rate, updated, on_hand FROM medicine_demand
+            WHERE medicine_id IN (SELECT medicine_id FROM medicine_batches WHERE qty > 0 AND expiry < ?)
+              AND NOT ({_REORDER_WHERE})
+              AND rate >= ?
+        """, (today.isoformat(), MIN_RATE))
+        rows += cursor.fetchall()
+
+    decay = {}
+    due = {}
+    for medicine_id, rate, updated, on_hand in rows:
+        if updated not in decay:
+            decay[updated] = _decayed(1.0, updated, today)
+        rate *= decay[updated]
+        on_hand -= expired.get(medicine_id, 0)
+        if rate >= MIN_RATE and on_hand < rate * REORDER_POINT_DAYS:
+            due[medicine_id] = (rate, on_hand)
+    return due
+
+
+def due_count(cursor, today=None):
+    """Number of medicines below the reorder point (dashboard)"""
+    return len(_due(cursor, _day(today or date.today())))
+
+
+def suggestions(cursor, today=None):
+    """Medicines to reorder, as dicts sorted by supplier then days of cover"""
+    due = _due(cursor, _day(today or date.today()))
+    ids = list(due)
+    result = []
+    for start in range(0, len(ids), CHUNK_SIZE):
+        chunk = ids[start:start + CHUNK_SIZE]
+        cursor.execute(f"SELECT id, name, supplier, units_per_pack FROM medicines WHERE id IN ({','.join('?' * len(chunk))})",
+                       chunk)
+        for medicine_id, name, supplier, units_per_pack in cursor.fetchall():
+            rate, on_hand = due[medicine_id]
+            result.append({
+                'id': medicine_id,
+                'name': name,
+                'supplier': supplier,
+                'rate': rate,
+                'on_hand': on_hand,
+                'cover_days': on_hand / rate,
+                'packs': math.ceil((rate * TARGET_COVER_DAYS - on_hand) / units_per_pack),
+            })
+    result.sort(key=lambda item: (item['supplier'], item['cover_days'], item['name']))
+    return result
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Report result cache for the Pharmacy POS application.
+
+Triggers keep a change counter per table in change_counters, bumped on every
+insert, update and delete. Sales and returns are counted per month of the row's
+date, so a report's watermark can be taken over just the months its date range
+covers: today's checkouts change the current month's counter and leave last
+year's reports valid. Medicines keep two global counters, one for any change
+(stock moves with every sale) and one for names only, which is all the returns
+report needs.
+
+report_cache stores the finished text of each report under (report type, date
+range, parameters) together with the watermark it was built at. A cached
+report is served while the watermark is unchanged, so closed periods stay
+cached until someone edits them (or archives them).
+"""
+
+from datetime import datetime
+
+# Cached reports kept, least recently used dropped first
+CACHE_LIMIT = 200
+
+# Tables counted per month: date column
+_MONTHLY = {'sales': 'date', 'returns': 'return_date'}
+# Sales columns that change a report (returned_qty is bookkeeping for the returns tab)
+_SALES_COLUMNS = "date, medicine_id, qty, type, price, total"
+
+
+def _bump(name, period):
+    return f'''
+        INSERT INTO change_counters (name, period, counter) VALUES ('{name}', {period}, 1)
+        ON CONFLICT (name, period) DO UPDATE SET counter = counter + 1;
+    '''
+
+
+def create_tables(cursor):
+    """Create the counter and cache tables and the triggers that maintain the counters"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_counters (
+            name TEXT NOT NULL,
+            period TEXT NOT NULL,
+            counter INTEGER NOT NULL,
+            PRIMARY KEY (name, period)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS report_cache (
+            report_type TEXT NOT NULL,
+            from_date TEXT NOT NULL,
+            to_date TEXT NOT NULL,
+            params TEXT NOT NULL,
+            watermark TEXT NOT NULL,
+            report TEXT NOT NULL,
+            last_used DATETIME NOT NULL,
+            PRIMARY KEY (report_type, from_date, to_date, params)
+        )
+    ''')
+
+    for table, column in _MONTHLY.items():
+        columns = _SALES_COLUMNS if table == 'sales' else column
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_change_counters_{table}_insert
+            AFTER INSERT ON {table}
+            BEGIN {_bump(table, f"substr(NEW.{column}, 1, 7)")} END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_change_counters_{table}_delete
+            AFTER DELETE ON {table}
+            BEGIN {_bump(table, f"substr(OLD.{column}, 1, 7)")} END
+        ''')
+        # A row moved to another month changes both months
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_change_counters_{table}_update
+            AFTER UPDATE OF {columns} ON {table}
+            BEGIN
+                {_bump(table, f"substr(OLD.{column}, 1, 7)")}
+                {_bump(table, f"substr(NEW.{column}, 1, 7)")}
+            END
+        ''')
+
+    for table in ('medicines', 'medicine_batches', 'medicine_demand'):
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_change_counters_{table}_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN {_bump(table, "''")} END
+            ''')
+    for event in ('INSERT', 'UPDATE OF name', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_change_counters_medicine_names_{event.split()[0].lower()}
+            AFTER {event} ON medicines
+            BEGIN {_bump('medicine_names', "''")} END
+        ''')
+
+
+def watermark(cursor, monthly, global_names, from_date, to_date):
+    """Counters the report depends on: monthly tables over the months of the range, plus global ones"""
+    conditions, parameters = [], []
+    if monthly:
+        conditions.append(f"(name IN ({','.join('?' * len(monthly))}) AND period BETWEEN ? AND ?)")
+        parameters += list(monthly) + [from_date[:7], to_date[:7]]
+    if global_names:
+        conditions.append(f"(name IN ({','.join('?' * len(global_names))}) AND period = '')")
+        parameters += list(global_names)
+    if not conditions:
+        return ""
+    cursor.execute(f"""
+        SELECT name, SUM(counter) FROM change_counters
+        WHERE {' OR '.join(conditions)}
+        GROUP BY name ORDER BY name
+    """, parameters)
+    return ";".join(f"{name}={counter}" for name, counter in cursor.fetchall())
+
+
+def lookup(cursor, key, current):
+    """Cached report text for key if it was built at the current watermark, else None"""
+    cursor.execute("""
+        SELECT watermark, report FROM report_cache
+        WHERE report_type = ? AND from_date = ? AND to_date = ? AND params = ?
+    """, key)
+    row = cursor.fetchone()
+    if row is None or row[0] != current:
+        return None
+    cursor.execute("""
+        UPDATE report_cache SET last_used = ?
+        WHERE report_type = ? AND from_date = ? AND to_date = ? AND params = ?
+    """, (datetime.now(),) + tuple(key))
+    return row[1]
+
+
+def store(cursor, key, current, report):
+    """Cache report text built at the current watermark, dropping the least recently used beyond CACHE_LIMIT"""
+    cursor.execute("""
+        INSERT OR REPLACE INTO report_cache (report_type, from_date, to_date, params, watermark, report, last_used)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, tuple(key) + (current, report, datetime.now()))
+    cursor.execute("""
+        DELETE FROM report_cache WHERE rowid IN (
+            SELECT rowid FROM report_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+        )
+    """, (CACHE_LIMIT,))
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Sales rollups for the Pharmacy POS application.
+
+sales_by_medicine_day holds one row per day and medicine with the units sold
+(packs converted to units), the amount and the number of sale lines. Triggers
+on sales keep it current as lines are added, corrected or deleted, so the
+product reports (Top Sellers, Slow Movers, ABC Classification) read a few
+thousand rollup rows for a quarter instead of every sale line joined to the
+medicines. Amounts are gross sales; returns are reported separately.
+
+The units of a line are stored on it (sales.units) when it is written, at the
+pack size of that day: the rollup adds and subtracts that stored count, so
+changing a medicine's units per pack later does not make edits or deletions
+of older Pack lines subtract a different number than was added. Lines written
+without units get them stamped by the insert trigger.
+
+sales_by_hour holds one row per day and hour of the day with the number of
+transactions (invoices), sale lines and the amount, for the traffic heatmap
+and the transactions-per-hour throughput. A line opens a transaction when it
+is the first line of its invoice (or has no invoice, as older sales).
+
+The rollups follow the sales into the yearly archives (archive.py), so a
+report over archived periods reads the archived rollup rows.
+"""
+
+from datetime import date
+
+import archive
+
+TOP_N = 20
+# ABC classes by cumulative share of sales: A up to 80%, B up to 95%, C the rest
+ABC_LIMITS = (('A', 0.80), ('B', 0.95), ('C', 1.0))
+
+# Cells of the heatmap from quiet to busy
+SHADES = " ░▒▓█"
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+# Units of a line at the current pack size (stamped on sales.units when the line is written)
+_PACK_UNITS = ("{row}.qty * CASE WHEN {row}.type = 'Pack' THEN "
+               "COALESCE((SELECT units_per_pack FROM medicines WHERE id = {row}.medicine_id), 1) ELSE 1 END")
+_HOUR = "CAST(strftime('%H', {row}.date) AS INTEGER)"
+_OPENS = "({row}.invoice_no IS NULL OR {row}.invoice_no = {row}.id)"
+
+# Rollup tables: (definition, statement filling it from the sales in {schema})
+_TABLES = {
+    'sales_by_medicine_day': ("""
+        CREATE TABLE IF NOT EXISTS sales_by_medicine_day (
+            day DATE NOT NULL,
+            medicine_id INTEGER NOT NULL,
+            units INTEGER NOT NULL,
+            amount INTEGER NOT NULL,
+            lines INTEGER NOT NULL,
+            PRIMARY KEY (day, medicine_id)
+        ) WITHOUT ROWID
+    """, f"""
+        INSERT INTO {{schema}}.sales_by_medicine_day (day, medicine_id, units, amount, lines)
+        SELECT date(s.date), s.medicine_id, SUM(s.units), SUM(s.total), COUNT(*)
+        FROM {{schema}}.sales s
+        WHERE date(s.date) IS NOT NULL
+        GROUP BY date(s.date), s.medicine_id
+    """),
+    'sales_by_hour': ("""
+        CREATE TABLE IF NOT EXISTS sales_by_hour (
+            day DATE NOT NULL,
+            hour INTEGER NOT NULL,
+            transactions INTEGER NOT NULL,
+            lines INTEGER NOT NULL,
+            amount INTEGER NOT NULL,
+            PRIMARY KEY (day, hour)
+        ) WITHOUT ROWID
+    """, f"""
+        INSERT INTO {{schema}}.sales_by_hour (day, hour, transactions, lines, amount)
+        SELECT date(s.date), {_HOUR.format(row="s")}, SUM({_OPENS.format(row="s")}), COUNT(*), SUM(s.total)
+        FROM {{schema}}.sales s
+        WHERE date(s.date) IS NOT NULL
+        GROUP BY date(s.date), {_HOUR.format(row="s")}
+    """),
+}
+
+
+def add_sale_units(cursor, schema="main"):
+    """Give schema.sales its units column, filled at the current pack sizes, if it has none"""
+    cursor.execute(f"PRAGMA {schema}.table_info(sales)")
+    if 'units' in [column[1] for column in cursor.fetchall()]:
+        return False
+    cursor.execute(f"ALTER TABLE {schema}.sales ADD COLUMN units INTEGER")
+    cursor.execute(f"UPDATE {schema}.sales SET units = {_PACK_UNITS.format(row='sales')}")
+    return True
+
+
+def create_tables(cursor):
+    """Create the rollups and their triggers, filling each from existing sales when it is new"""
+    for table, (definition, _) in _TABLES.items():
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        is_new = cursor.fetchone() is None
+        cursor.execute(definition)
+        if is_new:
+            _fill(cursor, "main", table)
+
+    # A line written without units, or edited without them, gets them at the current pack size
+    stamp = f'''
+        UPDATE sales SET units = {_PACK_UNITS.format(row="NEW")} WHERE id = NEW.id AND NEW.units IS NULL;
+    '''
+    restamp = f'''
+        UPDATE sales SET units = {_PACK_UNITS.format(row="NEW")}
+        WHERE id = NEW.id AND (NEW.units IS NULL OR NEW.units IS OLD.units AND
+                               (NEW.qty, NEW.type, NEW.medicine_id) IS NOT (OLD.qty, OLD.type, OLD.medicine_id));
+    '''
+    add = f'''
+        INSERT INTO sales_by_medicine_day (day, medicine_id, units, amount, lines)
+        VALUES (date(NEW.date), NEW.medicine_id, (SELECT units FROM sales WHERE id = NEW.id), NEW.total, 1)
+        ON CONFLICT (day, medicine_id) DO UPDATE SET units = units + excluded.units,
+                                                     amount = amount + excluded.amount, lines = lines + 1;
+    '''
+    remove = f'''
+        UPDATE sales_by_medicine_day
+        SET units = units - OLD.units, amount = amount - OLD.total, lines = lines - 1
+        WHERE day = date(OLD.date) AND medicine_id = OLD.medicine_id;
+        DELETE FROM sales_by_medicine_day WHERE day = date(OLD.date) AND medicine_id = OLD.medicine_id AND lines <= 0;
+    '''
+    add_hour = f'''
+        INSERT INTO sales_by_hour (day, hour, transactions, lines, amount)
+        VALUES (date(NEW.date), {_HOUR.format(row="NEW")}, {_OPENS.format(row="NEW")}, 1, NEW.total)
+        ON CONFLICT (day, hour) DO UPDATE SET transactions = transactions + excluded.transactions,
+                                              lines = lines + 1, amount = amount + excluded.amount;
+    '''
+    remove_hour = f'''
+        UPDATE sales_by_hour
+        SET transactions = transactions - {_OPENS.format(row="OLD")}, lines = lines - 1, amount = amount - OLD.total
+        WHERE day = date(OLD.date) AND hour = {_HOUR.format(row="OLD")};
+        DELETE FROM sales_by_hour WHERE day = date(OLD.date) AND hour = {_HOUR.format(row="OLD")} AND lines <= 0;
+    '''
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_by_medicine_day_insert
+        AFTER INSERT ON sales
+        BEGIN {stamp} {add} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_by_medicine_day_delete
+        AFTER DELETE ON sales
+        BEGIN {remove} END
+    ''')
+    # Not fired by units alone: stamping them inside these triggers must not count the line twice
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_by_medicine_day_update
+        AFTER UPDATE OF date, medicine_id, qty, type, total ON sales
+        BEGIN {remove} {restamp} {add} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_by_hour_insert
+        AFTER INSERT ON sales
+        BEGIN {add_hour} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_by_hour_delete
+        AFTER DELETE ON sales
+        BEGIN {remove_hour} END
+    ''')
+    # Checkout sets the first line's invoice_no after inserting it: the line still opens the transaction
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_by_hour_update
+        AFTER UPDATE OF date, total, invoice_no ON sales
+        BEGIN {remove_hour} {add_hour} END
+    ''')
+
+
+def _fill(cursor, schema, table):
+    cursor.execute(_TABLES[table][1].format(schema=schema))
+
+
+def rebuild(cursor):
+    """Recompute the rollups from the live sales"""
+    for table in _TABLES:
+        cursor.execute(f"DELETE FROM {table}")
+        _fill(cursor, "main", table)
+
+
+def backfill_archives(cursor, schemas):
+    """Give attached archives written before a rollup existed their rollup rows; True if any were built"""
+    built = False
+    for schema in schemas:
+        for table in _TABLES:
+            cursor.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?", (table,))
+            if cursor.fetchone() is None:
+                archive._copy_schema(cursor, schema, table)
+                _fill(cursor, schema, table)
+                built = True
+    return built
+
+
+def medicine_totals(cursor, source, from_date, to_date):
+    """[(medicine_id, units, amount)] for the days from_date through to_date, read from source"""
+    cursor.execute(f"""
+        SELECT medicine_id, SUM(units), SUM(amount)
+        FROM {source}
+        WHERE day BETWEEN ? AND ?
+        GROUP BY medicine_id
+    """, (from_date[:10], to_date[:10]))
+    return cursor.fetchall()
+
+
+def abc_classes(totals):
+    """{medicine_id: class} from [(medicine_id, units, amount)] by cumulative share of the amount"""
+    ranked = sorted(totals, key=lambda row: (-row[2], row[0]))
+    grand_total = sum(row[2] for row in ranked if row[2] > 0)
+    classes = {}
+    running = 0.0
+    for medicine_id, _, amount in ranked:
+        # A medicine is classed by the share of sales reached before it is added
+        share = running / grand_total if grand_total else 1.0
+        classes[medicine_id] = next(name for name, limit in ABC_LIMITS if share < limit or limit == 1.0)
+        running += max(amount, 0)
+    return classes
+
+
+def hourly_traffic(cursor, source, from_date, to_date):
+    """{(weekday, hour): (transactions, lines, amount)} over the days from_date through to_date (Monday is 0)"""
+    # strftime('%w') counts from Sunday
+    cursor.execute(f"""
+        SELECT (CAST(strftime('%w', day) AS INTEGER) + 6) % 7, hour, SUM(transactions), SUM(lines), SUM(amount)
+        FROM {source}
+        WHERE day BETWEEN ? AND ?
+        GROUP BY 1, 2
+    """, (from_date[:10], to_date[:10]))
+    return {(weekday, hour): values for weekday, hour, *values in cursor.fetchall()}
+
+
+def throughput(cursor, source, from_date, to_date):
+    """(transactions, trading hours) over the days from_date through to_date; an hour trades if it had a sale"""
+    cursor.execute(f"""
+        SELECT COALESCE(SUM(transactions), 0), COUNT(*)
+        FROM {source}
+        WHERE day BETWEEN ? AND ? AND lines > 0
+    """, (from_date[:10], to_date[:10]))
+    return cursor.fetchone()
+
+
+def weekday_counts(from_date, to_date):
+    """How often each weekday (Monday is 0) occurs from from_date through to_date"""
+    start = date.fromisoformat(from_date[:10])
+    days = (date.fromisoformat(to_date[:10]) - start).days + 1
+    return [max(days, 0) // 7 + (1 if (weekday - start.weekday()) % 7 < max(days, 0) % 7 else 0)
+            for weekday in range(7)]
+
+
+def heatmap(traffic, from_date, to_date, shades=False):
+    """Text grid of average transactions per weekday and hour, as numbers or as SHADES"""
+    if not traffic:
+        return ""
+    counts = weekday_counts(from_date, to_date)
+    averages = {key: values[0] / counts[key[0]] for key, values in traffic.items() if counts[key[0]]}
+    hours = range(min(hour for _, hour in traffic), max(hour for _, hour in traffic) + 1)
+    busiest = max(averages.values(), default=0) or 1
+    width = 3 if shades else 5
+    lines = ["   " + "".join(f"{hour:02d}".rjust(width) for hour in hours)]
+    for weekday, name in enumerate(WEEKDAYS):
+        cells = []
+        for hour in hours:
+            average = averages.get((weekday, hour), 0)
+            if shades:
+                shade = SHADES[min(int(average / busiest * (len(SHADES) - 1) + 0.5), len(SHADES) - 1)]
+                cells.append(" " + shade * 2)
+            else:
+                cells.append(f"{average:>{width}.1f}")
+        lines.append(name + "".join(cells))
+    return "\n".join(lines) + "\n"
+
+
+def peak(traffic, from_date, to_date):
+    """((weekday, hour), average transactions) of the busiest weekday and hour, or None"""
+    counts = weekday_counts(from_date, to_date)
+    averages = [(values[0] / counts[key[0]], key) for key, values in traffic.items() if counts[key[0]]]
+    if not averages:
+        return None
+    average, key = max(averages, key=lambda item: (item[0], -item[1][0], -item[1][1]))
+    return key, average
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Incremental search-as-you-type controller for the Pharmacy POS application.
+
+Key releases are debounced with Tk's after(); each dispatched search gets a
+generation number and results from superseded generations are dropped.
+Queries run on a worker thread, on a connection borrowed from the reader pool
+(readers.py) or one of its own, so typing never waits on the database, and results are handed back to the Tk thread through
+a queue polled with after(). When the new term extends the previous one and
+the previous result was complete (not cut off by the LIMIT), the new result is
+narrowed from the previous rows in memory without touching the database
+(unless narrowing leaves nothing, in which case the query runs so fetch
+functions with fuzzy fallbacks still get their chance).
+"""
+
+import queue
+import threading
+
+import perf
+import sqlstats
+
+# Keys that do not change the entry text
+IGNORED_KEYS = frozenset(("Up", "Down", "Left", "Right", "Home", "End", "Prior", "Next", "Tab",
+                          "Shift_L", "Shift_R", "Control_L", "Control_R", "Alt_L", "Alt_R", "Escape"))
+
+
+class IncrementalSearch:
+    """Debounced, cancellable search bound to one entry and one result view
+
+    fetch(cursor, term, limit) returns matching rows (up to limit + 1 so
+    truncation can be detected), matches(row, term) is the in-memory filter
+    used for narrowing, and render(rows) fills the view on the Tk thread.
+    With readers (a readers.ReaderPool) the worker borrows a read-only
+    connection for each query instead of opening its own.
+    """
+
+    def __init__(self, root, db_path, fetch, matches, render, name="search", delay_ms=150, limit=200,
+                 poll_ms=15, readers=None):
+        self.root = root
+        self.db_path = db_path
+        self.fetch = fetch
+        self.matches = matches
+        self.render = render
+        self.name = name
+        self.delay_ms = delay_ms
+        self.limit = limit
+        self.poll_ms = poll_ms
+        self.readers = readers
+
+        self.generation = 0
+        self.requested_term = None
+        self.last_term = None
+        self.last_rows = []
+        self.last_truncated = True
+        self.stats = {'queries': 0, 'narrowed': 0, 'stale': 0}
+
+        self._after_id = None
+        self._polling = False
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._worker = None
+
+    # Tk side
+
+    def on_key(self, event=None):
+        """KeyRelease handler: restart the debounce timer"""
+        if event is not None and getattr(event, 'keysym', None) in IGNORED_KEYS:
+            return
+        term = event.widget.get().strip() if event is not None else ""
+        self.schedule(term)
+
+    def schedule(self, term):
+        """Dispatch term after the debounce delay, replacing any pending term"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+        self._after_id = self.root.after(self.delay_ms, self.dispatch, term)
+
+    def dispatch(self, term):
+        """Start an asynchronous search for term (narrowing in memory when possible)"""
+        self._after_id = None
+        if term == self.requested_term:
+            return
+        self.requested_term = term
+        self.generation += 1
+        if self.can_narrow(term) and self.narrow(term):
+            return
+        self._ensure_worker()
+        self._jobs.put((self.generation, term))
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_ms, self.poll)
+
+    def search_now(self, cursor, term):
+        """Run a search synchronously on the caller's cursor (Search button, Enter)"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        self.requested_term = term
+        self.generation += 1
+        if self.can_narrow(term) and self.narrow(term):
+            return
+        with perf.timer(f"{self.name}.query"):
+            rows = self.fetch(cursor, term, self.limit)
+        self.stats['queries'] += 1
+        self.apply(term, rows)
+
+    def reset(self):
+        """Forget cached rows and drop pending or in-flight results (call after the data changes)"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        self.generation += 1
+        self.requested_term = None
+        self.last_term = None
+        self.last_rows = []
+        self.last_truncated = True
+
+    def can_narrow(self, term):
+        return (bool(self.last_term) and not self.last_truncated
+                and term.lower().startswith(self.last_term.lower()))
+
+    def narrow(self, term):
+        """Filter the previous rows in memory; returns False when a query is needed instead"""
+        with perf.timer(f"{self.name}.narrow"):
+            rows = [row for row in self.last_rows if self.matches(row, term)]
+        # Nothing left: let the query run, since fetch may have fallbacks (fuzzy matching)
+        if not rows:
+            return False
+        self.stats['narrowed'] += 1
+        self.apply(term, rows)
+        return True
+
+    def apply(self, term, rows):
+        truncated = self.limit is not None and len(rows) > self.limit
+        if truncated:
+            rows = rows[:self.limit]
+        self.last_term = term
+        self.last_rows = rows
+        self.last_truncated = truncated or not term
+        with perf.timer(f"{self.name}.render"):
+            self.render(rows)
+
+    def poll(self):
+        """Apply finished results from the worker, dropping superseded ones"""
+        # Check for outstanding jobs first so a result posted during the drain is not missed
+        busy = self._jobs.unfinished_tasks
+        try:
+            while True:
+                generation, term, rows = self._results.get_nowait()
+                if generation == self.generation:
+                    self.apply(term, rows)
+                else:
+                    self.stats['stale'] += 1
+        except queue.Empty:
+            pass
+        if busy:
+            self.root.after(self.poll_ms, self.poll)
+        else:
+            self._polling = False
+
+    # Worker side
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run_worker, name=f"{self.name}-worker", daemon=True)
+            self._worker.start()
+
+    def _run_worker(self):
+        conn = None if self.readers else sqlstats.connect(self.db_path)
+        try:
+            while True:
+                job = self._jobs.get()
+                taken = 1
+                # Skip straight to the newest queued term
+                while job is not None:
+                    try:
+                        newer = self._jobs.get_nowait()
+                    except queue.Empty:
+                        break
+                    taken += 1
+                    self.stats['stale'] += 1
+                    job = newer
+                if job is None:
+                    for _ in range(taken):
+                        self._jobs.task_done()
+                    break
+                generation, term = job
+                if generation == self.generation:
+                    try:
+                        with perf.timer(f"{self.name}.query"):
+                            rows = self._query(conn, term)
+                        self.stats['queries'] += 1
+                        self._results.put((generation, term, rows))
+                    except Exception:
+                        # A failed background search simply leaves the current results in place
+                        pass
+                else:
+                    self.stats['stale'] += 1
+                for _ in range(taken):
+                    self._jobs.task_done()
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _query(self, conn, term):
+        if conn is not None:
+            return self.fetch(conn.cursor(), term, self.limit)
+        with self.readers.reader() as reader:
+            return self.fetch(reader.cursor(), term, self.limit)
+
+    def close(self):
+        """Stop the worker thread"""
+        if self._worker is not None:
+            self._jobs.put(None)
+            self._worker.join(timeout=1.0)
+            self._worker = None
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Parallel report aggregation for the Pharmacy POS application.
+
+A report over a long date range is split into month shards. Each shard is
+aggregated in a worker process with its own read-only connection
+(readers.connect()), attaching the archive its month needs, and the partial
+results (totals per day, per month or per medicine) are summed back
+together. SQLite runs a query on one core, so over several years the shards
+keep every worker busy; ranges under a year are aggregated in-process on the
+caller's cursor, where the process round trips would cost more than they save.
+
+Sharding is off by default (one worker): on a single core the shards were no
+faster than the in-process query for Daily Sales over a year and slower for
+Top Sellers. Raise ShardedReports.workers (REPORT_WORKERS in the application)
+once benchmark.py --cases shards shows a gain on the target machine.
+
+The worker processes are started on first use with the spawn method (as on
+Windows) and kept until close(); a frozen build must call
+multiprocessing.freeze_support() first thing in its __main__ block.
+
+Each shard reads in a snapshot of its own connection, and SQLite cannot pin
+several connections to one commit. So every shard also reads the sales
+change counters (report_cache.py) of its own month, and its result is only
+used if they match the counters of that month in the caller's snapshot. When
+a checkout or edit committed while the shards ran, only the months it
+touched are summed again in-process on the caller's cursor. Either way the
+report shows exactly the caller's snapshot.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+import archive
+import daykey
+import readers
+import report_cache
+import rollup
+
+# Worker processes a sharded report can use on this machine
+CPU_WORKERS = min(os.cpu_count() or 1, 8)
+# Worker processes by default: 1 aggregates every report in-process (see above)
+DEFAULT_WORKERS = 1
+# Ranges spanning fewer months than this are aggregated in-process
+MIN_MONTHS = 12
+
+
+def _daily(cursor, schemas, from_date, to_date):
+    """{day_key: amount}"""
+    cursor.execute(f"""
+        SELECT day_key, SUM(total)
+        FROM {archive.union('sales', 'day_key, total', schemas)}
+        WHERE day_key BETWEEN ? AND ?
+        GROUP BY day_key
+    """, (daykey.day_key(from_date), daykey.day_key(to_date)))
+    return dict(cursor.fetchall())
+
+
+def _monthly(cursor, schemas, from_date, to_date):
+    """{month key (YYYYMM): amount}"""
+    cursor.execute(f"""
+        SELECT day_key / 100 AS month, SUM(total)
+        FROM {archive.union('sales', 'day_key, total', schemas)}
+        WHERE day_key BETWEEN ? AND ?
+        GROUP BY month
+    """, (daykey.day_key(from_date), daykey.day_key(to_date)))
+    return dict(cursor.fetchall())
+
+
+def _medicine(cursor, schemas, from_date, to_date):
+    """{medicine_id: (units, amount)} from the sales rollup"""
+    source = archive.union('sales_by_medicine_day', 'day, medicine_id, units, amount', schemas)
+    return {medicine_id: (units, amount)
+            for medicine_id, units, amount in rollup.medicine_totals(cursor, source, from_date, to_date)}
+
+
+# Aggregates by name: aggregate(cursor, archive schemas, from_date, to_date) -> {key: value}
+AGGREGATES = {
+    'daily': _daily,
+    'monthly': _monthly,
+    'medicine': _medicine,
+}
+
+
+def month_shards(from_date, to_date):
+    """[(first day, last day)] of each calendar month from from_date through to_date, as ISO text"""
+    start = date.fromisoformat(from_date[:10])
+    end = date.fromisoformat(to_date[:10])
+    shards = []
+    while start <= end:
+        next_month = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        last = min(next_month - timedelta(days=1), end)
+        shards.append((start.isoformat(), last.isoformat()))
+        start = next_month
+    return shards
+
+
+def merge(parts):
+    """Sum {key: value} partial results; values are numbers or tuples of numbers"""
+    merged = {}
+    for part in parts:
+        for key, value in part.items():
+            if key not in merged:
+                merged[key] = value
+            elif isinstance(value, tuple):
+                merged[key] = tuple(a + b for a, b in zip(merged[key], value))
+            else:
+                merged[key] += value
+    return merged
+
+
+def watermark(cursor, from_date, to_date):
+    """Sales change counters over the months of the range (every aggregate reads only sales and their rollups)"""
+    return report_cache.watermark(cursor, ('sales',), (), from_date, to_date)
+
+
+def aggregate(cursor, db_path, kind, from_date, to_date):
+    """Run one aggregate over the range on cursor (archives already attached to its connection are reused)"""
+    with archive.attached(cursor.connection, db_path, from_date, to_date) as schemas:
+        return AGGREGATES[kind](cursor, schemas, from_date, to_date)
+
+
+# Worker process side: one read-only connection per database, kept between shards
+_connections = {}
+
+
+def _run_shard(db_path, kind, from_date, to_date):
+    """(watermark of the shard, aggregate over the shard), read from one snapshot"""
+    conn = _connections.get(db_path)
+    if conn is None:
+        conn = _connections[db_path] = readers.connect(db_path)
+    cursor = conn.cursor()
+    # ATTACH is not allowed inside the snapshot's transaction
+    with archive.attached(conn, db_path, from_date, to_date) as schemas, readers.snapshot(conn):
+        return watermark(cursor, from_date, to_date), AGGREGATES[kind](cursor, schemas, from_date, to_date)
+
+
+class ShardedReports:
+    """Aggregates for the reports, over month shards in worker processes when the range is long"""
+
+    def __init__(self, db_path, workers=DEFAULT_WORKERS, min_months=MIN_MONTHS):
+        self.db_path = db_path
+        self.workers = workers
+        self.min_months = min_months
+        self.fallbacks = 0           # shards summed in-process again because their sales changed meanwhile
+        self._pool = None
+
+    def parallel(self, from_date, to_date):
+        """True if the range is split over the worker processes"""
+        return self.workers > 1 and len(month_shards(from_date, to_date)) >= self.min_months
+
+    def totals(self, cursor, kind, from_date, to_date):
+        """{key: value} of the aggregate kind over the range, as read by cursor (in its snapshot, if it holds one)
+
+        Archives the range needs must already be attached to the cursor's connection when it holds a snapshot.
+        """
+        if not self.parallel(from_date, to_date):
+            return aggregate(cursor, self.db_path, kind, from_date, to_date)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        months = month_shards(from_date, to_date)
+        futures = [self._pool.submit(_run_shard, self.db_path, kind, start, end) for start, end in months]
+        parts = []
+        for (start, end), future in zip(months, futures):
+            seen, part = future.result()
+            if seen != watermark(cursor, start, end):
+                # Sales of this month changed while the shards ran: the shard read a different state than cursor
+                self.fallbacks += 1
+                part = aggregate(cursor, self.db_path, kind, start, end)
+            parts.append(part)
+        return merge(parts)
+
+    def close(self):
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
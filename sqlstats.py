@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Per-statement SQL timing and slow-query logging for the Pharmacy POS application.
+
+Connections created with connect() hand out TimedCursor objects. Every statement
+is timed from execute() through the last fetch, and the time is attributed to the
+statement's normalized text (whitespace collapsed, literals replaced by ?).
+While instrumentation is enabled (see perf.py) the count, total/max time and rows
+returned are aggregated per statement. Independently of that, any statement
+slower than the configured threshold is written to a rotating slow-query log
+together with its EXPLAIN QUERY PLAN output.
+"""
+
+import logging
+import logging.handlers
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+import perf
+
+# Statements slower than this (milliseconds) go to the slow-query log
+slow_query_threshold_ms = float(os.environ.get("POS_SLOW_QUERY_MS", "100"))
+SLOW_QUERY_LOG = os.environ.get("POS_SLOW_QUERY_LOG", "slow_queries.log")
+SLOW_QUERY_LOG_BYTES = 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 3
+
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+_stats = {}
+_lock = threading.Lock()
+_slow_logger = None
+
+
+class StatementStats:
+    """Aggregated timings for one normalized statement"""
+
+    __slots__ = ("count", "total", "max", "rows")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+
+
+@lru_cache(maxsize=1024)
+def normalize(sql):
+    """Collapse whitespace and replace literals so equivalent statements group together"""
+    text = _STRING_LITERAL.sub("?", sql)
+    text = _NUMBER_LITERAL.sub("?", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def set_slow_query_threshold(ms):
+    """Change the slow-query threshold (milliseconds)"""
+    global slow_query_threshold_ms
+    slow_query_threshold_ms = float(ms)
+
+
+def _get_slow_logger():
+    global _slow_logger
+    if _slow_logger is None:
+        logger = logging.getLogger("pharmacy_pos.slow_sql")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        handler = logging.handlers.RotatingFileHandler(
+            SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_BYTES,
+            backupCount=SLOW_QUERY_LOG_BACKUPS, encoding="utf-8", delay=True)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+        _slow_logger = logger
+    return _slow_logger
+
+
+def explain(connection, sql, parameters=()):
+    """Return the EXPLAIN QUERY PLAN output for a statement as indented text"""
+    if parameters is None or not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return ""
+    try:
+        # Use a plain cursor so the plan query itself is not timed
+        cursor = sqlite3.Cursor(connection)
+        plan = sqlite3.Cursor.execute(cursor, "EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+    except sqlite3.Error as e:
+        return f"(plan unavailable: {e})"
+    depth = {0: 0}
+    lines = []
+    for node_id, parent, _, detail in plan:
+        level = depth.get(parent, 0) + 1
+        depth[node_id] = level
+        lines.append("  " * level + detail)
+    return "\n".join(lines)
+
+
+def _log_slow(connection, sql, parameters, elapsed):
+    params = repr(parameters if parameters is None or isinstance(parameters, dict) else tuple(parameters))
+    if len(params) > 200:
+        params = params[:200] + "..."
+    plan = explain(connection, sql, parameters)
+    message = f"{elapsed * 1000:.1f} ms | {normalize(sql)} | params={params}"
+    if plan:
+        message += "\n" + plan
+    _get_slow_logger().info(message)
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that times each statement from execute() through its last fetch"""
+
+    _statement = None
+    _parameters = ()
+    _elapsed = 0.0
+    _logged = False
+
+    def _begin(self, sql, parameters, elapsed):
+        self._statement = sql
+        self._parameters = parameters
+        self._elapsed = elapsed
+        self._logged = False
+        self._account(elapsed, 1, 0)
+
+    def _account(self, elapsed, executions, rows):
+        if perf.is_enabled():
+            key = normalize(self._statement)
+            with _lock:
+                stats = _stats.get(key)
+                if stats is None:
+                    stats = _stats[key] = StatementStats()
+                stats.count += executions
+                stats.total += elapsed
+                stats.rows += rows
+                if self._elapsed > stats.max:
+                    stats.max = self._elapsed
+        if not self._logged and self._elapsed * 1000 >= slow_query_threshold_ms:
+            self._logged = True
+            try:
+                _log_slow(self.connection, self._statement, self._parameters, self._elapsed)
+            except Exception:
+                pass  # Logging must never break the caller
+
+    def _fetched(self, started, rows):
+        if self._statement is None:
+            return
+        elapsed = time.perf_counter() - started
+        self._elapsed += elapsed
+        self._account(elapsed, 0, rows)
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        super().execute(sql, parameters)
+        self._begin(sql, parameters, time.perf_counter() - started)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        # Only a materialized parameter list gives us a sample row to explain with
+        sample = seq_of_parameters[0] if isinstance(seq_of_parameters, (list, tuple)) and seq_of_parameters else None
+        self._begin(sql, sample, time.perf_counter() - started)
+        return self
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, 1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, 0)
+            raise
+        self._fetched(started, 1)
+        return row
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose cursors (including execute shortcuts) are TimedCursors"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connect(database, **kwargs):
+    """Open a SQLite connection with per-statement timing"""
+    return sqlite3.connect(database, factory=TimedConnection, **kwargs)
+
+
+def reset():
+    """Discard all collected statement stats"""
+    with _lock:
+        _stats.clear()
+
+
+def snapshot():
+    """Return statement stats as a list of dicts, slowest total first"""
+    with _lock:
+        rows = [{
+            'statement': statement,
+            'count': stats.count,
+            'total': stats.total,
+            'mean': stats.total / stats.count if stats.count else 0.0,
+            'max': stats.max,
+            'rows': stats.rows,
+        } for statement, stats in _stats.items()]
+    rows.sort(key=lambda row: row['total'], reverse=True)
+    return rows
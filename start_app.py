@@ -3,6 +3,7 @@
 Script to start the Pharmacy POS application with proper error handling and guidance.
 """
 
+import multiprocessing
 import sys
 import os
 import subprocess
@@ -88,4 +89,6 @@ def main():
         return 1
 
 if __name__ == "__main__":
+    # Report worker processes (shards.py) start from this executable in a frozen build
+    multiprocessing.freeze_support()
     sys.exit(main())
\ No newline at end of file
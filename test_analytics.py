@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the columnar sales analytics engine.
+"""
+
+from datetime import date
+
+import analytics
+import archive
+import headless
+
+def make_app():
+    """App with three medicines sold on every day of 2024 and 2025 (packs of 10 for the first, prices in cents)"""
+    app = headless.create_temp_app()
+    for name in ("Paracetamol 500", "Ibuprofen 200", "Vitamin C"):
+        app.cursor.execute("""
+            INSERT INTO medicines (name, batch, expiry, stock_packs, units_per_pack, pack_price, unit_price, supplier)
+            VALUES (?, 'B1', '2030-01-01', 100, 10, 500, 50, 'Acme')
+        """, (name,))
+    rows = []
+    for ordinal in range(date(2024, 1, 1).toordinal(), date(2026, 1, 1).toordinal()):
+        day = date.fromordinal(ordinal)
+        for medicine_id in (1, 2, 3):
+            # Vitamin C sells twice as much in 2025, Ibuprofen half as much
+            qty = {1: 1, 2: 2 if day.year == 2024 else 1, 3: 1 if day.year == 2024 else 2}[medicine_id]
+            sale_type = 'Pack' if medicine_id == 1 else 'Unit'
+            rows.append((f"{day.isoformat()} 10:00:00", medicine_id, qty, sale_type, qty * 125))
+    app.cursor.executemany("""
+        INSERT INTO sales (date, medicine_id, qty, type, price, total, user_id, invoice_no)
+        VALUES (?, ?, ?, ?, 125, ?, 1, NULL)
+    """, rows)
+    app.conn.commit()
+    return app
+
+def test_group_by_and_top():
+    """Test month/day/medicine totals and top-N against SQL"""
+    app = make_app()
+    columns = analytics.SalesColumns()
+    columns.refresh(app.conn, app.db_path)
+    assert len(columns) == 731 * 3
+    months = columns.totals_by('month', date(2024, 1, 1), date(2025, 12, 31))
+    expected = dict(app.cursor.execute("SELECT strftime('%Y-%m', date), SUM(total) FROM sales GROUP BY 1").fetchall())
+    assert months.keys() == expected.keys()
+    assert months == expected
+    days = columns.totals_by('day', "2024-02-28", "2024-03-01")
+    assert days == {date(2024, 2, 28): 500, date(2024, 2, 29): 500, date(2024, 3, 1): 500}, days
+    units = columns.totals_by('medicine', "2024-01-01", "2024-01-31", value='units')
+    assert units == {1: 310, 2: 62, 3: 31}, units
+    assert columns.top(2, "2025-01-01", "2025-12-31") == [(3, 91250), (1, 45625)]
+    assert columns.top(1, "2024-01-01", "2024-12-31", value='units') == [(1, 3660)]
+    assert columns.totals_by('medicine', "2030-01-01", "2030-12-31") == {}
+    print(f"✓ Group-by and top-N match SQL ({'numpy' if analytics.numpy else 'array'} backend)")
+
+    changes = columns.compare(("2025-01-01", "2025-12-31"), ("2024-01-01", "2024-12-31"))
+    assert changes[2] == (45625, 91500) and changes[3] == (91250, 45750), changes
+    print("✓ Period comparison per medicine")
+    app.conn.close()
+
+def test_incremental_refresh():
+    """Test that new sales are appended and any other change reloads"""
+    app = make_app()
+    columns = analytics.SalesColumns()
+    columns.refresh(app.conn, app.db_path)
+    loads = []
+    load = columns.load
+    columns.load = lambda conn, db_path: [loads.append(1), load(conn, db_path)]
+
+    app.cart_items = [{'id': 2, 'name': 'Ibuprofen 200', 'type': 'Unit', 'quantity': 4, 'price': 125, 'total': 500}]
+    app.checkout()
+    assert not headless.messagebox.errors()
+    columns.refresh(app.conn, app.db_path)
+    assert loads == [] and len(columns) == 731 * 3 + 1
+    assert columns.totals_by('medicine', date.today(), date.today(), value='units') == {2: 4}
+    print("✓ New sales appended without a reload")
+
+    # A backdated sale keeps the arrays in day order
+    app.cursor.execute("""
+        INSERT INTO sales (date, medicine_id, qty, type, price, total, user_id) VALUES ('2024-06-01 09:00:00', 3, 7, 'Unit', 125, 875, 1)
+    """)
+    app.conn.commit()
+    columns.refresh(app.conn, app.db_path)
+    assert loads == [] and list(columns.day) == sorted(columns.day)
+    assert columns.totals_by('medicine', "2024-06-01", "2024-06-01", value='units') == {1: 10, 2: 2, 3: 8}
+    print("✓ Backdated sales re-sorted")
+
+    app.cursor.execute("UPDATE sales SET total = 0 WHERE date LIKE '2024-01-%'")
+    app.conn.commit()
+    columns.refresh(app.conn, app.db_path)
+    assert loads == [1]
+    assert columns.totals_by('month', "2024-01-01", "2024-01-31") == {"2024-01": 0}
+    print("✓ Edits reload the columns")
+    app.conn.close()
+
+def test_reports():
+    """Test long-range Monthly Sales and the Sales Comparison report, with archived years"""
+    app = make_app()
+    app.report_type_var.set("Monthly Sales")
+    headless.set_entry(app.from_date_entry, "2024-01-01")
+    headless.set_entry(app.to_date_entry, "2025-12-31")
+    limit, app.ANALYTICS_MIN_DAYS = app.ANALYTICS_MIN_DAYS, 10000
+    app.view_report()
+    from_sql = app.report_text.get(1.0, 'end')
+    app.ANALYTICS_MIN_DAYS = limit
+    app.cursor.execute("DELETE FROM report_cache")
+    archive.archive(app.conn, app.db_path, today=date(2026, 1, 15))
+    app.view_report()
+    assert not headless.messagebox.errors()
+    assert app.report_text.get(1.0, 'end') == from_sql and len(app.sales_columns) == 731 * 3
+    print("✓ Multi-year Monthly Sales from the columns, archives included")
+
+    app.report_type_var.set("Sales Comparison")
+    headless.set_entry(app.from_date_entry, "2025-01-01")
+    headless.set_entry(app.to_date_entry, "2025-12-31")
+    app.view_report()
+    assert not headless.messagebox.errors()
+    report = app.report_text.get(1.0, 'end')
+    # The 365 days before 2025 start on 2024-01-02 (leap year)
+    assert "Compared with: 2024-01-02 to 2024-12-31" in report and "Change:\t\t+0.0%" in report, report
+    gains, drops = report.split("Biggest Drops")
+    assert "Vitamin C" in gains and "Ibuprofen 200" in drops and "Paracetamol" not in gains + drops
+    print("✓ Sales Comparison report")
+    app.conn.close()
+
+if __name__ == "__main__":
+    test_group_by_and_top()
+    test_incremental_refresh()
+    test_reports()
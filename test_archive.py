@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test script to verify archiving of closed periods into yearly archive databases.
+"""
+
+import glob
+import os
+from datetime import date
+
+import archive
+import headless
+
+def make_app():
+    """App with a sale (and a return) on the 15th of every month from 2024-01 to 2026-06"""
+    folder = headless.temp_folder()
+    app = headless.create_app(os.path.join(folder, "pharmacy.db"))
+    app.cursor.execute("""
+        INSERT INTO medicines (name, batch, expiry, stock_packs, units_per_pack, pack_price, unit_price, supplier)
+        VALUES ('Paracetamol 500', 'B1', '2030-01-01', 100, 10, 500, 50, 'Acme')
+    """)
+    for month in range(30):
+        day = f"{2024 + month // 12}-{month % 12 + 1:02d}-15"
+        app.cursor.execute("""
+            INSERT INTO sales (date, medicine_id, qty, type, price, total, user_id, invoice_no)
+            VALUES (?, 1, 2, 'Pack', 500, 1000, 1, NULL)
+        """, (f"{day} 10:00:00",))
+        sale_id = app.cursor.lastrowid
+        app.cursor.execute("INSERT INTO sale_batches (sale_id, batch_id, qty) VALUES (?, 1, 20)", (sale_id,))
+        app.cursor.execute("""
+            INSERT INTO returns (sale_id, medicine_id, return_date, return_qty, return_type, reason, refunded_amount)
+            VALUES (?, 1, ?, 1, 'Pack', NULL, 500)
+        """, (sale_id, f"{day} 12:00:00"))
+    app.conn.commit()
+    return app, folder
+
+def report(app, report_type, from_date, to_date):
+    app.report_type_var.set(report_type)
+    headless.set_entry(app.from_date_entry, from_date)
+    headless.set_entry(app.to_date_entry, to_date)
+    app.view_report()
+    assert not headless.messagebox.errors()
+    return app.report_text.get(1.0, 'end')
+
+def test_cutoff():
+    """Test that only whole months older than the limit are archived"""
+    assert archive.cutoff(date(2026, 6, 20)) == date(2025, 6, 1)
+    assert archive.cutoff(date(2026, 1, 1)) == date(2025, 1, 1)
+    assert archive.cutoff(date(2026, 1, 31), months=1) == date(2025, 12, 1)
+    print("✓ Cutoff at the start of the month")
+
+def test_archive_and_reports():
+    """Test that archived rows leave the live tables and reports still see them"""
+    app, folder = make_app()
+    periods = [("Monthly Sales", "2024-01-01", "2026-06-30"), ("Returns Report", "2024-01-01", "2026-06-30"),
+               ("Daily Sales", "2025-05-01", "2025-06-30")]
+    before = [report(app, *period) for period in periods]
+
+    moved = archive.archive(app.conn, app.db_path, today=date(2026, 6, 20))
+    assert moved == {2024: (12, 12), 2025: (5, 5)}, moved
+    assert os.path.exists(os.path.join(folder, "pharmacy_archive_2024.db"))
+    assert app.cursor.execute("SELECT MIN(date), COUNT(*) FROM sales").fetchone() == ("2025-06-15 10:00:00", 13)
+    assert app.cursor.execute("SELECT COUNT(*) FROM sale_batches").fetchone()[0] == 13
+    assert app.cursor.execute("SELECT * FROM archive_periods ORDER BY year").fetchall() == [
+        (2024, "pharmacy_archive_2024.db", "2024-01-15", "2024-12-15"),
+        (2025, "pharmacy_archive_2025.db", "2025-01-15", "2025-05-15")]
+    print("✓ Closed months moved into yearly archives")
+
+    assert [report(app, *period) for period in periods] == before
+    assert "$300.00" in before[0] and "$150.00" in before[1]
+    print("✓ Reports across archived periods unchanged")
+
+    with archive.attached(app.conn, app.db_path, "2025-06-01", "2026-06-30") as schemas:
+        assert schemas == []
+    with archive.attached(app.conn, app.db_path, "2025-03-01", "2025-03-31") as schemas:
+        assert schemas == ["archive_2025"]
+    assert [row[1] for row in app.cursor.execute("PRAGMA database_list").fetchall()] == ["main"]
+    print("✓ Archives attached only for the years a period needs, then detached")
+
+    # Running again later appends to the existing year
+    moved = archive.archive(app.conn, app.db_path, today=date(2026, 8, 1))
+    assert moved == {2025: (2, 2)}, moved
+    assert app.cursor.execute("SELECT last_date FROM archive_periods WHERE year = 2025").fetchone()[0] == "2025-07-15"
+    assert report(app, *periods[0]) == before[0]
+    print("✓ Later runs extend the yearly archive")
+    app.conn.close()
+
+def test_missing_archive_reported():
+    """Test that a missing archive file is an error, not an empty period"""
+    app, folder = make_app()
+    archive.archive(app.conn, app.db_path, today=date(2026, 6, 20))
+    os.remove(os.path.join(folder, "pharmacy_archive_2024.db"))
+    app.report_type_var.set("Monthly Sales")
+    headless.set_entry(app.from_date_entry, "2024-01-01")
+    headless.set_entry(app.to_date_entry, "2024-12-31")
+    app.view_report()
+    errors = headless.messagebox.errors()
+    headless.messagebox.clear()
+    assert errors and "Archive for 2024 not found" in errors[0], errors
+    assert not os.path.exists(os.path.join(folder, "pharmacy_archive_2024.db"))
+    print("✓ Missing archive reported")
+    app.conn.close()
+
+def test_backup_includes_archives():
+    """Test that a backup copies the archives and still reads them when restored"""
+    app, folder = make_app()
+    archive.archive(app.conn, app.db_path, today=date(2026, 6, 20))
+    before = report(app, "Monthly Sales", "2024-01-01", "2026-06-30")
+    app.backup_database()
+    assert not headless.messagebox.errors()
+    backup_dir, = glob.glob(os.path.join(folder, "pharmacy_backup_*"))
+    assert sorted(os.listdir(backup_dir)) == ["pharmacy.db", "pharmacy_archive_2024.db", "pharmacy_archive_2025.db"]
+    app.conn.close()
+
+    # The live archives are gone; the restored folder is self-contained
+    for year in (2024, 2025):
+        os.remove(os.path.join(folder, f"pharmacy_archive_{year}.db"))
+    restored = headless.create_app(os.path.join(backup_dir, "pharmacy.db"))
+    restored.cursor.execute("DELETE FROM report_cache")
+    restored.conn.commit()
+    assert report(restored, "Monthly Sales", "2024-01-01", "2026-06-30") == before
+    print("✓ Backup holds the archives under their registered names")
+    restored.conn.close()
+
+if __name__ == "__main__":
+    test_cutoff()
+    test_archive_and_reports()
+    test_missing_archive_reported()
+    test_backup_includes_archives()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test script to verify barcode normalization and the scanner-mode fast path.
+"""
+
+import barcodes
+import headless
+
+def test_normalize_barcode():
+    """Test that GTIN forms of one code share a lookup key"""
+    assert barcodes.normalize_barcode("036000291452") == "00036000291452"
+    assert barcodes.normalize_barcode("0036000291452") == "00036000291452"
+    assert barcodes.normalize_barcode(" 4006381333931 ") == "04006381333931"
+    assert barcodes.normalize_barcode("med-77") == "MED-77"
+    assert barcodes.is_valid_gtin("4006381333931")
+    assert not barcodes.is_valid_gtin("4006381333932")
+    assert barcodes.parse_barcode_list("036000291452, 0036000291452; abc") == ["00036000291452", "ABC"]
+    print("✓ Barcodes normalized")
+
+def test_scan_adds_to_cart():
+    """Test that scans add packs/units, increment lines and respect stock"""
+    app = headless.create_temp_app()
+    headless.messagebox.clear()
+    for entry, text in ((app.name_entry, "Scanol"), (app.expiry_entry, "2030-01-01"), (app.stock_entry, "3"),
+                        (app.units_entry, "10"), (app.pack_price_entry, "5"), (app.supplier_entry, "Acme"),
+                        (app.pack_barcodes_entry, "4006381333931"), (app.unit_barcodes_entry, "MED-77")):
+        headless.set_entry(entry, text)
+    app.add_medicine()
+    assert not headless.messagebox.errors(), headless.messagebox.errors()
+
+    assert app.scan_barcode("4006381333931")
+    assert app.scan_barcode("04006381333931")
+    assert app.scan_barcode("med-77")
+    assert [(item['type'], item['quantity']) for item in app.cart_items] == [("Pack", 2), ("Unit", 1)]
+    assert app.cart_tree.item("0")['values'][3] == 2
+    print("✓ Scans add and increment cart lines")
+
+    # Two of three packs plus one unit are in the cart, so another pack exceeds stock
+    assert not app.scan_barcode("4006381333931")
+    assert not app.scan_barcode("96385074")
+    assert app.scan_status_label.cget("text") == "Unknown barcode: 00000096385074"
+    assert not app.scan_barcode("4006381333932")
+    assert app.scan_status_label.cget("text").startswith("Misread barcode")
+    print("✓ Over-stock, unknown and misread scans rejected")
+
+    # Enter in scanner mode goes through the same path
+    app.scanner_mode_var.set(True)
+    headless.set_entry(app.sales_search_entry, "MED-77")
+    assert app.on_sales_search_return() == "break"
+    assert app.cart_items[1]['quantity'] == 2
+    print("✓ Scanner mode handles Enter")
+
+    # A barcode already used by another product is refused
+    for entry, text in ((app.name_entry, "Other"), (app.expiry_entry, "2030-01-01"), (app.stock_entry, "1"),
+                        (app.units_entry, "1"), (app.pack_price_entry, "1"), (app.supplier_entry, "Acme"),
+                        (app.pack_barcodes_entry, "4006381333931")):
+        headless.set_entry(entry, text)
+    app.add_medicine()
+    assert any("already assigned" in message for message in headless.messagebox.errors())
+    assert app.conn.execute("SELECT COUNT(*) FROM medicines").fetchone()[0] == 1
+    print("✓ Duplicate barcode rejected")
+    headless.messagebox.clear()
+    app.conn.close()
+
+if __name__ == "__main__":
+    test_normalize_barcode()
+    test_scan_adds_to_cart()
@@ -17,7 +17,7 @@ def test_batch_optional():
         cursor.execute("""
             INSERT INTO medicines (name, batch, expiry, stock_packs, units_per_pack, pack_price, unit_price, supplier)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, ("Test Medicine", "", "2025-12-31", 10, 10, 25.0, 2.5, "Test Supplier"))
+        """, ("Test Medicine", "", "2025-12-31", 10, 10, 2500, 250, "Test Supplier"))
         
         conn.commit()
         print("✓ Successfully inserted medicine without batch number")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test script to verify batch-level stock and FEFO allocation.
+"""
+
+from datetime import date
+
+import batches
+import headless
+import records
+
+def make_app():
+    """App with one medicine held in three batches (one expired)"""
+    app = headless.create_temp_app()
+    app.cursor.execute("""
+        INSERT INTO medicines (name, batch, expiry, stock_packs, units_per_pack, pack_price, unit_price, supplier)
+        VALUES ('Paracetamol 500', 'LATE', '2031-01-01', 0, 10, 500, 50, 'Acme')
+    """)
+    medicine_id = app.cursor.lastrowid
+    batches.receive(app.cursor, medicine_id, "LATE", "2031-01-01", 20)
+    batches.receive(app.cursor, medicine_id, "EARLY", "2030-01-01", 15)
+    batches.receive(app.cursor, medicine_id, "OLD", "2020-01-01", 5)
+    batches.sync_medicines(app.cursor, [medicine_id])
+    app.conn.commit()
+    return app, medicine_id
+
+def batch_stock(app, medicine_id):
+    app.cursor.execute("SELECT batch, qty FROM medicine_batches WHERE medicine_id = ? ORDER BY expiry", (medicine_id,))
+    return dict(app.cursor.fetchall())
+
+def test_fefo_plan():
+    """Test that sales use unexpired batches earliest expiry first and write-offs take expired stock first"""
+    app, medicine_id = make_app()
+    today = date(2025, 6, 1)
+    batch_ids = dict(app.cursor.execute("SELECT batch, id FROM medicine_batches").fetchall())
+    plan, available = batches.plan_allocation(app.cursor, medicine_id, 18, today)
+    assert available >= 18
+    assert plan == [(batch_ids["EARLY"], 15), (batch_ids["LATE"], 3)], plan
+    plan, available = batches.plan_allocation(app.cursor, medicine_id, 38, today)
+    assert plan is None and available == 35
+    plan, _ = batches.plan_allocation(app.cursor, medicine_id, 8, today, include_expired=True)
+    assert plan == [(batch_ids["OLD"], 5), (batch_ids["EARLY"], 3)], plan
+    plan, available = batches.plan_allocation(app.cursor, medicine_id, 41, today, include_expired=True)
+    assert plan is None and available == 40
+    print("✓ FEFO plan never sells expired batches; write-offs take them first")
+    app.conn.close()
+
+def test_checkout_and_return():
+    """Test that checkout allocates from batches and a return goes back to them"""
+    app, medicine_id = make_app()
+    assert app.cursor.execute("SELECT stock_packs, batch FROM medicines WHERE id = ?",
+                              (medicine_id,)).fetchone() == (3, "EARLY")
+    app.cart_items = [
+        {'id': medicine_id, 'name': 'Paracetamol 500', 'type': 'Pack', 'quantity': 1, 'price': 500, 'total': 500},
+        {'id': medicine_id, 'name': 'Paracetamol 500', 'type': 'Unit', 'quantity': 8, 'price': 50, 'total': 400},
+    ]
+    app.checkout()
+    assert not headless.messagebox.errors()
+    assert batch_stock(app, medicine_id) == {"OLD": 5, "EARLY": 0, "LATE": 17}
+    # Only the 17 sellable units count: 1 full pack, next from LATE
+    assert app.cursor.execute("SELECT stock_packs, batch FROM medicines WHERE id = ?",
+                              (medicine_id,)).fetchone() == (1, "LATE")
+    print("✓ Checkout took 18 units from EARLY then LATE")
+
+    unit_sale = app.cursor.execute("SELECT id FROM sales WHERE type = 'Unit'").fetchone()[0]
+    app.sales_tree.insert('', 'end', iid=str(unit_sale), values=(unit_sale, '', 'Paracetamol 500', 8, 'Unit', '', ''))
+    app.sales_tree.selection_set(str(unit_sale))
+    headless.set_entry(app.return_qty_entry, "6")
+    app.process_return()
+    assert not headless.messagebox.errors()
+    # The unit line took 5 from EARLY and 3 from LATE; the return refills LATE first
+    assert batch_stock(app, medicine_id) == {"OLD": 5, "EARLY": 3, "LATE": 20}
+    assert app.cursor.execute("SELECT SUM(returned) FROM sale_batches WHERE sale_id = ?", (unit_sale,)).fetchone()[0] == 6
+    print("✓ Return restored units to the batches they were sold from")
+    app.conn.close()
+
+def test_write_off_expired_first():
+    """Test that lowering the stock writes off the expired batch before sellable ones"""
+    app, medicine_id = make_app()
+    batches.adjust_stock(app.cursor, medicine_id, "OLD", "2020-01-01", 35, date(2025, 6, 1))
+    assert batch_stock(app, medicine_id) == {"OLD": 0, "EARLY": 15, "LATE": 20}
+    batches.adjust_stock(app.cursor, medicine_id, "EARLY", "2030-01-01", 30, date(2025, 6, 1))
+    assert batch_stock(app, medicine_id) == {"OLD": 0, "EARLY": 10, "LATE": 20}
+    print("✓ Write-offs take expired stock first")
+    app.conn.close()
+
+def test_cart_counts_sellable_stock():
+    """Test that the cart and the medicine summary leave expired batches out of the stock"""
+    app, medicine_id = make_app()
+    app.current_medicine = records.fetchone(app.cursor, records.Medicine,
+                                            f"SELECT {records.Medicine.COLUMNS} FROM medicines WHERE id = ?",
+                                            (medicine_id,))
+    app.sale_type_var.set("Unit")
+    # 35 units are sellable; the cart works in whole packs of them
+    headless.set_entry(app.quantity_entry, "31")
+    app.add_to_cart()
+    assert headless.messagebox.errors() and not app.cart_items
+    headless.messagebox.clear()
+    headless.set_entry(app.quantity_entry, "30")
+    app.add_to_cart()
+    assert not headless.messagebox.errors() and app.cart_items[0]['quantity'] == 30
+    print("✓ Cart leaves the 5 expired units out of the stock")
+
+    # Once EARLY has expired too, only LATE is left to sell
+    assert batches.sync_expired(app.cursor, date(2030, 6, 1)) == 1
+    assert app.cursor.execute("SELECT stock_packs, batch, expiry FROM medicines WHERE id = ?",
+                              (medicine_id,)).fetchone() == (2, "LATE", "2031-01-01")
+    print("✓ Expired batches leave the medicine stock")
+    app.conn.close()
+
+def test_insufficient_stock_rolls_back():
+    """Test that a sale larger than the unexpired batches fails without touching stock"""
+    app, medicine_id = make_app()
+    # 40 units are held, but 5 of them are expired
+    app.cart_items = [
+        {'id': medicine_id, 'name': 'Paracetamol 500', 'type': 'Pack', 'quantity': 4, 'price': 500, 'total': 2000},
+    ]
+    app.checkout()
+    errors = headless.messagebox.errors()
+    headless.messagebox.clear()
+    assert errors and "40 units requested, 35 available (5 more expired)" in errors[0], errors
+    assert batch_stock(app, medicine_id) == {"OLD": 5, "EARLY": 15, "LATE": 20}
+    assert app.cursor.execute("SELECT COUNT(*) FROM sales").fetchone()[0] == 0
+    print("✓ Oversized sale rejected and rolled back")
+    app.conn.close()
+
+def test_legacy_stock_migrated():
+    """Test that stock of medicines without batches becomes a batch"""
+    app, _ = make_app()
+    app.cursor.execute("""
+        INSERT INTO medicines (name, batch, expiry, stock_packs, units_per_pack, pack_price, unit_price, supplier)
+        VALUES ('Ibuprofen 200', 'B1', '2030-05-01', 3, 12, 600, 50, 'Acme')
+    """)
+    legacy_id = app.cursor.lastrowid
+    assert batches.migrate_stock(app.cursor) == 1
+    assert batches.migrate_stock(app.cursor) == 0
+    assert batch_stock(app, legacy_id) == {"B1": 36}
+    print("✓ Legacy stock migrated once")
+    app.conn.close()
+
+if __name__ == "__main__":
+    test_fefo_plan()
+    test_checkout_and_return()
+    test_write_off_expired_first()
+    test_cart_counts_sellable_stock()
+    test_insufficient_stock_rolls_back()
+    test_legacy_stock_migrated()
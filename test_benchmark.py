@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the dataset generator and the headless benchmark runner.
+"""
+
+import json
+
+import bench_data
+import benchmark
+import headless
+
+def test_generate_and_benchmark():
+    """Test that a small generated database can be benchmarked end to end"""
+    db_path = headless.temp_path("bench.db")
+    counts = bench_data.generate(db_path, medicines=200, sales=3000, returns=30, days=60, quiet=True)
+    assert counts == {'medicines': 200, 'sales': 3000, 'returns': 30}
+    print(f"✓ Generated database: {counts}")
+
+    result = benchmark.run_benchmark(db_path, repeat=3)
+    json.dumps(result)  # must be JSON serializable
+    results = result['results']
+    for case in ('sales.medicine_search', 'medicines.search', 'sales.add_to_cart', 'sales.scan_to_line', 'sales.checkout',
+                 'returns.search', 'reports.daily_sales.30d', 'reports.returns_report.365d',
+                 'reports.daily_sales.365d.cached', 'reports.top_sellers.365d.sharded',
+                 'dashboard.refresh', 'backup'):
+        assert case in results, case
+        assert results[case]['count'] > 0
+        assert 'errors' not in results[case], results[case].get('last_error')
+    assert result['meta']['database']['sales'] == 3000
+    print(f"✓ Benchmarked {len(results)} cases")
+
+    # The source database is untouched: checkout ran against a copy
+    assert benchmark.database_info(db_path)['sales'] == 3000
+    print("✓ Source database left unchanged")
+
+if __name__ == "__main__":
+    test_generate_and_benchmark()
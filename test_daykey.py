@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the day keys of sales and returns and the reports reading them.
+"""
+
+import sqlite3
+from datetime import date, datetime
+
+import archive
+import daykey
+import headless
+import migrations
+
+def make_app():
+    """App with sales on 2024-03-10 and at the very end of 2026-03-31, and a return on 2026-03-05"""
+    app = headless.create_temp_app()
+    app.cursor.execute("""
+        INSERT INTO medicines (name, batch, expiry, stock_packs, units_per_pack, pack_price, unit_price, supplier)
+        VALUES ('Paracetamol 500', 'B1', '2030-01-01', 100, 10, 500, 50, 'Acme')
+    """)
+    app.cursor.executemany("""
+        INSERT INTO sales (date, medicine_id, qty, type, price, total, user_id, invoice_no)
+        VALUES (?, 1, 1, 'Pack', 500, 500, 1, NULL)
+    """, [("2024-03-10 10:00:00",), ("2026-03-01 09:00:00",), ("2026-03-31 23:59:59.500000",)])
+    app.cursor.execute("""
+        INSERT INTO returns (sale_id, medicine_id, return_date, return_qty, return_type, reason, refunded_amount)
+        VALUES (2, 1, '2026-03-05 10:00:00', 1, 'Pack', NULL, 500)
+    """)
+    app.conn.commit()
+    return app
+
+def report(app, report_type, from_date, to_date):
+    app.report_type_var.set(report_type)
+    headless.set_entry(app.from_date_entry, from_date)
+    headless.set_entry(app.to_date_entry, to_date)
+    app.view_report()
+    assert not headless.messagebox.errors()
+    return app.report_text.get(1.0, 'end')
+
+def test_keys():
+    """Test day keys from dates and text, and back"""
+    assert daykey.day_key("2024-01-10 10:00:00.123456") == 20240110 == daykey.day_key(date(2024, 1, 10))
+    assert daykey.day_key(datetime(2024, 1, 10, 23, 59)) == 20240110
+    assert daykey.day_text(20240110) == "2024-01-10" and daykey.month_text(202401) == "2024-01"
+    try:
+        daykey.day_key("10/01/2024")
+        assert False
+    except ValueError:
+        pass
+    print("✓ Day keys converted both ways")
+
+def test_reports_use_day_keys():
+    """Test that day ranges are index range scans and include the whole last day"""
+    app = make_app()
+    assert app.cursor.execute("SELECT day_key FROM sales ORDER BY id").fetchall() == [
+        (20240310,), (20260301,), (20260331,)]
+    plan = " ".join(row[3] for row in app.cursor.execute(
+        "EXPLAIN QUERY PLAN SELECT day_key, SUM(total) FROM sales WHERE day_key BETWEEN 1 AND 2 GROUP BY day_key"))
+    assert plan.startswith("SEARCH sales USING INDEX idx_sales_day_key"), plan
+    print("✓ Daily totals read from the day_key index")
+
+    daily = report(app, "Daily Sales", "2026-03-01", "2026-03-31")
+    assert "2026-03-01\t$5.00" in daily and "2026-03-31\t$5.00" in daily and "TOTAL:\t\t$10.00" in daily, daily
+    assert "2026-03\t$10.00" in report(app, "Monthly Sales", "2026-03-01", "2026-03-31")
+    assert "2026-03-05\tParacetamol 500" in report(app, "Returns Report", "2026-03-05", "2026-03-05")
+    print("✓ Daily, monthly and returns reports by day key")
+    app.conn.close()
+
+def test_migration():
+    """Test that databases and archives without day keys get them"""
+    app = make_app()
+    archive.archive(app.conn, app.db_path, today=date(2026, 3, 15))
+    db_path = app.db_path
+    app.conn.close()
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("ATTACH DATABASE ? AS old", (archive.archive_path(db_path, 2024),))
+    for schema in ("main", "old"):
+        for table in ("sales", "returns"):
+            conn.execute(f"DROP INDEX IF EXISTS {schema}.idx_{table}_day_key")
+            conn.execute(f"ALTER TABLE {schema}.{table} DROP COLUMN day_key")
+        conn.execute(f"PRAGMA {schema}.user_version = 1")
+    conn.commit()
+    conn.execute("DETACH DATABASE old")
+    conn.close()
+
+    app = headless.create_app(db_path)
+    assert migrations.user_version(app.cursor) == migrations.SCHEMA_VERSION
+    assert app.cursor.execute("SELECT day_key FROM returns").fetchall() == [(20260305,)]
+    assert "2024-03-10\t$5.00" in report(app, "Daily Sales", "2024-03-01", "2024-03-31")
+    with archive.attached(app.conn, app.db_path, "2024-01-01", "2024-12-31") as schemas:
+        assert app.cursor.execute(f"SELECT day_key FROM {schemas[0]}.sales").fetchall() == [(20240310,)]
+        assert app.cursor.execute(f"SELECT 1 FROM {schemas[0]}.sqlite_master "
+                                  "WHERE name = 'idx_sales_day_key'").fetchone()
+    print("✓ Day keys added to older databases and archives")
+    app.conn.close()
+
+if __name__ == "__main__":
+    test_keys()
+    test_reports_use_day_keys()
+    test_migration()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the expiry bucket table, horizon counts and alerts.
+"""
+
+from datetime import date, timedelta
+
+import batches
+import expiry_horizon
+import headless
+
+def make_app(today):
+    """App with batches expiring 3, 20 and 60 days out plus one expired batch"""
+    app = headless.create_temp_app()
+    app.cursor.execute("""
+        INSERT INTO medicines (name, batch, expiry, stock_packs, units_per_pack, pack_price, unit_price, supplier)
+        VALUES ('Amoxicillin 500', 'A', '2030-01-01', 0, 10, 500, 50, 'Acme')
+    """)
+    medicine_id = app.cursor.lastrowid
+    for batch, days in (("OLD", -5), ("A", 3), ("B", 20), ("C", 60)):
+        batches.receive(app.cursor, medicine_id, batch, (today + timedelta(days=days)).isoformat(), 10)
+    app.conn.commit()
+    return app, medicine_id
+
+def buckets(app):
+    return app.cursor.execute("SELECT day, batches FROM expiry_buckets ORDER BY day").fetchall()
+
+def test_triggers_match_rebuild():
+    """Test that the triggers keep expiry_buckets equal to a full recount"""
+    today = date.today()
+    app, medicine_id = make_app(today)
+    # Sell out batch A, move batch C, then delete everything
+    app.cursor.execute("UPDATE medicine_batches SET qty = 0 WHERE batch = 'A'")
+    app.cursor.execute("UPDATE medicine_batches SET expiry = ? WHERE batch = 'C'", ((today + timedelta(days=20)).isoformat(),))
+    maintained = buckets(app)
+    expiry_horizon.rebuild(app.cursor)
+    assert buckets(app) == maintained, (maintained, buckets(app))
+    assert [count for _, count in maintained] == [1, 2]
+    app.cursor.execute("UPDATE medicine_batches SET qty = 5 WHERE batch = 'A'")
+    assert len(buckets(app)) == 3
+    app.cursor.execute("DELETE FROM medicine_batches WHERE medicine_id = ?", (medicine_id,))
+    assert buckets(app) == []
+    print("✓ Buckets follow inserts, sales, expiry edits and deletes")
+    app.conn.close()
+
+def test_counts_and_next_crossing():
+    """Test the horizon counts and the next threshold crossing"""
+    today = date(2026, 3, 1)
+    app, _ = make_app(today)
+    horizon = expiry_horizon.ExpiryHorizon()
+    horizon.refresh(app.conn)
+    assert horizon.counts(today) == {'expired': 1, 7: 2, 30: 3, 90: 4}
+    # Batch A (day 3) expires first: it is expired from day 4
+    assert horizon.next_crossing(today) == today + timedelta(days=4)
+    # Batch B (day 20) enters the 7 day horizon on day 13
+    assert horizon.next_crossing(today + timedelta(days=4)) == today + timedelta(days=13)
+    print("✓ Counts for expired/7/30/90 days and next crossing")
+
+    version = horizon.version
+    horizon.refresh(app.conn)
+    assert horizon.version == version
+    app.cursor.execute("UPDATE medicine_batches SET qty = 0 WHERE batch = 'OLD'")
+    horizon.refresh(app.conn)
+    assert horizon.counts(today)['expired'] == 0
+    print("✓ Reloaded only after a change")
+    app.conn.close()
+
+def test_dashboard_alert():
+    """Test that the dashboard shows horizon counts and alerts when a batch crosses a threshold"""
+    app, _ = make_app(date.today())
+    app.refresh_dashboard()
+    # One medicine, counted once per batch
+    assert app.expiry_label.cget('text') == "3"
+    assert app.expiry_horizon_label.cget('text') == "Expired: 1  7d: 2  90d: 4"
+    # Pretend the timer was armed 17 days ago
+    app.expiry_day = date.today() - timedelta(days=17)
+    app.on_expiry_crossing()
+    alert = app.expiry_alert_label.cget('text')
+    assert "now expire within 7 days" in alert and "within 30 days" in alert, alert
+    assert app.expiry_day == date.today()
+    print("✓ Dashboard alert raised for batches that crossed a threshold")
+    app.conn.close()
+
+if __name__ == "__main__":
+    test_triggers_match_rebuild()
+    test_counts_and_next_crossing()
+    test_dashboard_alert()
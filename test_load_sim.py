@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the multi-cashier load simulator.
+"""
+
+import sqlite3
+
+import bench_data
+import headless
+import load_sim
+
+def test_simulate_threads():
+    """Test that concurrent tills complete sessions and every checkout is recorded"""
+    db_path = headless.temp_path("load.db")
+    bench_data.generate(db_path, medicines=100, sales=500, returns=5, days=30, quiet=True)
+
+    report = load_sim.simulate(db_path, tills=3, mode='thread', duration=0, sessions=3,
+                               think_ms=0, return_rate=0.5, max_lines=2)
+    counters = report['counters']
+    assert counters['sessions'] == 9
+    assert counters['checkouts'] + counters['failed_operations'] >= 1
+    assert 'checkout' in report['latency']
+    print(f"✓ {counters['sessions']} sessions, {counters['checkouts']} checkouts, "
+          f"{counters['locked_errors']} locked errors, {counters['retries']} retries")
+
+    conn = sqlite3.connect(db_path)
+    sales = conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+    conn.close()
+    assert sales > 500
+    print("✓ Checkouts written to the shared database")
+
+if __name__ == "__main__":
+    test_simulate_threads()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the idle maintenance scheduler.
+"""
+
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import headless
+import maintenance
+
+def make_app():
+    """App whose database has free pages: 2000 medicines added, then deleted"""
+    app = headless.create_temp_app()
+    app.cursor.executemany("""
+        INSERT INTO medicines (name, batch, expiry, stock_packs, units_per_pack, pack_price, unit_price, supplier)
+        VALUES (?, 'B1', '2030-01-01', 1, 10, 500, 50, ?)
+    """, [(f"Medicine {i}", "x" * 200) for i in range(2000)])
+    app.conn.commit()
+    app.cursor.execute("DELETE FROM medicines")
+    app.conn.commit()
+    return app
+
+def test_cycle_in_steps():
+    """Test that a cycle optimizes, frees pages in small steps and checks every table"""
+    app = make_app()
+    info = maintenance.stats(app.cursor)
+    assert info['auto_vacuum'] == "incremental" and info['freelist_count'] > 20, info
+
+    pages, maintenance.VACUUM_PAGES = maintenance.VACUUM_PAGES, 10
+    try:
+        steps = 0
+        while app.maintenance.step():
+            steps += 1
+            assert not app.conn.in_transaction
+    finally:
+        maintenance.VACUUM_PAGES = pages
+    assert steps > info['freelist_count'] // 10, steps
+    assert maintenance.stats(app.cursor)['freelist_count'] == 0
+    runs = maintenance.last_runs(app.cursor)
+    assert runs['optimize'][2] == "analyzed" and runs['quick_check'][2] == "ok", runs
+    # ANALYZE reuses some free pages for its statistics; the rest leave the file
+    released = info['page_count'] - maintenance.stats(app.cursor)['page_count']
+    assert released > info['freelist_count'] - 5 and runs['vacuum'][2] == f"{released} pages released", runs
+    print("✓ Optimize, incremental vacuum and quick_check run as short steps")
+
+    assert app.maintenance.due() == []
+    assert not app.maintenance.step()
+    assert app.maintenance.due(datetime.now() + timedelta(hours=25)) == list(maintenance.TASKS)
+    report = maintenance.report(app.cursor)
+    assert "Free pages: 0 (0.0%)" in report and "incremental" in report, report
+    print("✓ Tasks wait a day between runs; report shows pages and free space")
+    app.conn.close()
+
+def test_quiet_and_transactions():
+    """Test that maintenance waits for an idle till and never joins an open transaction"""
+    assert not maintenance.is_quiet(datetime(2026, 3, 2, 12), 60)
+    assert maintenance.is_quiet(datetime(2026, 3, 2, 12), maintenance.IDLE_SECONDS)
+    assert maintenance.is_quiet(datetime(2026, 3, 2, 3), maintenance.OFF_HOURS_IDLE_SECONDS)
+    app = make_app()
+    app.cursor.execute("UPDATE settings SET pharmacy_name = 'Open transaction'")
+    assert not app.maintenance.step()
+    app.conn.rollback()
+
+    app.last_activity = time.monotonic()
+    app.run_maintenance()
+    assert maintenance.last_runs(app.cursor) == {}
+    app.last_activity = time.monotonic() - maintenance.IDLE_SECONDS
+    app.run_maintenance()
+    assert "optimize" in maintenance.last_runs(app.cursor)
+    print("✓ Runs only when idle and outside transactions")
+    app.conn.close()
+
+def test_compact_existing_database():
+    """Test that a database without auto-vacuum skips vacuum until compacted"""
+    db_path = headless.temp_path()
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE filler (data TEXT)")
+    conn.executemany("INSERT INTO filler VALUES (?)", [("x" * 500,) for _ in range(500)])
+    conn.execute("DELETE FROM filler")
+    conn.commit()
+    conn.close()
+    app = headless.create_app(db_path)
+    app.maintenance.run_all()
+    assert maintenance.last_runs(app.cursor)['vacuum'][2] == "skipped (needs Compact)"
+    assert maintenance.stats(app.cursor)['freelist_count'] > 0
+    maintenance.compact(app.conn)
+    info = maintenance.stats(app.cursor)
+    assert info['auto_vacuum'] == "incremental" and info['freelist_count'] == 0, info
+    print("✓ Compact switches an existing database to incremental vacuum")
+    app.conn.close()
+
+if __name__ == "__main__":
+    test_cycle_in_steps()
+    test_quiet_and_transactions()
+    test_compact_existing_database()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Test script to verify integer-cents money handling and the migration from REAL amounts.
+"""
+
+import os
+import sqlite3
+from datetime import date
+
+import archive
+import headless
+import migrations
+import money
+
+def test_parse_and_format():
+    """Test parsing user input to cents and formatting cents"""
+    assert money.to_cents("12.5") == 1250 and money.to_cents("$1,234.56") == 123456
+    assert money.to_cents(0.1 + 0.2) == 30 and money.to_cents("0.005") == 1 and money.to_cents(0) == 0
+    for text in ("abc", "", "nan"):
+        try:
+            money.to_cents(text)
+            assert False, text
+        except ValueError:
+            pass
+    assert money.display(1234) == "$12.34" and money.display(-5) == "-$0.05" and money.display(0) == "$0.00"
+    assert money.plain(100000) == "1000.00" and money.signed(250) == "+2.50" and money.signed(-250) == "-2.50"
+    assert money.divide(1000, 3) == 333 and money.divide(1001, 2) == 501 and money.divide(-1001, 2) == -501
+    assert money.divide(500, 0) == 0
+    print("✓ Amounts parsed to and formatted from cents")
+
+def test_exact_sums():
+    """Test that a day of 10-cent sales sums exactly"""
+    app = headless.create_temp_app()
+    headless.set_entry(app.name_entry, "Paracetamol 500")
+    headless.set_entry(app.expiry_entry, "2030-01-01")
+    headless.set_entry(app.stock_entry, "100")
+    headless.set_entry(app.units_entry, "3")
+    headless.set_entry(app.pack_price_entry, "1.00")
+    headless.set_entry(app.supplier_entry, "Acme")
+    app.add_medicine()
+    assert not headless.messagebox.errors()
+    headless.messagebox.clear()
+    assert app.cursor.execute("SELECT pack_price, unit_price FROM medicines").fetchone() == (100, 33)
+
+    app.cart_items = [{'id': 1, 'name': 'Paracetamol 500', 'type': 'Unit', 'quantity': 1, 'price': 10, 'total': 10}
+                      for _ in range(30)]
+    app.checkout()
+    assert not headless.messagebox.errors()
+    assert app.cursor.execute("SELECT SUM(total), typeof(SUM(total)) FROM sales").fetchone() == (300, 'integer')
+    assert app.daily_sales_label.cget('text') == "$3.00"
+    print("✓ Sales summed as exact integers")
+    app.conn.close()
+
+def to_real(cursor, schema):
+    """Put the money columns back to REAL amounts, as older versions stored them"""
+    for table, columns in migrations.MONEY_COLUMNS.items():
+        if not cursor.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE name = ?", (table,)).fetchone():
+            continue
+        migrations.rebuild_table(cursor, schema, table, {column: 'REAL' for column in columns},
+                                 {column: f"{column} / 100.0" for column in columns})
+    cursor.execute(f"PRAGMA {schema}.user_version = 0")
+
+def test_migration():
+    """Test that an older database and its archives are converted once, keeping ids, indexes and triggers"""
+    folder = headless.temp_folder()
+    db_path = os.path.join(folder, "pharmacy.db")
+    app = headless.create_app(db_path)
+    app.cursor.execute("""
+        INSERT INTO medicines (name, batch, expiry, stock_packs, units_per_pack, pack_price, unit_price, supplier)
+        VALUES ('Paracetamol 500', 'B1', '2030-01-01', 100, 10, 499, 50, 'Acme')
+    """)
+    app.cursor.executemany("""
+        INSERT INTO sales (date, medicine_id, qty, type, price, total, user_id, invoice_no)
+        VALUES (?, 1, 1, 'Pack', 499, 499, 1, NULL)
+    """, [("2024-03-01 10:00:00",), ("2026-03-01 10:00:00",), ("2026-03-02 10:00:00",)])
+    app.cursor.execute("DELETE FROM sales WHERE id = 3")
+    app.cursor.execute("""
+        INSERT INTO returns (sale_id, medicine_id, return_date, return_qty, return_type, reason, refunded_amount)
+        VALUES (2, 1, '2026-03-05 10:00:00', 1, 'Pack', NULL, 499)
+    """)
+    app.conn.commit()
+    archive.archive(app.conn, app.db_path, today=date(2026, 3, 15))
+    app.conn.close()
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    to_real(conn.cursor(), "main")
+    conn.execute("ATTACH DATABASE ? AS old", (archive.archive_path(db_path, 2024),))
+    to_real(conn.cursor(), "old")
+    conn.commit()
+    conn.execute("DETACH DATABASE old")
+    assert conn.execute("SELECT total FROM sales").fetchone() == (4.99,)
+    conn.close()
+
+    for _ in range(2):
+        app = headless.create_app(db_path)
+        assert migrations.user_version(app.cursor) == migrations.SCHEMA_VERSION
+        assert app.cursor.execute("SELECT id, price, total FROM sales").fetchall() == [(2, 499, 499)]
+        assert app.cursor.execute("SELECT pack_price, unit_price FROM medicines").fetchone() == (499, 50)
+        assert app.cursor.execute("SELECT refunded_amount FROM returns").fetchone() == (499,)
+        app.conn.close()
+    print("✓ REAL amounts converted to cents once")
+
+    app = headless.create_app(db_path)
+    indexes = [row[0] for row in app.cursor.execute("SELECT name FROM sqlite_master WHERE tbl_name = 'sales'")]
+    assert "idx_sales_date_id" in indexes and "trg_sales_by_medicine_day_insert" in indexes
+    app.cart_items = [{'id': 1, 'name': 'Paracetamol 500', 'type': 'Pack', 'quantity': 1, 'price': 499, 'total': 499}]
+    app.checkout()
+    assert not headless.messagebox.errors()
+    # The deleted sale's id is not reused
+    assert app.cursor.execute("SELECT MAX(id) FROM sales").fetchone()[0] == 4
+    assert app.cursor.execute("SELECT SUM(amount) FROM sales_by_medicine_day").fetchone()[0] == 998
+    print("✓ Indexes, triggers and id sequence kept")
+
+    app.report_type_var.set("Top Sellers")
+    headless.set_entry(app.from_date_entry, "2024-01-01")
+    headless.set_entry(app.to_date_entry, "2024-12-31")
+    app.view_report()
+    assert not headless.messagebox.errors()
+    assert "1\tParacetamol 500\t10\t$4.99" in app.report_text.get(1.0, 'end')
+    with archive.attached(app.conn, app.db_path, "2024-01-01", "2024-12-31") as schemas:
+        assert migrations.user_version(app.cursor, schemas[0]) == migrations.SCHEMA_VERSION
+        assert app.cursor.execute(f"SELECT total FROM {schemas[0]}.sales").fetchall() == [(499,)]
+    print("✓ Archives converted too")
+    app.conn.close()
+
+# Tables as created by the first release, before any migration existed
+BASELINE_SCHEMA = """
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        role TEXT NOT NULL
+    );
+    CREATE TABLE medicines (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        batch TEXT,
+        expiry DATE NOT NULL,
+        stock_packs INTEGER NOT NULL,
+        units_per_pack INTEGER NOT NULL,
+        pack_price REAL NOT NULL,
+        unit_price REAL NOT NULL,
+        supplier TEXT NOT NULL
+    );
+    CREATE TABLE sales (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date DATETIME NOT NULL,
+        medicine_id INTEGER NOT NULL,
+        qty INTEGER NOT NULL,
+        type TEXT NOT NULL,
+        price REAL NOT NULL,
+        total REAL NOT NULL,
+        user_id INTEGER NOT NULL,
+        FOREIGN KEY (medicine_id) REFERENCES medicines (id),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    );
+    CREATE TABLE returns (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sale_id INTEGER NOT NULL,
+        medicine_id INTEGER NOT NULL,
+        return_date DATETIME NOT NULL,
+        return_qty INTEGER NOT NULL,
+        return_type TEXT NOT NULL,
+        reason TEXT,
+        refunded_amount REAL NOT NULL,
+        FOREIGN KEY (sale_id) REFERENCES sales (id),
+        FOREIGN KEY (medicine_id) REFERENCES medicines (id)
+    );
+    CREATE TABLE settings (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        pharmacy_name TEXT NOT NULL DEFAULT 'My Pharmacy',
+        pharmacy_address TEXT NOT NULL DEFAULT '123 Main Street, City',
+        pharmacy_phone TEXT NOT NULL DEFAULT 'Phone: 123456',
+        receipt_header TEXT NOT NULL DEFAULT 'Thank you for visiting!',
+        receipt_footer TEXT NOT NULL DEFAULT 'No refunds after 7 days of purchase'
+    );
+"""
+
+def test_baseline_upgrade():
+    """Test that a first-release database gets its rollups in cents, not seeded from dollar totals"""
+    db_path = headless.temp_path()
+    conn = sqlite3.connect(db_path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute("INSERT INTO users (username, password, role) VALUES ('admin', 'admin123', 'Admin')")
+    conn.execute("""
+        INSERT INTO medicines (name, batch, expiry, stock_packs, units_per_pack, pack_price, unit_price, supplier)
+        VALUES ('Paracetamol 500', 'B1', '2030-01-01', 100, 10, 9.98, 1.0, 'Acme')
+    """)
+    conn.executemany("""
+        INSERT INTO sales (date, medicine_id, qty, type, price, total, user_id)
+        VALUES (?, 1, 1, 'Pack', 9.98, 9.98, 1)
+    """, [("2026-03-01 10:00:00",), ("2026-03-02 10:00:00",)])
+    conn.commit()
+    conn.close()
+
+    app = headless.create_app(db_path)
+    assert app.cursor.execute("SELECT SUM(amount), typeof(SUM(amount)) FROM sales_by_medicine_day").fetchone() == (
+        1996, 'integer')
+    assert app.cursor.execute("SELECT SUM(amount) FROM sales_by_hour").fetchone() == (1996,)
+    app.report_type_var.set("Top Sellers")
+    headless.set_entry(app.from_date_entry, "2026-03-01")
+    headless.set_entry(app.to_date_entry, "2026-03-31")
+    app.view_report()
+    assert not headless.messagebox.errors()
+    assert "1\tParacetamol 500\t20\t$19.96" in app.report_text.get(1.0, 'end')
+    print("✓ First-release database upgraded with rollups in cents")
+    app.conn.close()
+
+if __name__ == "__main__":
+    test_parse_and_format()
+    test_exact_sums()
+    test_migration()
+    test_baseline_upgrade()
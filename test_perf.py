@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the timing instrumentation layer.
+"""
+
+import time
+
+import perf
+
+def test_disabled_records_nothing():
+    """Test that nothing is recorded while instrumentation is disabled"""
+    perf.disable()
+    perf.reset()
+
+    @perf.timed("test.disabled")
+    def work():
+        return 42
+
+    assert work() == 42
+    with perf.timer("test.disabled_block"):
+        pass
+    assert perf.snapshot(prefix="test.") == []
+    print("✓ Disabled instrumentation records nothing")
+
+def test_percentiles():
+    """Test that timings are recorded with sensible percentiles"""
+    perf.enable()
+    perf.reset()
+    try:
+        for ms in range(1, 101):
+            perf.record("test.synthetic", ms / 1000.0)
+
+        @perf.timed("test.sleep")
+        def nap():
+            time.sleep(0.002)
+
+        nap()
+        with perf.timer("test.block"):
+            time.sleep(0.001)
+
+        stats = {row['name']: row for row in perf.snapshot(prefix="test.")}
+        synthetic = stats["test.synthetic"]
+        assert synthetic['count'] == 100
+        # Log buckets are ~9% wide, so percentiles are within that tolerance
+        assert abs(synthetic['p50'] - 0.050) <= 0.050 * 0.1
+        assert abs(synthetic['p95'] - 0.095) <= 0.095 * 0.1
+        assert abs(synthetic['p99'] - 0.099) <= 0.099 * 0.1
+        assert synthetic['max'] == 0.1
+        assert stats["test.sleep"]['count'] == 1
+        assert stats["test.block"]['count'] == 1
+        print("✓ Percentiles are within histogram resolution")
+        print(perf.format_report(perf.snapshot(prefix="test.")))
+    finally:
+        perf.disable()
+        perf.reset()
+
+if __name__ == "__main__":
+    test_disabled_records_nothing()
+    test_percentiles()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the read-only reader connections used by reports and searches.
+"""
+
+import sqlite3
+
+import headless
+import readers
+
+def make_app():
+    """App in WAL mode with one medicine and one sale on 2024-01-10"""
+    app = headless.create_temp_app()
+    app.cursor.execute("""
+        INSERT INTO medicines (name, batch, expiry, stock_packs, units_per_pack, pack_price, unit_price, supplier)
+        VALUES ('Paracetamol 500', 'B1', '2030-01-01', 100, 10, 500, 50, 'Acme')
+    """)
+    app.cursor.execute("""
+        INSERT INTO sales (date, medicine_id, qty, type, price, total, user_id, invoice_no)
+        VALUES ('2024-01-10 10:00:00', 1, 1, 'Pack', 500, 500, 1, NULL)
+    """)
+    app.conn.commit()
+    return app
+
+def daily_sales(app):
+    app.report_type_var.set("Daily Sales")
+    headless.set_entry(app.from_date_entry, "2024-01-01")
+    headless.set_entry(app.to_date_entry, "2024-01-31")
+    app.view_report()
+    assert not headless.messagebox.errors()
+    return app.report_text.get(1.0, 'end')
+
+def test_read_only():
+    """Test that the database is in WAL mode and readers cannot write"""
+    app = make_app()
+    assert app.cursor.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    with app.readers.reader() as conn:
+        try:
+            conn.execute("DELETE FROM sales")
+            assert False
+        except sqlite3.OperationalError as e:
+            assert "readonly" in str(e)
+    with app.readers.reader() as first, app.readers.reader() as second:
+        assert first is not second
+    with app.readers.reader() as conn:
+        assert conn in (first, second)
+    print("✓ Read-only connections reused from the pool")
+    app.readers.close()
+    app.conn.close()
+
+def test_snapshot():
+    """Test that a snapshot keeps reading one state while the writer commits"""
+    app = make_app()
+    with app.readers.reader() as conn, readers.snapshot(conn):
+        assert conn.execute("SELECT COUNT(*) FROM sales").fetchone() == (1,)
+        app.cart_items = [{'id': 1, 'name': 'Paracetamol 500', 'type': 'Pack', 'quantity': 1,
+                           'price': 500, 'total': 500}]
+        app.checkout()
+        assert not headless.messagebox.errors()
+        assert conn.execute("SELECT COUNT(*) FROM sales").fetchone() == (1,)
+    with app.readers.reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sales").fetchone() == (2,)
+    print("✓ Checkout commits while a reader holds its snapshot")
+
+    # A report run while the writer has work pending commits it first, so the cache stays right
+    app.cursor.execute("""
+        INSERT INTO sales (date, medicine_id, qty, type, price, total, user_id, invoice_no)
+        VALUES ('2024-01-11 10:00:00', 1, 1, 'Pack', 500, 500, 1, NULL)
+    """)
+    assert "2024-01-11\t$5.00" in daily_sales(app)
+    assert "TOTAL:\t\t$10.00" in daily_sales(app)
+    print("✓ Reports read committed data")
+    app.readers.close()
+    app.conn.close()
+
+def test_searches():
+    """Test that the returns search and paging read on reader connections"""
+    app = make_app()
+    headless.set_entry(app.return_search_entry, "Paracetamol")
+    app.search_sales_for_return()
+    assert [sale.name for sale in app.sales_page] == ["Paracetamol 500"]
+    assert app.sales_page[0].total_text == "$5.00"
+    print("✓ Returns search served by a reader")
+    app.readers.close()
+    app.conn.close()
+
+if __name__ == "__main__":
+    test_read_only()
+    test_snapshot()
+    test_searches()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the row objects returned to the UI.
+"""
+
+import headless
+import records
+
+def test_medicine_rows():
+    """Test that medicine rows carry their derived fields and no per-object dict"""
+    app = headless.create_temp_app()
+    app.cursor.executemany("""
+        INSERT INTO medicines (name, batch, expiry, stock_packs, units_per_pack, pack_price, unit_price, supplier)
+        VALUES (?, ?, '2030-01-01', 12, 10, 1250, 125, 'Acme')
+    """, [("Paracetamol 500", "B1"), ("Ibuprofen 200", None)])
+    medicines = records.fetch(app.cursor, records.Medicine,
+                              f"SELECT {records.Medicine.COLUMNS} FROM medicines ORDER BY name")
+    ibuprofen = medicines[0]
+    assert (ibuprofen.name, ibuprofen.total_units, ibuprofen.batch_display) == ("Ibuprofen 200", 120, "N/A")
+    assert (ibuprofen.pack_price_text, ibuprofen.unit_price_text) == ("$12.50", "$1.25")
+    assert not hasattr(ibuprofen, '__dict__')
+    # The cursor goes back to plain tuples afterwards
+    assert app.cursor.execute("SELECT name FROM medicines WHERE id = 1").fetchone() == ("Paracetamol 500",)
+    print("✓ Medicine rows built by the row factory")
+
+    app.load_medicines()
+    values = [app.medicines_tree.item(iid)['values'] for iid in app.medicines_tree.get_children()]
+    assert values[0] == [2, "Ibuprofen 200", "N/A", "2030-01-01", 12, 120, "$12.50", "$1.25"], values
+    assert values[1][:3] == [1, "Paracetamol 500", "B1"]
+    print("✓ Medicines tree filled from the rows")
+    app.conn.close()
+
+def test_user_and_settings():
+    """Test the logged-in user and the receipt settings"""
+    app = headless.create_temp_app()
+    user = app.current_user
+    assert (user.username, user.role, user.is_admin) == ("admin", "Admin", True)
+    assert not hasattr(user, 'password')
+    assert app.status_label.cget('text') == "Logged in as: admin (Admin)"
+    settings = records.fetchone(app.cursor, records.Settings,
+                                f"SELECT {records.Settings.COLUMNS} FROM settings WHERE id = 1")
+    assert settings.pharmacy_name == "My Pharmacy" and settings.receipt_footer.startswith("No refunds")
+    assert records.fetchone(app.cursor, records.User, "SELECT id, username, role FROM users WHERE id = 99") is None
+    print("✓ User and settings rows")
+    app.conn.close()
+
+if __name__ == "__main__":
+    test_medicine_rows()
+    test_user_and_settings()
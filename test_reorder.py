@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test script to verify demand tracking and reorder suggestions.
+"""
+
+from datetime import date, timedelta
+
+import batches
+import headless
+import reorder
+
+def make_app():
+    """App with a fast mover (low cover), a slow mover and an unsold medicine"""
+    app = headless.create_temp_app()
+    ids = {}
+    for name, supplier, units in (("Paracetamol 500", "Acme", 100), ("Vitamin C", "Acme", 100), ("Zinc", "Beta", 10)):
+        app.cursor.execute("""
+            INSERT INTO medicines (name, batch, expiry, stock_packs, units_per_pack, pack_price, unit_price, supplier)
+            VALUES (?, 'B1', '2030-01-01', 0, 10, 500, 50, ?)
+        """, (name, supplier))
+        ids[name] = app.cursor.lastrowid
+        batches.receive(app.cursor, ids[name], "B1", "2030-01-01", units)
+    batches.sync_medicines(app.cursor, ids.values())
+    app.conn.commit()
+    return app, ids
+
+def checkout(app, lines):
+    app.cart_items = [{'id': medicine_id, 'name': '', 'type': 'Unit', 'quantity': qty, 'price': 50, 'total': qty * 50}
+                      for medicine_id, qty in lines]
+    app.checkout()
+    assert not headless.messagebox.errors()
+
+def test_incremental_rate_matches_rebuild():
+    """Test that checkout/return updates give the same rates as a rebuild from history"""
+    app, ids = make_app()
+    checkout(app, [(ids["Paracetamol 500"], 40), (ids["Vitamin C"], 2)])
+    checkout(app, [(ids["Paracetamol 500"], 20)])
+    rate = app.cursor.execute("SELECT rate, on_hand FROM medicine_demand WHERE medicine_id = ?",
+                              (ids["Paracetamol 500"],)).fetchone()
+    assert abs(rate[0] - 60 * (1 - reorder.DECAY)) < 1e-9 and rate[1] == 40
+    print("✓ Checkout adds to the demand rate and on-hand follows the batches")
+
+    # Return 10 units of the first sale
+    sale_id = app.cursor.execute("SELECT MIN(id) FROM sales").fetchone()[0]
+    app.sales_tree.insert('', 'end', iid=str(sale_id), values=(sale_id, '', 'Paracetamol 500', 40, 'Unit', '', ''))
+    app.sales_tree.selection_set(str(sale_id))
+    headless.set_entry(app.return_qty_entry, "10")
+    app.process_return()
+    assert not headless.messagebox.errors()
+    maintained = dict(app.cursor.execute("SELECT medicine_id, rate FROM medicine_demand").fetchall())
+    on_hand = app.cursor.execute("SELECT on_hand FROM medicine_demand WHERE medicine_id = ?",
+                                 (ids["Paracetamol 500"],)).fetchone()[0]
+    assert on_hand == 50
+    reorder.rebuild(app.cursor)
+    rebuilt = dict(app.cursor.execute("SELECT medicine_id, rate FROM medicine_demand").fetchall())
+    assert maintained.keys() == rebuilt.keys()
+    assert all(abs(maintained[key] - rebuilt[key]) < 1e-9 for key in rebuilt), (maintained, rebuilt)
+    print("✓ Incremental rates match a rebuild from sales and returns")
+    app.conn.close()
+
+def test_rate_decays():
+    """Test exponential decay with the two week half-life"""
+    app, ids = make_app()
+    today = date(2026, 3, 1)
+    reorder.record(app.cursor, [(ids["Zinc"], 10)], today=today)
+    reorder.record(app.cursor, [(ids["Zinc"], 10)], today=today + timedelta(days=reorder.HALF_LIFE_DAYS))
+    rate = app.cursor.execute("SELECT rate FROM medicine_demand WHERE medicine_id = ?", (ids["Zinc"],)).fetchone()[0]
+    assert abs(rate - 15 * (1 - reorder.DECAY)) < 1e-9
+    print("✓ Older demand counts half after one half-life")
+    app.conn.close()
+
+def test_suggestions():
+    """Test days of cover, reorder quantities and the report"""
+    app, ids = make_app()
+    today = date.today()
+    # 20 units/day for the fast mover: 100 units is 5 days of cover
+    reorder.record(app.cursor, [(ids["Paracetamol 500"], 20 / (1 - reorder.DECAY)),
+                                (ids["Vitamin C"], 1 / (1 - reorder.DECAY)),
+                                (ids["Zinc"], 1 / (1 - reorder.DECAY))], today=today)
+    suggestions = reorder.suggestions(app.cursor, today)
+    assert [item['name'] for item in suggestions] == ["Paracetamol 500", "Zinc"], suggestions
+    fast = suggestions[0]
+    assert round(fast['cover_days'], 6) == 5 and fast['packs'] == 50  # (20 * 30 - 100) / 10
+    assert reorder.due_count(app.cursor, today) == 2
+    print("✓ Fast mover and low-stock slow mover suggested, well-covered slow mover not")
+
+    # Expired stock does not count as cover
+    batches.receive(app.cursor, ids["Vitamin C"], "OLD", (today - timedelta(days=1)).isoformat(), 500)
+    assert reorder.due_count(app.cursor, today) == 2
+    batches.receive(app.cursor, ids["Paracetamol 500"], "OLD", (today - timedelta(days=1)).isoformat(), 500)
+    assert reorder.suggestions(app.cursor, today)[0]['on_hand'] == 100
+    print("✓ Expired stock ignored")
+
+    # The dashboard reads committed data
+    app.conn.commit()
+    app.refresh_dashboard()
+    assert app.low_stock_label.cget('text') == "2"
+    app.report_type_var.set("Reorder Suggestions")
+    headless.set_entry(app.from_date_entry, today.isoformat())
+    headless.set_entry(app.to_date_entry, today.isoformat())
+    app.view_report()
+    report = app.report_text.get(1.0, 'end')
+    assert "Acme" in report and "Beta" in report and "TOTAL: 2 medicines" in report, report
+    print("✓ Dashboard count and Reorder Suggestions report")
+    app.conn.close()
+
+if __name__ == "__main__":
+    test_incremental_rate_matches_rebuild()
+    test_rate_decays()
+    test_suggestions()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the report cache and its change-counter watermark.
+"""
+
+from datetime import date
+
+import headless
+import report_cache
+
+def make_app():
+    """App with a sale on the 15th of every month of 2024, counting report builds"""
+    app = headless.create_temp_app()
+    app.cursor.execute("""
+        INSERT INTO medicines (name, batch, expiry, stock_packs, units_per_pack, pack_price, unit_price, supplier)
+        VALUES ('Paracetamol 500', 'B1', '2030-01-01', 100, 10, 500, 50, 'Acme')
+    """)
+    app.cursor.executemany("""
+        INSERT INTO sales (date, medicine_id, qty, type, price, total, user_id, invoice_no)
+        VALUES (?, 1, 2, 'Pack', 500, 1000, 1, NULL)
+    """, [(f"2024-{month:02d}-15 10:00:00",) for month in range(1, 13)])
+    app.conn.commit()
+
+    app.builds = []
+    generate = app.generate_report_text
+    def counting(cursor, report_type, from_date, to_date):
+        app.builds.append(report_type)
+        return generate(cursor, report_type, from_date, to_date)
+    app.generate_report_text = counting
+    return app
+
+def view(app, report_type, from_date="2024-01-01", to_date="2024-12-31"):
+    app.report_type_var.set(report_type)
+    headless.set_entry(app.from_date_entry, from_date)
+    headless.set_entry(app.to_date_entry, to_date)
+    builds = len(app.builds)
+    app.view_report()
+    assert not headless.messagebox.errors()
+    return app.report_text.get(1.0, 'end'), len(app.builds) > builds
+
+def checkout(app, qty=1):
+    app.cart_items = [{'id': 1, 'name': 'Paracetamol 500', 'type': 'Pack', 'quantity': qty, 'price': 500, 'total': 500 * qty}]
+    app.checkout()
+    assert not headless.messagebox.errors()
+
+def test_cached_until_range_changes():
+    """Test that a report is rebuilt only when rows in its months change"""
+    app = make_app()
+    this_month = date.today().strftime("%Y-%m-01")
+    today = date.today().isoformat()
+    report, built = view(app, "Monthly Sales")
+    assert built and "TOTAL:\t\t$120.00" in report
+    assert view(app, "Monthly Sales") == (report, False)
+    view(app, "Daily Sales", this_month, today)
+    print("✓ Repeated report served from the cache")
+
+    # Today's sale leaves 2024 cached and rebuilds the current month
+    checkout(app)
+    assert view(app, "Monthly Sales") == (report, False)
+    current, built = view(app, "Daily Sales", this_month, today)
+    assert built and "TOTAL:\t\t$5.00" in current
+    print("✓ New sales invalidate only the months they fall in")
+
+    # A backdated correction in 2024 rebuilds it
+    app.cursor.execute("UPDATE sales SET total = 2000 WHERE date LIKE '2024-03-%'")
+    app.conn.commit()
+    report, built = view(app, "Monthly Sales")
+    assert built and "TOTAL:\t\t$130.00" in report
+    print("✓ Edits in a closed period rebuild it")
+    app.conn.close()
+
+def test_returns_and_stock():
+    """Test the returns, stock and date-dependent reports"""
+    app = make_app()
+    checkout(app, qty=3)
+    this_month = date.today().strftime("%Y-%m-01")
+    today = date.today().isoformat()
+    view(app, "Daily Sales", this_month, today)
+    view(app, "Returns Report", this_month, today)
+    view(app, "Stock Summary")
+    view(app, "Expired Medicines")
+
+    sale_id = app.cursor.execute("SELECT MAX(id) FROM sales").fetchone()[0]
+    app.sales_tree.insert('', 'end', iid=str(sale_id), values=(sale_id,))
+    app.sales_tree.selection_set(str(sale_id))
+    headless.set_entry(app.return_qty_entry, "1")
+    app.process_return()
+    assert not headless.messagebox.errors()
+    # The returned quantity on the sale line does not change the sales report
+    assert not view(app, "Daily Sales", this_month, today)[1]
+    report, built = view(app, "Returns Report", this_month, today)
+    assert built and "TOTAL REFUNDED:\t\t\t\t\t$5.00" in report
+    assert view(app, "Stock Summary")[1] and view(app, "Expired Medicines")[1]
+    assert not view(app, "Stock Summary")[1]
+    print("✓ A return rebuilds the returns and stock reports, not sales")
+
+    # Stock moves do not touch the returns report; a rename does
+    app.cursor.execute("UPDATE medicines SET stock_packs = 50 WHERE id = 1")
+    assert not view(app, "Returns Report", this_month, today)[1]
+    app.cursor.execute("UPDATE medicines SET name = 'Paracetamol 500mg' WHERE id = 1")
+    report, built = view(app, "Returns Report", this_month, today)
+    assert built and "Paracetamol 500" in report
+    print("✓ Returns report follows medicine names only")
+    app.conn.close()
+
+def test_cache_limit():
+    """Test that the least recently used reports are dropped"""
+    app = make_app()
+    limit, report_cache.CACHE_LIMIT = report_cache.CACHE_LIMIT, 3
+    try:
+        for month in range(1, 6):
+            view(app, "Daily Sales", f"2024-{month:02d}-01", f"2024-{month:02d}-28")
+        view(app, "Daily Sales", "2024-04-01", "2024-04-28")
+        view(app, "Daily Sales", "2024-06-01", "2024-06-28")
+    finally:
+        report_cache.CACHE_LIMIT = limit
+    cached = [row[0] for row in app.cursor.execute("SELECT from_date FROM report_cache ORDER BY from_date")]
+    assert cached == ["2024-04-01", "2024-05-01", "2024-06-01"], cached
+    print("✓ Cache limited to the most recently used reports")
+    app.conn.close()
+
+if __name__ == "__main__":
+    test_cached_until_range_changes()
+    test_returns_and_stock()
+    test_cache_limit()
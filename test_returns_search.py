@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Test script to verify invoice lookup, keyset paging, returnable quantities and
+multi-line returns on the returns tab.
+"""
+
+import sqlite3
+from datetime import datetime, timedelta
+
+import headless
+
+def make_app(sales=120):
+    """App with two medicines and a sale every hour, alternating between them"""
+    app = headless.create_temp_app()
+    for name in ("Paracetamol 500", "Ibuprofen 200"):
+        app.cursor.execute("""
+            INSERT INTO medicines (name, batch, expiry, stock_packs, units_per_pack, pack_price, unit_price, supplier)
+            VALUES (?, 'B1', '2030-01-01', 100, 10, 500, 50, 'Acme')
+        """, (name,))
+    start = datetime(2026, 1, 1, 9)
+    app.cursor.executemany("""
+        INSERT INTO sales (date, medicine_id, qty, type, price, total, user_id, invoice_no)
+        VALUES (?, ?, 1, 'Pack', 500, 500, 1, ?)
+    """, [(str(start + timedelta(hours=i)), i % 2 + 1, i + 1) for i in range(sales)])
+    app.conn.commit()
+    return app
+
+def shown_ids(app):
+    return [app.sales_tree.item(iid)['values'][0] for iid in app.sales_tree.get_children()]
+
+def test_invoice_lookup():
+    """Test that a checkout shares one invoice number and numeric terms are exact"""
+    app = make_app(sales=3)
+    app.cart_items = [
+        {'id': 1, 'name': 'Paracetamol 500', 'type': 'Pack', 'quantity': 1, 'price': 500, 'total': 500},
+        {'id': 2, 'name': 'Ibuprofen 200', 'type': 'Pack', 'quantity': 2, 'price': 500, 'total': 1000},
+    ]
+    app.checkout()
+    assert not headless.messagebox.errors()
+    lines = app.cursor.execute("SELECT id, invoice_no FROM sales WHERE id > 3").fetchall()
+    assert lines == [(4, 4), (5, 4)], lines
+
+    headless.set_entry(app.return_search_entry, "4")
+    app.search_sales_for_return()
+    assert sorted(shown_ids(app)) == [4, 5]
+    headless.set_entry(app.return_search_entry, "5")
+    app.search_sales_for_return()
+    assert shown_ids(app) == [5]
+    # "500" is a number, not a substring of "Paracetamol 500"
+    headless.set_entry(app.return_search_entry, "500")
+    app.search_sales_for_return()
+    assert shown_ids(app) == []
+    print("✓ Invoice and sale numbers are exact lookups")
+    app.conn.close()
+
+def test_keyset_paging():
+    """Test Older/Newer pages over (date, id), with and without a name filter"""
+    app = make_app()
+    page = app.SALES_PAGE_SIZE
+    headless.set_entry(app.return_search_entry, "")
+    app.search_sales_for_return()
+    assert shown_ids(app) == list(range(120, 120 - page, -1))
+    app.page_sales(older=True)
+    assert shown_ids(app) == list(range(120 - page, 120 - 2 * page, -1))
+    app.page_sales(older=True)
+    assert shown_ids(app) == list(range(120 - 2 * page, 0, -1))
+    app.page_sales(older=True)
+    assert shown_ids(app) == list(range(120 - 2 * page, 0, -1))
+    app.page_sales(older=False)
+    assert shown_ids(app) == list(range(120 - page, 120 - 2 * page, -1))
+    print("✓ Older/Newer pages follow the (date, id) key")
+
+    headless.set_entry(app.return_search_entry, "ibupro")
+    app.search_sales_for_return()
+    assert shown_ids(app) == list(range(120, 120 - 2 * page, -2))
+    app.page_sales(older=True)
+    assert shown_ids(app) == list(range(120 - 2 * page, 0, -2))
+    print("✓ Paging keeps the medicine filter")
+    app.conn.close()
+
+def return_line(app, sale_id, qty):
+    headless.set_entry(app.return_search_entry, str(sale_id))
+    app.search_sales_for_return()
+    app.sales_tree.selection_set(app.sales_tree.get_children()[0])
+    headless.set_entry(app.return_qty_entry, str(qty))
+    app.process_return()
+    errors = headless.messagebox.errors()
+    headless.messagebox.clear()
+    return errors
+
+def test_over_return_blocked():
+    """Test that repeated partial returns cannot exceed the quantity sold"""
+    app = make_app(sales=1)
+    app.cart_items = [{'id': 1, 'name': 'Paracetamol 500', 'type': 'Pack', 'quantity': 3, 'price': 500, 'total': 1500}]
+    app.checkout()
+    sale_id = app.cursor.execute("SELECT MAX(id) FROM sales").fetchone()[0]
+
+    assert return_line(app, sale_id, 2) == []
+    assert app.sales_tree.item(app.sales_tree.get_children()[0])['values'][8] == 1
+    errors = return_line(app, sale_id, 2)
+    assert errors and "returnable quantity (1 of 3 sold)" in errors[0], errors
+    assert return_line(app, sale_id, 1) == []
+    assert app.cursor.execute("SELECT returned_qty FROM sales WHERE id = ?", (sale_id,)).fetchone()[0] == 3
+    assert app.cursor.execute("SELECT SUM(return_qty) FROM returns WHERE sale_id = ?", (sale_id,)).fetchone()[0] == 3
+    print("✓ Partial returns tracked, over-return rejected")
+
+    app.conn.close()
+
+def test_multi_line_and_invoice_return():
+    """Test returning several selected lines and a whole invoice in one transaction"""
+    app = make_app(sales=1)
+    app.cart_items = [
+        {'id': 1, 'name': 'Paracetamol 500', 'type': 'Pack', 'quantity': 3, 'price': 500, 'total': 1500},
+        {'id': 2, 'name': 'Ibuprofen 200', 'type': 'Unit', 'quantity': 4, 'price': 50, 'total': 200},
+    ]
+    app.checkout()
+    headless.set_entry(app.return_search_entry, "2")
+    app.search_sales_for_return()
+    app.sales_tree.selection_set(*app.sales_tree.get_children())
+
+    # One quantity for every selected line
+    headless.set_entry(app.return_qty_entry, "1")
+    app.process_return()
+    assert not headless.messagebox.errors()
+    assert app.cursor.execute("SELECT returned_qty FROM sales WHERE id > 1 ORDER BY id").fetchall() == [(1,), (1,)]
+    assert app.cursor.execute("SELECT COUNT(*) FROM returns").fetchone()[0] == 2
+    print("✓ Selected lines returned together")
+
+    # A line that cannot take the quantity rolls back the whole batch
+    app.sales_tree.selection_set(*app.sales_tree.get_children())
+    headless.set_entry(app.return_qty_entry, "3")
+    app.process_return()
+    errors = headless.messagebox.errors()
+    headless.messagebox.clear()
+    assert errors and "returnable quantity (2 of 3 sold)" in errors[0], errors
+    assert app.cursor.execute("SELECT COUNT(*) FROM returns").fetchone()[0] == 2
+    print("✓ Over-return on one line rejects them all")
+
+    # Whole invoice: everything still returnable, one receipt
+    app.sales_tree.selection_set(app.sales_tree.get_children()[0])
+    app.return_invoice()
+    assert not headless.messagebox.errors()
+    assert app.cursor.execute("SELECT SUM(qty - returned_qty) FROM sales WHERE invoice_no = 2").fetchone()[0] == 0
+    assert app.cursor.execute("SELECT stock_packs FROM medicines ORDER BY id").fetchall() == [(100,), (100,)]
+    assert app.cursor.execute("SELECT SUM(refunded_amount) FROM returns").fetchone()[0] == 1700
+    app.sales_tree.selection_set(app.sales_tree.get_children()[0])
+    app.return_invoice()
+    errors = headless.messagebox.errors()
+    headless.messagebox.clear()
+    assert errors and "already been returned" in errors[0], errors
+    print("✓ Whole invoice returned, stock and refunds restored")
+    app.conn.close()
+
+def test_invoice_column_migration():
+    """Test that an older sales table gets invoice numbers and returned quantities"""
+    db_path = headless.temp_path()
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE sales (id INTEGER PRIMARY KEY AUTOINCREMENT, date DATETIME NOT NULL, medicine_id INTEGER NOT NULL,
+                            qty INTEGER NOT NULL, type TEXT NOT NULL, price REAL NOT NULL, total REAL NOT NULL,
+                            user_id INTEGER NOT NULL)
+    """)
+    conn.execute("""
+        CREATE TABLE returns (id INTEGER PRIMARY KEY AUTOINCREMENT, sale_id INTEGER NOT NULL, medicine_id INTEGER NOT NULL,
+                              return_date DATETIME NOT NULL, return_qty INTEGER NOT NULL, return_type TEXT NOT NULL,
+                              reason TEXT, refunded_amount REAL NOT NULL)
+    """)
+    conn.executemany("INSERT INTO sales (date, medicine_id, qty, type, price, total, user_id) VALUES (?, 1, 3, 'Pack', 1, 3, 1)",
+                     [("2025-01-01 10:00:00",), ("2025-01-02 10:00:00",)])
+    conn.executemany("INSERT INTO returns (sale_id, medicine_id, return_date, return_qty, return_type, refunded_amount) "
+                     "VALUES (2, 1, '2025-01-03', ?, 'Pack', 1)", [(1,), (1,)])
+    conn.commit()
+    conn.close()
+    app = headless.create_app(db_path)
+    assert app.cursor.execute("SELECT id, invoice_no, returned_qty FROM sales").fetchall() == [(1, 1, 0), (2, 2, 2)]
+    print("✓ Existing sales migrated")
+    app.conn.close()
+
+if __name__ == "__main__":
+    test_invoice_lookup()
+    test_keyset_paging()
+    test_over_return_blocked()
+    test_multi_line_and_invoice_return()
+    test_invoice_column_migration()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the sales rollups and the product and traffic reports.
+"""
+
+import sqlite3
+from datetime import date
+
+import archive
+import headless
+import migrations
+import rollup
+
+def make_app():
+    """App with four medicines, three of them sold on the 10th of every month of 2024"""
+    app = headless.create_temp_app()
+    for name, stock in (("Paracetamol 500", 100), ("Ibuprofen 200", 100), ("Vitamin C", 100), ("Zinc 50", 40)):
+        app.cursor.execute("""
+            INSERT INTO medicines (name, batch, expiry, stock_packs, units_per_pack, pack_price, unit_price, supplier)
+            VALUES (?, 'B1', '2030-01-01', ?, 10, 500, 50, 'Acme')
+        """, (name, stock))
+    rows = []
+    for month in range(1, 13):
+        day = f"2024-{month:02d}-10 10:00:00"
+        # Paracetamol 2 packs ($80), Ibuprofen 3 units ($15), Vitamin C 1 unit ($5)
+        rows += [(day, 1, 2, 'Pack', 8000), (day, 2, 3, 'Unit', 1500), (day, 3, 1, 'Unit', 500)]
+    app.cursor.executemany("""
+        INSERT INTO sales (date, medicine_id, qty, type, price, total, user_id, invoice_no)
+        VALUES (?, ?, ?, ?, 500, ?, 1, NULL)
+    """, rows)
+    app.conn.commit()
+    return app
+
+def rollup_rows(cursor):
+    return cursor.execute("SELECT * FROM sales_by_medicine_day ORDER BY day, medicine_id").fetchall()
+
+def view(app, report_type, from_date="2024-01-01", to_date="2024-03-31"):
+    app.report_type_var.set(report_type)
+    headless.set_entry(app.from_date_entry, from_date)
+    headless.set_entry(app.to_date_entry, to_date)
+    app.view_report()
+    assert not headless.messagebox.errors()
+    return app.report_text.get(1.0, 'end')
+
+def test_triggers_match_rebuild():
+    """Test that the triggers keep the rollup equal to a rebuild from sales"""
+    app = make_app()
+    assert rollup_rows(app.cursor)[0] == ("2024-01-10", 1, 20, 8000, 1)
+    app.cursor.execute("INSERT INTO sales (date, medicine_id, qty, type, price, total, user_id) "
+                       "VALUES ('2024-01-10 18:00:00', 1, 1, 'Unit', 500, 500, 1)")
+    app.cursor.execute("UPDATE sales SET date = '2024-02-11 09:00:00', qty = 4, total = 2000 "
+                       "WHERE date = '2024-02-10 10:00:00' AND medicine_id = 2")
+    app.cursor.execute("UPDATE sales SET medicine_id = 4 WHERE date = '2024-03-10 10:00:00' AND medicine_id = 3")
+    app.cursor.execute("DELETE FROM sales WHERE date = '2024-04-10 10:00:00' AND medicine_id = 1")
+    maintained = rollup_rows(app.cursor)
+    assert ("2024-01-10", 1, 21, 8500, 2) in maintained and ("2024-02-11", 2, 4, 2000, 1) in maintained
+    assert not [row for row in maintained if row[0] == "2024-04-10" and row[1] == 1]
+    rollup.rebuild(app.cursor)
+    assert rollup_rows(app.cursor) == maintained
+    print("✓ Rollup maintained on insert, update and delete")
+
+    app.cart_items = [{'id': 2, 'name': 'Ibuprofen 200', 'type': 'Pack', 'quantity': 1, 'price': 500, 'total': 500}]
+    app.checkout()
+    assert not headless.messagebox.errors()
+    today = date.today().isoformat()
+    assert app.cursor.execute("SELECT units, amount FROM sales_by_medicine_day WHERE day = ?",
+                              (today,)).fetchall() == [(10, 500)]
+    print("✓ Checkout updates the rollup")
+    app.conn.close()
+
+def test_pack_size_change():
+    """Test that lines keep the units they were sold with after the pack size changes"""
+    app = make_app()
+    assert app.cursor.execute("SELECT units FROM sales WHERE medicine_id = 1 AND date LIKE '2024-01-10%'").fetchone() == (20,)
+    app.cursor.execute("UPDATE medicines SET units_per_pack = 12 WHERE id = 1")
+    app.cursor.execute("DELETE FROM sales WHERE date = '2024-01-10 10:00:00' AND medicine_id = 1")
+    app.cursor.execute("UPDATE sales SET total = 9000 WHERE date = '2024-02-10 10:00:00' AND medicine_id = 1")
+    app.cursor.execute("UPDATE sales SET qty = 1, total = 4000 WHERE date = '2024-03-10 10:00:00' AND medicine_id = 1")
+    maintained = rollup_rows(app.cursor)
+    assert not [row for row in maintained if row[0] == "2024-01-10" and row[1] == 1]
+    assert ("2024-02-10", 1, 20, 9000, 1) in maintained and ("2024-03-10", 1, 12, 4000, 1) in maintained
+    rollup.rebuild(app.cursor)
+    assert rollup_rows(app.cursor) == maintained
+    print("✓ Older Pack lines keep their units; an edited line takes the new pack size")
+    app.conn.close()
+
+def test_units_migration():
+    """Test that sale lines of older databases and archives get their units"""
+    app = make_app()
+    archive.archive(app.conn, app.db_path, today=date(2025, 9, 15))
+    db_path = app.db_path
+    app.conn.close()
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("ATTACH DATABASE ? AS old", (archive.archive_path(db_path, 2024),))
+    for event in ('insert', 'delete', 'update'):
+        conn.execute(f"DROP TRIGGER trg_sales_by_medicine_day_{event}")
+    for schema in ("main", "old"):
+        conn.execute(f"ALTER TABLE {schema}.sales DROP COLUMN units")
+        conn.execute(f"PRAGMA {schema}.user_version = 2")
+    conn.commit()
+    conn.execute("DETACH DATABASE old")
+    conn.close()
+
+    app = headless.create_app(db_path)
+    assert migrations.user_version(app.cursor) == migrations.SCHEMA_VERSION
+    with archive.attached(app.conn, app.db_path, "2024-01-01", "2024-12-31") as schemas:
+        assert app.cursor.execute(f"SELECT DISTINCT units FROM {schemas[0]}.sales "
+                                  "WHERE medicine_id = 1").fetchall() == [(20,)]
+    app.cursor.execute("INSERT INTO sales (date, medicine_id, qty, type, price, total, user_id) "
+                       "VALUES ('2025-10-01 09:00:00', 1, 1, 'Pack', 500, 500, 1)")
+    assert rollup_rows(app.cursor)[-1] == ("2025-10-01", 1, 10, 500, 1)
+    print("✓ Units added to older databases and archives")
+    app.conn.close()
+
+def test_product_reports():
+    """Test Top Sellers, Slow Movers and ABC Classification over a quarter"""
+    app = make_app()
+    report = view(app, "Top Sellers")
+    lines = [line for line in report.splitlines() if line[:1].isdigit()]
+    assert lines == ["1\tParacetamol 500\t60\t$240.00", "2\tIbuprofen 200\t9\t$45.00",
+                     "3\tVitamin C\t3\t$15.00"], lines
+    print("✓ Top Sellers ranked by sales amount")
+
+    report = view(app, "Slow Movers")
+    lines = report.splitlines()
+    first = next(i for i, line in enumerate(lines) if line.startswith("Zinc"))
+    assert lines[first] == "Zinc 50\t0\t\t$0.00\t\t400" and lines[first + 1].startswith("Vitamin C\t3"), lines
+    print("✓ Slow Movers lists unsold stock first")
+
+    # $240 of $300 is 80%: Paracetamol is A, Ibuprofen reaches 95% as B, Vitamin C is C
+    report = view(app, "ABC Classification")
+    assert "A\t1\t\t$240.00\t\t80.0%" in report and "B\t1\t\t$45.00\t\t15.0%" in report, report
+    assert "C\t1\t\t$15.00\t\t5.0%" in report
+    assert report.split("Class A Medicines")[1].count("\t$") == 1
+    print("✓ ABC classes by cumulative share of sales")
+    app.conn.close()
+
+def test_archived_rollup():
+    """Test that archiving moves the rollup rows and the reports read them back"""
+    app = make_app()
+    before = view(app, "Top Sellers", "2024-01-01", "2024-12-31")
+    archive.archive(app.conn, app.db_path, today=date(2026, 1, 15))
+    assert rollup_rows(app.cursor) == []
+    assert app.cursor.execute("SELECT COUNT(*) FROM sales_by_hour").fetchone()[0] == 0
+    app.cursor.execute("DELETE FROM report_cache")
+    app.conn.commit()
+    assert view(app, "Top Sellers", "2024-01-01", "2024-12-31") == before
+    print("✓ Archived rollup rows used by the product reports")
+
+    # An archive written before the rollup existed gets its rows on first use
+    path = archive.archive_path(app.db_path, 2024)
+    app.cursor.execute("ATTACH DATABASE ? AS old", (path,))
+    app.cursor.execute("DROP TABLE old.sales_by_medicine_day")
+    app.conn.commit()
+    app.cursor.execute("DETACH DATABASE old")
+    app.cursor.execute("DELETE FROM report_cache")
+    app.conn.commit()
+    assert view(app, "Top Sellers", "2024-01-01", "2024-12-31") == before
+    print("✓ Older archives backfilled")
+    app.conn.close()
+
+def test_hourly_traffic():
+    """Test the hourly rollup, the Traffic Heatmap report and the dashboard widget"""
+    app = make_app()
+    # A three-line invoice at 15:00 on Wednesday 2024-01-10, numbered the way checkout does it
+    app.cursor.execute("INSERT INTO sales (date, medicine_id, qty, type, price, total, user_id, invoice_no) "
+                       "VALUES ('2024-01-10 15:05:00', 1, 1, 'Unit', 500, 500, 1, NULL)")
+    invoice_no = app.cursor.lastrowid
+    app.cursor.execute("UPDATE sales SET invoice_no = ? WHERE id = ?", (invoice_no, invoice_no))
+    app.cursor.executemany("INSERT INTO sales (date, medicine_id, qty, type, price, total, user_id, invoice_no) "
+                           "VALUES ('2024-01-10 15:06:00', ?, 1, 'Unit', 500, 500, 1, ?)",
+                           [(2, invoice_no), (3, invoice_no)])
+    hours = app.cursor.execute("SELECT * FROM sales_by_hour WHERE day = '2024-01-10' ORDER BY hour").fetchall()
+    assert hours == [("2024-01-10", 10, 3, 3, 10000), ("2024-01-10", 15, 1, 3, 1500)], hours
+    rollup.rebuild(app.cursor)
+    assert app.cursor.execute("SELECT * FROM sales_by_hour WHERE day = '2024-01-10' ORDER BY hour").fetchall() == hours
+    app.conn.commit()
+    print("✓ Hourly rollup counts one transaction per invoice")
+
+    # January 2024 has five Wednesdays
+    report = view(app, "Traffic Heatmap", "2024-01-01", "2024-01-31")
+    assert "Wed  0.6  0.0  0.0  0.0  0.0  0.2" in report and "Thu  0.0" in report, report
+    assert "Throughput:\t2.0 transactions/hour" in report and "Busiest hour:\tWed 10:00" in report
+    print("✓ Traffic Heatmap averages transactions per weekday and hour")
+
+    app.cart_items = [{'id': 2, 'name': 'Ibuprofen 200', 'type': 'Unit', 'quantity': 1, 'price': 500, 'total': 500},
+                      {'id': 3, 'name': 'Vitamin C', 'type': 'Unit', 'quantity': 1, 'price': 500, 'total': 500}]
+    app.checkout()
+    assert not headless.messagebox.errors()
+    assert "█" in app.heatmap_label.cget('text')
+    assert app.throughput_label.cget('text').startswith("1.0 transactions/hour\nover 1 trading hours")
+    print("✓ Dashboard shows peak hours and throughput")
+    app.conn.close()
+
+if __name__ == "__main__":
+    test_triggers_match_rebuild()
+    test_pack_size_change()
+    test_units_migration()
+    test_product_reports()
+    test_archived_rollup()
+    test_hourly_traffic()
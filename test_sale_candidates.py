@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the ranked candidate picker on the sales tab.
+"""
+
+from datetime import datetime
+
+import headless
+
+def make_app():
+    app = headless.create_temp_app()
+    medicines = [
+        ("Co-Amoxiclav 625", 20),
+        ("Amoxicillin 250", 0),
+        ("Amoxicillin 500", 30),
+        ("Amoxil", 10),
+        ("Amoxicillin Syrup", 15),
+    ]
+    for name, stock in medicines:
+        app.cursor.execute("""
+            INSERT INTO medicines (name, batch, expiry, stock_packs, units_per_pack, pack_price, unit_price, supplier)
+            VALUES (?, '', '2030-01-01', ?, 10, 500, 50, 'Acme')
+        """, (name, stock))
+    # Amoxicillin Syrup sells faster than Amoxicillin 500
+    syrup_id = app.cursor.execute("SELECT id FROM medicines WHERE name = 'Amoxicillin Syrup'").fetchone()[0]
+    app.cursor.executemany("INSERT INTO sales (date, medicine_id, qty, type, price, total, user_id) VALUES (?, ?, 1, 'Pack', 500, 500, 1)",
+                           [(str(datetime.now()), syrup_id)] * 3)
+    app.conn.commit()
+    return app
+
+def test_ranking():
+    """Test exact > prefix > substring, then in-stock and velocity"""
+    app = make_app()
+    headless.set_entry(app.sales_search_entry, "amox")
+    app.search_medicine_for_sale()
+    names = [medicine.name for medicine in app.sale_candidates]
+    assert names == ["Amoxicillin Syrup", "Amoxicillin 500", "Amoxil", "Amoxicillin 250", "Co-Amoxiclav 625"], names
+    assert app.current_medicine.name == "Amoxicillin Syrup"
+    print("✓ Prefix matches ranked by stock and velocity before substring matches")
+
+    # Velocity follows the sales rollup, so deleted sales stop counting
+    app.cursor.execute("DELETE FROM sales")
+    app.conn.commit()
+    app.sale_search.reset()
+    app.search_medicine_for_sale()
+    assert [medicine.name for medicine in app.sale_candidates][:2] == ["Amoxicillin 500", "Amoxicillin Syrup"]
+    print("✓ Velocity read from the daily rollup")
+
+    headless.set_entry(app.sales_search_entry, "AMOXIL")
+    app.search_medicine_for_sale()
+    assert app.sale_candidates[0].name == "Amoxil"
+    print("✓ Exact match first")
+
+    app.SALE_CANDIDATE_LIMIT = 2
+    app.sale_search.limit = 2
+    headless.set_entry(app.sales_search_entry, "amo")
+    app.search_medicine_for_sale()
+    assert len(app.sale_candidates) == 2 and app.sale_search.last_truncated
+    print("✓ Candidates capped")
+    app.conn.close()
+
+def test_arrow_keys_add_to_cart():
+    """Test that Down then Enter adds the second candidate with quantity 1"""
+    app = make_app()
+    headless.set_entry(app.sales_search_entry, "amox")
+    app.on_sales_search_return()
+    app.move_sale_candidate(1)
+    app.move_sale_candidate(1)
+    app.move_sale_candidate(-1)
+    assert app.current_medicine.name == "Amoxicillin 500"
+    app.on_sales_search_return()
+    assert [(item['name'], item['quantity']) for item in app.cart_items] == [("Amoxicillin 500", 1)]
+    assert not app.sale_candidates and app.current_medicine is None
+    assert not headless.messagebox.errors()
+    print("✓ Arrow selection added to cart")
+    app.conn.close()
+
+if __name__ == "__main__":
+    test_ranking()
+    test_arrow_keys_add_to_cart()
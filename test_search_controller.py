@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the debounced incremental search controller.
+"""
+
+import sqlite3
+import time
+
+import headless
+from search_controller import IncrementalSearch
+
+class ManualRoot:
+    """Collects after() callbacks so the test decides when they run"""
+
+    def __init__(self):
+        self.pending = {}
+        self.next_id = 0
+
+    def after(self, delay, func, *args):
+        self.next_id += 1
+        self.pending[self.next_id] = (func, args)
+        return self.next_id
+
+    def after_cancel(self, after_id):
+        self.pending.pop(after_id, None)
+
+    def run_pending(self):
+        callbacks, self.pending = list(self.pending.values()), {}
+        for func, args in callbacks:
+            func(*args)
+
+def make_controller(limit=50):
+    db_path = headless.temp_path("search.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE medicines (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.executemany("INSERT INTO medicines (name) VALUES (?)",
+                     [(name,) for name in ("Paracetamol 500mg", "Paracetamol 1g", "Panadol", "Amoxicillin",
+                                           "Ibuprofen")])
+    conn.commit()
+
+    def fetch(cursor, term, limit):
+        cursor.execute("SELECT id, name FROM medicines WHERE name LIKE ? ORDER BY name LIMIT ?",
+                       (f"%{term}%", limit + 1))
+        return cursor.fetchall()
+
+    rendered = []
+    controller = IncrementalSearch(ManualRoot(), db_path, fetch, lambda row, term: term.lower() in row[1].lower(),
+                                   rendered.append, limit=limit)
+    return controller, conn, rendered
+
+def wait_for_worker(controller):
+    deadline = time.time() + 5
+    while controller._jobs.unfinished_tasks and time.time() < deadline:
+        time.sleep(0.01)
+
+def wait_for_results(controller):
+    wait_for_worker(controller)
+    controller.root.run_pending()
+
+def test_debounce_and_narrowing():
+    """Test that only the last keystroke queries and extensions narrow in memory"""
+    controller, conn, rendered = make_controller()
+    for term in ("p", "pa", "par"):
+        controller.schedule(term)
+    assert len(controller.root.pending) == 1
+    controller.root.run_pending()
+    wait_for_results(controller)
+    assert [row[1] for row in rendered[-1]] == ["Paracetamol 1g", "Paracetamol 500mg"]
+    assert controller.stats['queries'] == 1
+    print("✓ Debounced keystrokes ran one query")
+
+    controller.schedule("parac")
+    controller.root.run_pending()
+    assert len(rendered[-1]) == 2 and controller.stats['narrowed'] == 1
+    assert controller.stats['queries'] == 1
+    print("✓ Extended term narrowed without a query")
+
+    controller.search_now(conn.cursor(), "amox")
+    assert [row[1] for row in rendered[-1]] == ["Amoxicillin"]
+    controller.close()
+    conn.close()
+    print("✓ Synchronous search")
+
+def test_stale_results_dropped():
+    """Test that a result for a superseded term is never rendered"""
+    controller, conn, rendered = make_controller()
+    controller.dispatch("ibu")
+    wait_for_worker(controller)
+    # The cashier kept typing a different term before the first result was shown
+    controller.search_now(conn.cursor(), "pan")
+    controller.root.run_pending()
+    assert [row[1] for row in rendered[-1]] == ["Panadol"]
+    assert all(row[1] != "Ibuprofen" for rows in rendered for row in rows)
+    assert controller.stats['stale'] == 1
+    controller.close()
+    conn.close()
+    print("✓ Stale result dropped")
+
+def test_truncated_results_not_narrowed():
+    """Test that a result cut off by the limit is re-queried instead of narrowed"""
+    controller, conn, rendered = make_controller(limit=1)
+    controller.search_now(conn.cursor(), "pa")
+    assert len(rendered[-1]) == 1 and controller.last_truncated
+    controller.search_now(conn.cursor(), "pan")
+    assert [row[1] for row in rendered[-1]] == ["Panadol"]
+    assert controller.stats['narrowed'] == 0 and controller.stats['queries'] == 2
+    controller.close()
+    conn.close()
+    print("✓ Truncated result re-queried")
+
+if __name__ == "__main__":
+    test_debounce_and_narrowing()
+    test_stale_results_dropped()
+    test_truncated_results_not_narrowed()
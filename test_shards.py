@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test script to verify month-sharded report aggregation in worker processes.
+"""
+
+from datetime import date
+
+import archive
+import headless
+import readers
+import shards
+
+def make_app():
+    """App with sales on the 10th and 28th of every month of 2024 and 2025, 2024 archived"""
+    app = headless.create_temp_app()
+    for name in ("Paracetamol 500", "Ibuprofen 200"):
+        app.cursor.execute("""
+            INSERT INTO medicines (name, batch, expiry, stock_packs, units_per_pack, pack_price, unit_price, supplier)
+            VALUES (?, 'B1', '2030-01-01', 100, 10, 500, 50, 'Acme')
+        """, (name,))
+    rows = []
+    for year in (2024, 2025):
+        for month in range(1, 13):
+            rows += [(f"{year}-{month:02d}-10 10:00:00", 1, 2, 'Pack', 1000),
+                     (f"{year}-{month:02d}-28 23:59:59", 2, 3, 'Unit', 150 * month)]
+    app.cursor.executemany("""
+        INSERT INTO sales (date, medicine_id, qty, type, price, total, user_id, invoice_no)
+        VALUES (?, ?, ?, ?, 500, ?, 1, NULL)
+    """, rows)
+    app.conn.commit()
+    archive.archive(app.conn, app.db_path, today=date(2026, 3, 15))
+    return app
+
+def report(app, report_type, from_date, to_date):
+    app.cursor.execute("DELETE FROM report_cache")
+    app.conn.commit()
+    app.report_type_var.set(report_type)
+    headless.set_entry(app.from_date_entry, from_date)
+    headless.set_entry(app.to_date_entry, to_date)
+    app.view_report()
+    assert not headless.messagebox.errors()
+    return app.report_text.get(1.0, 'end')
+
+def test_month_shards():
+    """Test splitting a range into calendar months and merging partial totals"""
+    assert shards.month_shards("2024-01-15", "2024-03-02") == [
+        ("2024-01-15", "2024-01-31"), ("2024-02-01", "2024-02-29"), ("2024-03-01", "2024-03-02")]
+    assert shards.month_shards("2024-12-01", "2025-01-01")[-1] == ("2025-01-01", "2025-01-01")
+    assert shards.month_shards("2024-03-01", "2024-01-01") == []
+    assert shards.merge([{1: 5, 2: (1, 10)}, {1: 7, 2: (2, 20), 3: 1}]) == {1: 12, 2: (3, 30), 3: 1}
+    print("✓ Month shards and merged totals")
+
+def test_sharded_reports_match():
+    """Test that reports summed in worker processes match the in-process ones, archives included"""
+    app = make_app()
+    periods = [("Daily Sales", "2024-06-01", "2025-05-31"), ("Monthly Sales", "2024-10-01", "2025-03-31"),
+               ("Top Sellers", "2024-01-01", "2025-12-31"), ("ABC Classification", "2024-01-01", "2025-12-31")]
+    app.report_shards = shards.ShardedReports(app.db_path, workers=1)
+    inline = [report(app, *period) for period in periods]
+    assert "2025-05-28\t$7.50" in inline[0] and "2025-03\t$14.50" in inline[1]
+    assert "1\tParacetamol 500\t480\t$240.00" in inline[2], inline[2]
+
+    app.report_shards = shards.ShardedReports(app.db_path, workers=2)
+    assert app.report_shards.parallel("2024-06-01", "2025-05-31")
+    assert not app.report_shards.parallel("2025-01-01", "2025-03-31")
+    try:
+        assert [report(app, *period) for period in periods] == inline
+    finally:
+        app.report_shards.close()
+    print("✓ Sharded reports match in-process reports")
+    app.readers.close()
+    app.conn.close()
+
+def test_snapshot_kept():
+    """Test that shards reading a newer commit than the report's snapshot are summed in-process instead"""
+    app = make_app()
+    app.report_shards = shards.ShardedReports(app.db_path, workers=2, min_months=2)
+    try:
+        with app.readers.reader() as conn, readers.snapshot(conn):
+            before = app.report_shards.totals(conn.cursor(), 'daily', "2025-03-01", "2025-08-31")
+            assert app.report_shards.fallbacks == 0 and before[20250310] == 1000
+            app.cursor.execute("""
+                INSERT INTO sales (date, medicine_id, qty, type, price, total, user_id, invoice_no)
+                VALUES ('2025-03-10 12:00:00', 1, 1, 'Pack', 500, 500, 1, NULL),
+                       ('2025-05-10 12:00:00', 1, 1, 'Pack', 500, 500, 1, NULL)
+            """)
+            app.conn.commit()
+            assert app.report_shards.totals(conn.cursor(), 'daily', "2025-03-01", "2025-08-31") == before
+            # Only the March and May shards are summed again
+            assert app.report_shards.fallbacks == 2
+        with app.readers.reader() as conn, readers.snapshot(conn):
+            assert app.report_shards.totals(conn.cursor(), 'daily', "2025-03-01", "2025-08-31")[20250310] == 1500
+            assert app.report_shards.fallbacks == 2
+    finally:
+        app.report_shards.close()
+    print("✓ Sharded totals match the caller's snapshot")
+    app.readers.close()
+    app.conn.close()
+
+if __name__ == "__main__":
+    test_month_shards()
+    test_sharded_reports_match()
+    test_snapshot_kept()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test script to verify per-statement SQL timing and the slow-query log.
+"""
+
+import headless
+import perf
+import sqlstats
+
+def test_statement_stats():
+    """Test that statements are grouped by normalized text with row counts"""
+    perf.enable()
+    sqlstats.reset()
+    try:
+        conn = sqlstats.connect(':memory:')
+        conn.execute("CREATE TABLE medicines (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.executemany("INSERT INTO medicines (name) VALUES (?)", [(f"Med {i}",) for i in range(100)])
+        cursor = conn.cursor()
+        for term in ("Med 1", "Med 2"):
+            cursor.execute("SELECT * FROM medicines WHERE name LIKE ?", (f"%{term}%",))
+            cursor.fetchall()
+        cursor.execute("SELECT COUNT(*) FROM medicines WHERE id > 10")
+        cursor.fetchone()
+        conn.close()
+
+        stats = {row['statement']: row for row in sqlstats.snapshot()}
+        like = stats["SELECT * FROM medicines WHERE name LIKE ?"]
+        assert like['count'] == 2
+        assert like['rows'] == 22  # "Med 1", "Med 10".."Med 19" and the same for 2
+        assert like['max'] > 0
+        assert stats["SELECT COUNT(*) FROM medicines WHERE id > ?"]['rows'] == 1
+        print("✓ Statements are aggregated by normalized text")
+    finally:
+        perf.disable()
+        sqlstats.reset()
+
+def test_slow_query_log():
+    """Test that slow statements are logged with their query plan"""
+    log_path = headless.temp_path("slow.log")
+    sqlstats.SLOW_QUERY_LOG = log_path
+    sqlstats._slow_logger = None
+    previous = sqlstats.slow_query_threshold_ms
+    sqlstats.set_slow_query_threshold(0)
+    try:
+        conn = sqlstats.connect(':memory:')
+        conn.execute("CREATE TABLE sales (id INTEGER PRIMARY KEY, total REAL)")
+        conn.execute("SELECT SUM(total) FROM sales WHERE id > ?", (5,)).fetchone()
+        conn.close()
+        for handler in sqlstats._slow_logger.handlers:
+            handler.flush()
+        with open(log_path, encoding="utf-8") as f:
+            content = f.read()
+        assert "SELECT SUM(total) FROM sales WHERE id > ?" in content
+        assert "SEARCH sales USING INTEGER PRIMARY KEY" in content
+        print("✓ Slow query logged with EXPLAIN QUERY PLAN")
+    finally:
+        sqlstats.set_slow_query_threshold(previous)
+        for handler in sqlstats._slow_logger.handlers:
+            handler.close()
+        sqlstats._slow_logger.handlers.clear()
+        sqlstats._slow_logger = None
+        sqlstats.SLOW_QUERY_LOG = "slow_queries.log"
+
+if __name__ == "__main__":
+    test_statement_stats()
+    test_slow_query_log()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the typo-tolerant trigram index and the fuzzy search fallback.
+"""
+
+import sqlite3
+
+import headless
+import trigram_index
+
+NAMES = ["Amoxicillin 500mg Capsules", "Amoxicillin 250mg Syrup", "Ibuprofen 400mg Tablets",
+         "Paracetamol 500mg Tablets", "Omeprazole 20mg Capsules"]
+
+def make_index():
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE medicines (id INTEGER PRIMARY KEY, name TEXT)")
+    cursor.executemany("INSERT INTO medicines (name) VALUES (?)", [(name,) for name in NAMES])
+    trigram_index.create_tables(cursor)
+    assert trigram_index.index_missing(cursor) == len(NAMES)
+    assert trigram_index.index_missing(cursor) == 0
+    return cursor, trigram_index.TrigramIndex()
+
+def names_for(cursor, matches):
+    return [cursor.execute("SELECT name FROM medicines WHERE id = ?", (medicine_id,)).fetchone()[0]
+            for medicine_id, _ in matches]
+
+def test_misspellings():
+    """Test that common counter misspellings find the right medicine"""
+    cursor, index = make_index()
+    assert names_for(cursor, index.search(cursor, "ibuprofin"))[0] == "Ibuprofen 400mg Tablets"
+    assert set(names_for(cursor, index.search(cursor, "amoxicilin"))) == {NAMES[0], NAMES[1]}
+    assert names_for(cursor, index.search(cursor, "amoxicilin syrp"))[0] == "Amoxicillin 250mg Syrup"
+    assert names_for(cursor, index.search(cursor, "paracetmol 500"))[0] == "Paracetamol 500mg Tablets"
+    assert index.search(cursor, "zzqxv") == []
+    print("✓ Misspellings matched")
+
+def test_maintenance():
+    """Test that committed add/update/remove reach the in-memory mirror and rolled back ones do not"""
+    cursor, index = make_index()
+    index.search(cursor, "omeprazol")
+    assert index.loaded
+    cursor.execute("INSERT INTO medicines (name) VALUES ('Cetirizine 10mg Tablets')")
+    new_id = cursor.lastrowid
+    index.add(cursor, new_id, "Cetirizine 10mg Tablets")
+    assert index.search(cursor, "cetrizine") == []
+    cursor.connection.commit()
+    index.commit()
+    assert index.search(cursor, "cetrizine")[0][0] == new_id
+    index.update(cursor, new_id, "Loratadine 10mg Tablets")
+    cursor.connection.commit()
+    index.commit()
+    assert index.search(cursor, "loratadin")[0][0] == new_id
+    assert all(medicine_id != new_id for medicine_id, _ in index.search(cursor, "cetrizine"))
+    index.remove(cursor, new_id)
+    cursor.connection.commit()
+    index.commit()
+    assert index.search(cursor, "loratadin") == []
+
+    # A rolled back rename never reaches the mirror
+    index.add(cursor, new_id, "Desloratadine 5mg Tablets")
+    cursor.connection.rollback()
+    index.rollback()
+    index.commit()
+    assert index.search(cursor, "desloratadin") == []
+
+    # A fresh mirror loaded from the table agrees
+    fresh = trigram_index.TrigramIndex()
+    assert fresh.search(cursor, "omeprazol") == index.search(cursor, "omeprazol")
+    print("✓ Index maintained on add/update/remove")
+
+def test_fuzzy_fallback_in_app():
+    """Test that the sales and medicines searches fall back to fuzzy matches"""
+    app = headless.create_temp_app()
+    for name in NAMES:
+        for entry, text in ((app.name_entry, name), (app.expiry_entry, "2030-01-01"), (app.stock_entry, "5"),
+                            (app.units_entry, "10"), (app.pack_price_entry, "5"), (app.supplier_entry, "Acme")):
+            headless.set_entry(entry, text)
+        app.add_medicine()
+    headless.set_entry(app.sales_search_entry, "ibuprofin")
+    app.search_medicine_for_sale()
+    assert app.current_medicine.name == "Ibuprofen 400mg Tablets"
+
+    headless.set_entry(app.search_entry, "omeprazol 20")
+    app.search_medicines()
+    rows = [app.medicines_tree.item(iid)['values'][1] for iid in app.medicines_tree.get_children()]
+    assert rows[0] == "Omeprazole 20mg Capsules"
+    assert not headless.messagebox.errors()
+    headless.messagebox.clear()
+    app.conn.close()
+    print("✓ Fuzzy fallback in the application")
+
+if __name__ == "__main__":
+    test_misspellings()
+    test_maintenance()
+    test_fuzzy_fallback_in_app()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Typo-tolerant trigram index for medicine names.
+
+Names are split into words. Every distinct word is cut into padded trigrams
+("  word " -> "  w", " wo", "wor", "ord", "rd "), the pg_trgm scheme, and the
+index is stored in two tables: name_trigrams (trigram -> word) and
+name_words (word -> medicine). Both are mirrored in memory on first use;
+add(), remove() and update() write the tables and only reach the mirror on
+commit(), after the caller's transaction commits, so a rolled back change
+never shows up in searches.
+
+A fuzzy search first matches each query word against the word vocabulary
+using the trigram postings and the Dice coefficient
+2 * shared / (query trigrams + word trigrams). The vocabulary is far smaller
+than the catalog, so this stays fast even with 100k SKUs, and "amoxicilin"
+still finds "amoxicillin". Medicines containing the most selective matched
+word are then scored by the average best similarity of every query word to
+their own words.
+"""
+
+import heapq
+import re
+import threading
+from collections import Counter
+
+DEFAULT_THRESHOLD = 0.4
+
+_WORD_SPLIT = re.compile(r"[^0-9a-z]+")
+
+
+def words(text):
+    """Lower-case alphanumeric words of text"""
+    return [word for word in _WORD_SPLIT.split(str(text).lower()) if word]
+
+
+def trigrams(word):
+    """Set of padded trigrams for a single word"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def dice(shared, size_a, size_b):
+    return 2.0 * shared / (size_a + size_b)
+
+
+def create_tables(cursor):
+    """Create the tables used to persist the index"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS name_words (
+            word TEXT NOT NULL,
+            medicine_id INTEGER NOT NULL,
+            PRIMARY KEY (word, medicine_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_name_words_medicine ON name_words (medicine_id)")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS name_trigrams (
+            trigram TEXT NOT NULL,
+            word TEXT NOT NULL,
+            PRIMARY KEY (trigram, word)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _write(cursor, medicine_id, name):
+    name_words = set(words(name))
+    cursor.executemany("INSERT OR IGNORE INTO name_words (word, medicine_id) VALUES (?, ?)",
+                       [(word, medicine_id) for word in name_words])
+    cursor.executemany("INSERT OR IGNORE INTO name_trigrams (trigram, word) VALUES (?, ?)",
+                       [(gram, word) for word in name_words for gram in trigrams(word)])
+    return name_words
+
+
+def index_missing(cursor):
+    """Index medicines that have no word rows yet (bulk imports, older databases)"""
+    cursor.execute("""
+        SELECT m.id, m.name FROM medicines m
+        WHERE NOT EXISTS (SELECT 1 FROM name_words w WHERE w.medicine_id = m.id)
+    """)
+    missing = cursor.fetchall()
+    for medicine_id, name in missing:
+        _write(cursor, medicine_id, name)
+    return len(missing)
+
+
+class TrigramIndex:
+    """In-memory mirror of name_words / name_trigrams, loaded on first use"""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.gram_postings = {}      # trigram -> words
+        self.word_sizes = {}         # word -> number of trigrams
+        self.word_postings = {}      # word -> medicine ids
+        self.medicine_words = {}     # medicine id -> words
+        self.loaded = False
+        self._pending = []           # (medicine id, words or None when removed), not yet committed
+        self._lock = threading.Lock()
+
+    def load(self, cursor):
+        """Read the persisted index into memory"""
+        gram_postings = {}
+        word_sizes = Counter()
+        word_postings = {}
+        medicine_words = {}
+        cursor.execute("SELECT trigram, word FROM name_trigrams")
+        for gram, word in cursor.fetchall():
+            gram_postings.setdefault(gram, set()).add(word)
+            word_sizes[word] += 1
+        cursor.execute("SELECT word, medicine_id FROM name_words")
+        for word, medicine_id in cursor.fetchall():
+            word_postings.setdefault(word, set()).add(medicine_id)
+            medicine_words.setdefault(medicine_id, []).append(word)
+        with self._lock:
+            self.gram_postings = gram_postings
+            self.word_sizes = dict(word_sizes)
+            self.word_postings = word_postings
+            self.medicine_words = medicine_words
+            self.loaded = True
+
+    def add(self, cursor, medicine_id, name):
+        """Index a new medicine name (the caller commits, then calls commit())"""
+        self._pending.append((medicine_id, _write(cursor, medicine_id, name)))
+
+    def remove(self, cursor, medicine_id):
+        """Drop a medicine from the index (the caller commits, then calls commit())"""
+        # Vocabulary trigrams are kept: words without medicines simply match nothing
+        cursor.execute("DELETE FROM name_words WHERE medicine_id = ?", (medicine_id,))
+        self._pending.append((medicine_id, None))
+
+    def update(self, cursor, medicine_id, name):
+        """Re-index a renamed medicine (the caller commits, then calls commit())"""
+        self.remove(cursor, medicine_id)
+        self.add(cursor, medicine_id, name)
+
+    def commit(self):
+        """Apply the changes written since the last commit() to the in-memory mirror"""
+        pending, self._pending = self._pending, []
+        if not self.loaded:
+            return
+        with self._lock:
+            for medicine_id, name_words in pending:
+                for word in self.medicine_words.pop(medicine_id, ()):
+                    ids = self.word_postings.get(word)
+                    if ids is not None:
+                        ids.discard(medicine_id)
+                if name_words is None:
+                    continue
+                for word in name_words:
+                    if word not in self.word_sizes:
+                        grams = trigrams(word)
+                        for gram in grams:
+                            self.gram_postings.setdefault(gram, set()).add(word)
+                        self.word_sizes[word] = len(grams)
+                    self.word_postings.setdefault(word, set()).add(medicine_id)
+                self.medicine_words[medicine_id] = list(name_words)
+
+    def rollback(self):
+        """Forget the changes written since the last commit() (the caller rolled the transaction back)"""
+        self._pending = []
+
+    def similar_words(self, word, threshold):
+        """Vocabulary words similar to word, as {word: similarity} (call with the lock held)"""
+        query = trigrams(word)
+        shared = Counter()
+        for gram in query:
+            shared.update(self.gram_postings.get(gram, ()))
+        similar = {}
+        for candidate, count in shared.items():
+            score = dice(count, len(query), self.word_sizes[candidate])
+            if score >= threshold and self.word_postings.get(candidate):
+                similar[candidate] = score
+        return similar
+
+    def search(self, cursor, term, limit=10, threshold=None):
+        """Best (medicine_id, score) pairs for term, most similar first"""
+        if not self.loaded:
+            self.load(cursor)
+        query_words = words(term)
+        if not query_words:
+            return []
+        threshold = self.threshold if threshold is None else threshold
+        with self._lock:
+            matches = [self.similar_words(word, threshold) for word in query_words]
+            if not any(matches):
+                return []
+
+            # Seed candidates from the query word whose matches cover the fewest medicines
+            def coverage(similar):
+                return sum(len(self.word_postings[word]) for word in similar)
+
+            seed = min((similar for similar in matches if similar), key=coverage)
+            candidates = set()
+            for word in seed:
+                candidates.update(self.word_postings[word])
+
+            # Add up each query word's best similarity per candidate, using set
+            # intersections rather than comparing words candidate by candidate
+            totals = dict.fromkeys(candidates, 0.0)
+            for similar in matches:
+                word_best = {}
+                for word, score in sorted(similar.items(), key=lambda item: item[1]):
+                    word_best.update(dict.fromkeys(self.word_postings[word] & candidates, score))
+                for medicine_id, score in word_best.items():
+                    totals[medicine_id] += score
+            medicine_words = self.medicine_words
+            best = heapq.nsmallest(limit, totals.items(),
+                                   key=lambda item: (-item[1], len(medicine_words.get(item[0], ())), item[0]))
+        return [(medicine_id, total / len(matches)) for medicine_id, total in best]